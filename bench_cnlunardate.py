@@ -0,0 +1,408 @@
+"""Benchmark cnlunardate.
+
+Times the constructors, conversions, operators, month queries,
+formatting and parsing of cnlunardate over every supported day, plus
+worst-case inputs (days in and after leap months, and the last day of
+every lunar year), measures the peak memory of a million objects, and times
+importing the module in a fresh interpreter, alone and followed by a
+first conversion. fromsolardate() is also run from several threads at
+once, to show how throughput scales with the thread count; it only does
+on a free-threaded build of Python.
+
+Usage:
+
+    python bench_cnlunardate.py [--repeat N] [--only NAME ...]
+                                [--threads N ...]
+                                [--json FILE] [--compare FILE]
+
+--json writes the results as JSON; --compare prints the speed ratio of
+this run against a previously written JSON file.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, time as dtime, timedelta
+
+import cnlunardate as cnlunardate_module
+from cnlunardate import cnlunardate
+
+_BENCHMARKS = []
+
+
+def benchmark(func):
+    """Register a benchmark, run over every input set of _inputs()."""
+    _BENCHMARKS.append((func.__name__[len("bench_"):], func))
+    return func
+
+
+def _inputs():
+    ordinals = list(range(cnlunardate.min.toordinal(),
+                          cnlunardate.max.toordinal() + 1))
+    dates = [cnlunardate.fromordinal(n) for n in ordinals]
+    leap_years = {d.year for d in dates if d.isLeapMonth}
+    leap = [d for d in dates if d.year in leap_years and (
+        d.isLeapMonth or d.month >= cnlunardate_module._leap_month_in_bits(
+            cnlunardate_module._LUNAR_YEAR_DATA[d.year - cnlunardate_module.MIN_YEAR]))]
+    year_end = [a for a, b in zip(dates, dates[1:]) if a.year != b.year]
+    return {"all": dates, "leap": leap, "year_end": year_end}
+
+
+def _fresh(dates):
+    # Separate objects built by the constructor, as user code would build them.
+    return [cnlunardate(d.year, d.month, d.day, d.isLeapMonth) for d in dates]
+
+
+@benchmark
+def bench_new(dates):
+    fields = [(d.year, d.month, d.day, d.isLeapMonth) for d in dates]
+    t = time.perf_counter()
+    for y, m, d, l in fields:
+        cnlunardate(y, m, d, l)
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_days_in_month(dates):
+    fields = [(d.year, d.month, d.isLeapMonth) for d in dates]
+    days_in_month = cnlunardate_module.days_in_month
+    t = time.perf_counter()
+    for y, m, l in fields:
+        days_in_month(y, m, l)
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_fromsolardate(dates):
+    solar = [d.tosolardate() for d in dates]
+    fromsolardate = cnlunardate.fromsolardate
+    t = time.perf_counter()
+    for s in solar:
+        fromsolardate(s)
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_fromordinal(dates):
+    ordinals = [d.toordinal() for d in dates]
+    fromordinal = cnlunardate.fromordinal
+    t = time.perf_counter()
+    for n in ordinals:
+        fromordinal(n)
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_fromtimestamp(dates):
+    noon = dtime(12)
+    stamps = [datetime.combine(d.tosolardate(), noon).timestamp()
+              for d in dates[1:-1]]
+    fromtimestamp = cnlunardate.fromtimestamp
+    t = time.perf_counter()
+    for ts in stamps:
+        fromtimestamp(ts)
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_datetime_fromtimestamp(dates):
+    noon = dtime(12, tzinfo=cnlunardate_module.CHINA_TZ)
+    stamps = [datetime.combine(d.tosolardate(), noon).timestamp() for d in dates]
+    fromtimestamp = cnlunardate_module.cnlunardatetime.fromtimestamp
+    t = time.perf_counter()
+    for ts in stamps:
+        fromtimestamp(ts)
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_tosolardate(dates):
+    dates = _fresh(dates)
+    t = time.perf_counter()
+    for d in dates:
+        d.tosolardate()
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_toordinal(dates):
+    dates = _fresh(dates)
+    t = time.perf_counter()
+    for d in dates:
+        d.toordinal()
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_weekday(dates):
+    dates = _fresh(dates)
+    t = time.perf_counter()
+    for d in dates:
+        d.weekday()
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_isocalendar(dates):
+    dates = _fresh(dates)
+    t = time.perf_counter()
+    for d in dates:
+        d.isocalendar()
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_add(dates):
+    dates = _fresh(dates[:-1])
+    day = timedelta(1)
+    t = time.perf_counter()
+    for d in dates:
+        d + day
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_sub_timedelta(dates):
+    dates = _fresh(dates[1:])
+    day = timedelta(1)
+    t = time.perf_counter()
+    for d in dates:
+        d - day
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_sub_date(dates):
+    dates = _fresh(dates)
+    pairs = list(zip(dates, dates[1:]))
+    t = time.perf_counter()
+    for a, b in pairs:
+        b - a
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_compare(dates):
+    dates = _fresh(dates)
+    pairs = list(zip(dates, dates[1:]))
+    t = time.perf_counter()
+    for a, b in pairs:
+        a < b
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_eq(dates):
+    pairs = list(zip(_fresh(dates), _fresh(dates)))
+    t = time.perf_counter()
+    for a, b in pairs:
+        a == b
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_hash(dates):
+    dates = _fresh(dates)
+    t = time.perf_counter()
+    for d in dates:
+        hash(d)
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_strftime(dates):
+    dates = _fresh(dates)
+    t = time.perf_counter()
+    for d in dates:
+        d.strftime("%Y-%m-%d%L %N%D")
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_format_many(dates):
+    dates = _fresh(dates)
+    t = time.perf_counter()
+    cnlunardate_module.format_many(dates, "%Y-%m-%d%L %N%D")
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_fromisoformat(dates):
+    texts = [d.isoformat() for d in dates]
+    fromisoformat = cnlunardate.fromisoformat
+    t = time.perf_counter()
+    for text in texts:
+        fromisoformat(text)
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_parse_many(dates):
+    texts = [d.strftime("%C年%N%D") for d in dates]
+    t = time.perf_counter()
+    cnlunardate_module.parse_many(texts)
+    return time.perf_counter() - t
+
+
+@benchmark
+def bench_pickle(dates):
+    t = time.perf_counter()
+    for d in dates:
+        pickle.loads(pickle.dumps(d))
+    return time.perf_counter() - t
+
+
+_IMPORT_SNIPPETS = {
+    "import": "import cnlunardate",
+    "import+first_conversion": "import cnlunardate, datetime\n"
+                               "cnlunardate.cnlunardate.fromsolardate(datetime.date(2017, 6, 24))",
+}
+
+
+def _time_import(snippet, repeat):
+    # Each run is a fresh interpreter, timed from inside so that only the
+    # snippet counts and not the interpreter startup.
+    code = ("import time\nt = time.perf_counter()\n" + snippet +
+            "\nprint(time.perf_counter() - t)")
+    path = os.path.dirname(os.path.abspath(cnlunardate_module.__file__))
+    return min(float(subprocess.run([sys.executable, "-c", code], cwd=path,
+                                    check=True, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE,
+                                    universal_newlines=True).stdout)
+               for _ in range(repeat))
+
+
+_THREAD_COUNTS = (1, 2, 4, 8)
+
+
+def _convert_in_thread(barrier, solar):
+    fromsolardate = cnlunardate.fromsolardate
+    barrier.wait()
+    for s in solar:
+        fromsolardate(s)
+
+
+def _time_threads(solar, threads, repeat):
+    # Every thread converts all of solar, started together by the barrier.
+    best = None
+    for _ in range(repeat):
+        barrier = threading.Barrier(threads + 1)
+        workers = [threading.Thread(target=_convert_in_thread, args=(barrier, solar))
+                   for _ in range(threads)]
+        for w in workers:
+            w.start()
+        barrier.wait()
+        t = time.perf_counter()
+        for w in workers:
+            w.join()
+        seconds = time.perf_counter() - t
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def _time(func, dates, repeat):
+    return min(func(dates) for _ in range(repeat))
+
+
+def _peak_memory_per_million(dates):
+    fields = [(d.year, d.month, d.day, d.isLeapMonth) for d in dates]
+    tracemalloc.start()
+    try:
+        objects = [cnlunardate(*f) for f in fields]
+        objects += [cnlunardate.fromordinal(d.toordinal()) for d in objects]
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak * 1000000 // len(objects)
+
+
+def run(repeat=3, only=None, threads=_THREAD_COUNTS):
+    """Run the benchmarks and return the results as a JSON-able dict."""
+    inputs = _inputs()
+    results = []
+    for name, func in _BENCHMARKS:
+        for input_name in inputs:
+            key = f"{name}[{input_name}]"
+            if only and not any(o in key for o in only):
+                continue
+            dates = inputs[input_name]
+            seconds = _time(func, dates, repeat)
+            results.append({"name": key, "n": len(dates), "seconds": seconds,
+                            "ops_per_sec": len(dates) / seconds})
+    for key, snippet in _IMPORT_SNIPPETS.items():
+        if only and not any(o in key for o in only):
+            continue
+        seconds = _time_import(snippet, repeat)
+        results.append({"name": key, "n": 1, "seconds": seconds,
+                        "ops_per_sec": 1 / seconds})
+    solar = [d.tosolardate() for d in inputs["all"]]
+    for n in threads:
+        key = f"fromsolardate_threads[{n}]"
+        if only and not any(o in key for o in only):
+            continue
+        seconds = _time_threads(solar, n, repeat)
+        results.append({"name": key, "n": n * len(solar), "seconds": seconds,
+                        "ops_per_sec": n * len(solar) / seconds})
+    return {
+        "python": sys.version,
+        "implementation": platform.python_implementation(),
+        "gil_enabled": getattr(sys, "_is_gil_enabled", lambda: True)(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+        "peak_bytes_per_million_objects": _peak_memory_per_million(inputs["all"]),
+    }
+
+
+def _print(report, baseline=None):
+    old = {} if baseline is None else {
+        r["name"]: r["ops_per_sec"] for r in baseline["results"]}
+    one_thread = next((r["ops_per_sec"] for r in report["results"]
+                       if r["name"] == "fromsolardate_threads[1]"), None)
+    for r in report["results"]:
+        line = f"{r['name']:32} {r['ops_per_sec']:>14,.0f} ops/s"
+        if r["name"] in old:
+            line += f"  x{r['ops_per_sec'] / old[r['name']]:.2f}"
+        if one_thread and r["name"].startswith("fromsolardate_threads["):
+            line += f"  (scaling x{r['ops_per_sec'] / one_thread:.2f})"
+        print(line)
+    print(f"{'peak memory per 1M objects':32} "
+          f"{report['peak_bytes_per_million_objects'] / 2 ** 20:>14,.1f} MiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark cnlunardate.")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per benchmark, the best is kept")
+    parser.add_argument("--only", nargs="+", metavar="NAME",
+                        help="only run benchmarks whose name contains NAME")
+    parser.add_argument("--threads", type=int, nargs="+", metavar="N",
+                        default=_THREAD_COUNTS,
+                        help="thread counts of the scaling benchmark "
+                             f"(default: {' '.join(map(str, _THREAD_COUNTS))})")
+    parser.add_argument("--json", metavar="FILE",
+                        help="write the results to FILE as JSON")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="compare with results previously written by --json")
+    args = parser.parse_args(argv)
+
+    report = run(args.repeat, args.only, args.threads)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    _print(report, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
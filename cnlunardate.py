@@ -3,7 +3,16 @@
 See https://en.wikipedia.org/wiki/Chinese_calendar.
 """
 
-from datetime import date, timedelta
+import sys
+from _thread import RLock, _local
+from array import array
+from bisect import bisect_right
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from functools import lru_cache
+from time import perf_counter
+from weakref import ref
 
 
 MIN_YEAR = 1900
@@ -12,6 +21,8 @@ MIN_DATE = date(1900, 1, 31)
 MAX_DATE = date(2100, 12, 31)
 _MINORDINAL = 693626  # cnlunardate.min.toordinal()
 _MAXORDINAL = 767009  # cnlunardate.max.toordinal()
+CHINA_TZ = timezone(timedelta(hours=8), "CST")  # China Standard Time, UTC+8
+_max_year_last_month_days = 1  # month 12 of MAX_YEAR is cut at MAX_DATE, 0 if not
 
 
 # 2017
@@ -22,7 +33,7 @@ _MAXORDINAL = 767009  # cnlunardate.max.toordinal()
 #   |         |          There is a leap month and it is June.
 #   |         12 bits for each lunar month with 30 days if 1, or 29 days if 0.
 #   If there is a leap month, then it has 30 days if 1, or 29 days if 0.
-_LUNAR_YEAR_DATA = \
+_LUNAR_YEAR_DATA = array("I",
     [0x04bd8, 0x04ae0, 0x0a570, 0x054d5, 0x0d260, 0x0d950, 0x16554, 0x056a0, 0x09ad0, 0x055d2,  # 1900-1909
      0x04ae0, 0x0a5b6, 0x0a4d0, 0x0d250, 0x1d255, 0x0b540, 0x0d6a0, 0x0ada2, 0x095b0, 0x14977,  # 1910-1919
      0x04970, 0x0a4b0, 0x0b4b5, 0x06a50, 0x06d40, 0x1ab54, 0x02b60, 0x09570, 0x052f2, 0x04970,  # 1920-1929
@@ -43,14 +54,14 @@ _LUNAR_YEAR_DATA = \
      0x052d0, 0x0a9b8, 0x0a950, 0x0b4a0, 0x0b6a6, 0x0ad50, 0x055a0, 0x0aba4, 0x0a5b0, 0x052b0,  # 2070-2079
      0x0b273, 0x06930, 0x07337, 0x06aa0, 0x0ad50, 0x14b55, 0x04b60, 0x0a570, 0x054e4, 0x0d160,  # 2080-2089
      0x0e968, 0x0d520, 0x0daa0, 0x16aa6, 0x056d0, 0x04ae0, 0x0a9d4, 0x0a2d0, 0x0d150, 0x0f252,  # 2090-2099
-     0x0d520]  # 2100
+     0x0d520])  # 2100
 
 # 2017
 #    0    f    c    2    3    c
 # 0000 1111 1100 0010 0011 1100
 # 000011111100001 0001    11100
 # Year=2017       Month=1 Day=28
-_LUNAR_YEAR_FIRST_DAY_IN_SOLAR = \
+_LUNAR_YEAR_FIRST_DAY_IN_SOLAR = array("I",
     [0x0ed83f, 0x0eda53, 0x0edc48, 0x0ede3d, 0x0ee050, 0x0ee244, 0x0ee439, 0x0ee64d, 0x0ee842, 0x0eea36,  # 1900-1909
      0x0eec4a, 0x0eee3e, 0x0ef052, 0x0ef246, 0x0ef43a, 0x0ef64e, 0x0ef843, 0x0efa37, 0x0efc4b, 0x0efe41,  # 1910-1919
      0x0f0054, 0x0f0248, 0x0f043c, 0x0f0650, 0x0f0845, 0x0f0a38, 0x0f0c4d, 0x0f0e42, 0x0f1037, 0x0f124a,  # 1920-1929
@@ -71,11 +82,7 @@ _LUNAR_YEAR_FIRST_DAY_IN_SOLAR = \
      0x102c4b, 0x102e3f, 0x103053, 0x103247, 0x10343b, 0x10364f, 0x103845, 0x103a38, 0x103c4c, 0x103e42,  # 2070-2079
      0x104036, 0x104249, 0x10443d, 0x104651, 0x104846, 0x104a3a, 0x104c4e, 0x104e43, 0x105038, 0x10524a,  # 2080-2089
      0x10543e, 0x105652, 0x105847, 0x105a3b, 0x105c4f, 0x105e45, 0x106039, 0x10624c, 0x106441, 0x106635,  # 2090-2099
-     0x106849]   # 2100
-
-
-def _cmp(x, y):
-    return 0 if x == y else 1 if x > y else -1
+     0x106849])  # 2100
 
 
 def _return_int_if_valid(value):
@@ -146,23 +153,23 @@ def _month_bit_in_months_bits(bits, month):
 
 
 def _days_in_leapable_month(year, month, isLeapMonth):
-    idx = year - MIN_YEAR
-    lunar_bits = _LUNAR_YEAR_DATA[idx]
+    # The year and month must be in range.
+    if _month_starts is None:
+        _load_month_index()
+    info = _year_infos[year - MIN_YEAR]
     if isLeapMonth:
-        leap_month = _leap_month_in_bits(lunar_bits)
-        if leap_month == 0 or leap_month != month:
+        if info._leap_month != month:
             raise ValueError(f"month {month} is not leap in {year}")
-        else:
-            return 30 if _leap_month_days_in_bits(lunar_bits) else 29
-    months_bits = _months_in_bits(lunar_bits)
-    return 1 if year == MAX_YEAR and month == 12 else 30 if _month_bit_in_months_bits(months_bits, month) else 29
+        return info._leap_days
+    return info._regular_days[month]
 
 
 def _check_date_fields(year, month, day, isLeapMonth):
-    year = _return_int_if_valid(year)
-    month = _return_int_if_valid(month)
-    day = _return_int_if_valid(day)
-    isLeapMonth = _return_bool_if_valid(isLeapMonth)
+    return _check_field_ranges(_return_int_if_valid(year), _return_int_if_valid(month),
+                               _return_int_if_valid(day), _return_bool_if_valid(isLeapMonth))
+
+
+def _check_field_ranges(year, month, day, isLeapMonth):
     if not MIN_YEAR <= year <= MAX_YEAR:
         raise ValueError(f"year {year} must be in {MIN_YEAR}..{MAX_YEAR}")
     if not 1 <= month <= 12:
@@ -174,7 +181,10 @@ def _check_date_fields(year, month, day, isLeapMonth):
 
 
 def _convert_lunar_first_day_to_solar_by_idx(idx):
-    soalr_bits = _LUNAR_YEAR_FIRST_DAY_IN_SOLAR[idx]
+    return _convert_first_day_bits_to_solar(_LUNAR_YEAR_FIRST_DAY_IN_SOLAR[idx])
+
+
+def _convert_first_day_bits_to_solar(soalr_bits):
     return date(_get_bits_in_range_with_shift(soalr_bits, 15, 9),
                 _get_bits_in_range_with_shift(soalr_bits, 4, 5),
                 _get_bits_in_range_with_shift(soalr_bits, 5, 0))
@@ -195,34 +205,429 @@ def _convert_lunar_year_to_months_by_idx(idx):
     return months
 
 
-def _solar2ymdl(s):
+def _build_month_index():
+    """Return parallel lists describing every lunar month in the table.
+
+    The lists hold the proleptic Gregorian ordinal of the first day, the
+    lunar year, the month number and the leap flag of each month, in
+    chronological order. The fifth list maps a year index to the position
+    of its first month, with one extra entry past the last year, and the
+    last one holds the number of days of each month.
+    """
+    starts, years, months, leaps, year_first = [], [], [], [], []
+    for idx in range(len(_LUNAR_YEAR_DATA)):
+        year_first.append(len(starts))
+        n = _convert_lunar_first_day_to_solar_by_idx(idx).toordinal()
+        for month, days, isLeapMonth in _convert_lunar_year_to_months_by_idx(idx):
+            starts.append(n)
+            years.append(MIN_YEAR + idx)
+            months.append(month)
+            leaps.append(isLeapMonth)
+            n += days
+    year_first.append(len(starts))
+    days = [end - start for start, end in zip(starts, starts[1:] + [_MAXORDINAL + 1])]
+    return starts, years, months, leaps, year_first, days
+
+
+# Lazy tables are built by the first thread that needs them, holding
+# _init_lock, and published by assigning the global tested by readers
+# last. Readers only test that global, so conversions never take a lock,
+# with or without the GIL.
+_init_lock = RLock()
+
+# Month-level index, built on first use by _load_month_index() to keep
+# importing cheap. See _build_month_index().
+_month_starts = None
+_month_years = _month_numbers = _month_is_leap = None
+_year_first_month = _month_days = _year_leap_month = _month_codes = None
+_year_infos = None  # LunarYearInfo of each year
+
+
+def _load_month_index():
+    global _month_starts, _month_years, _month_numbers, _month_is_leap
+    global _year_first_month, _month_days, _year_leap_month, _month_codes
+    global _year_infos
+    with _init_lock:
+        if _month_starts is not None:
+            return
+        (starts, _month_years, _month_numbers, _month_is_leap,
+         _year_first_month, _month_days) = _build_month_index()
+        _year_leap_month = [_leap_month_in_bits(bits) for bits in _LUNAR_YEAR_DATA]
+        # The fields of each month as packed in cnlunardate._code, less the
+        # ordinal and day.
+        _month_codes = [y << 10 | m << 6 | l << 5 for y, m, l in
+                        zip(_month_years, _month_numbers, _month_is_leap)]
+        _year_infos = [_build_year_info(idx, starts, _month_days)
+                       for idx in range(len(_year_leap_month))]
+        # Published last, as the other lists are only read once it is set.
+        _month_starts = starts
+
+
+def _month_pos_in_year(idx, month, isLeapMonth):
+    """Return the 0-based position of a month within its lunar year."""
+    leap_month = _year_leap_month[idx]
+    if leap_month and (month > leap_month or (month == leap_month and isLeapMonth)):
+        return month
+    return month - 1
+
+
+class LunarYearInfo:
+    """The layout of a lunar year, as returned by year_info().
+
+    month_days holds the number of days of each month in order, a leap
+    month following the regular month of the same number, and
+    month_offsets the 0-based day of the year each of them starts on.
+    The last month of MAX_YEAR is cut at MAX_DATE, and so is days.
+    """
+    __slots__ = ('_year', '_leap_month', '_month_days', '_month_offsets',
+                 '_first_ordinal', '_days', '_regular_days', '_leap_days',
+                 '_regular_starts', '_leap_start', '_regular_index', '_leap_index')
+
+    def __new__(cls, *args, **kwargs):
+        raise TypeError(f"cannot create '{cls.__qualname__}' instances, "
+                        "use year_info()")
+
+    def __repr__(self):
+        """Convert to formal string, for repr()."""
+        return (f"{self.__class__.__module__}.{self.__class__.__qualname__}"
+                f"(year={self._year}, leap_month={self._leap_month}, "
+                f"days={self._days})")
+
+    def __reduce__(self):
+        return (year_info, (self._year,))
+
+    @property
+    def year(self):
+        """year (int)"""
+        return self._year
+
+    @property
+    def leap_month(self):
+        """leap_month (int), the leap month or 0 if there is none"""
+        return self._leap_month
+
+    @property
+    def month_days(self):
+        """month_days (tuple of int), the days of each month in order"""
+        return self._month_days
+
+    @property
+    def month_offsets(self):
+        """month_offsets (tuple of int), the first day of each month in the year"""
+        return self._month_offsets
+
+    @property
+    def first_ordinal(self):
+        """first_ordinal (int), the proleptic Gregorian ordinal of day 1 of month 1"""
+        return self._first_ordinal
+
+    @property
+    def days(self):
+        """days (int), the days in the year"""
+        return self._days
+
+    def _month_index(self, month, isLeapMonth):
+        # The position of a month in month_days, month in range.
+        if isLeapMonth:
+            if self._leap_month != month:
+                raise ValueError(f"month {month} is not leap in {self._year}")
+            return self._leap_index
+        return self._regular_index[month]
+
+    def _check_month(self, month, isLeapMonth):
+        month = _return_int_if_valid(month)
+        if not 1 <= month <= 12:
+            raise ValueError(f"month {month} must be in 1..12")
+        return self._month_index(month, _return_bool_if_valid(isLeapMonth))
+
+    def days_in_month(self, month, isLeapMonth=False):
+        """Return the number of days of a month of the year."""
+        return self._month_days[self._check_month(month, isLeapMonth)]
+
+    def month_offset(self, month, isLeapMonth=False):
+        """Return the 0-based day of the year a month starts on."""
+        return self._month_offsets[self._check_month(month, isLeapMonth)]
+
+
+def _build_year_info(idx, starts, month_days):
+    first, end = _year_first_month[idx], _year_first_month[idx + 1]
+    leap_month = _year_leap_month[idx]
+    info = object.__new__(LunarYearInfo)
+    info._year = MIN_YEAR + idx
+    info._leap_month = leap_month
+    info._month_days = tuple(month_days[first:end])
+    info._month_offsets = tuple(n - starts[first] for n in starts[first:end])
+    info._first_ordinal = starts[first]
+    info._days = sum(info._month_days)
+    # Positions in month_days, 0 standing for the missing month 0.
+    info._regular_index = (0,) + tuple(m - 1 + (0 < leap_month < m)
+                                       for m in range(1, 13))
+    info._leap_index = leap_month or None
+    info._regular_days = (0,) + tuple(info._month_days[i]
+                                      for i in info._regular_index[1:])
+    info._leap_days = info._month_days[leap_month] if leap_month else 0
+    info._regular_starts = (0,) + tuple(starts[first + i]
+                                        for i in info._regular_index[1:])
+    info._leap_start = starts[first + leap_month] if leap_month else 0
+    return info
+
+
+def year_info(year):
+    """Return the LunarYearInfo of a lunar year."""
+    year = _return_int_if_valid(year)
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        raise ValueError(f"year {year} must be in {MIN_YEAR}..{MAX_YEAR}")
+    if _month_starts is None:
+        _load_month_index()
+    return _year_infos[year - MIN_YEAR]
+
+
+def leap_month(year):
+    """Return the leap month of a lunar year, 0 if there is none."""
+    return year_info(year)._leap_month
+
+
+def days_in_year(year):
+    """Return the number of days of a lunar year."""
+    return year_info(year)._days
+
+
+def days_in_month(year, month, isLeapMonth=False):
+    """Return the number of days of a lunar month."""
+    return year_info(year).days_in_month(month, isLeapMonth)
+
+
+# Optional day-level lookup table, one code per supported day holding the
+# fields as packed in the low 24 bits of cnlunardate._code:
+#
+# year << 10 | month << 6 | isLeapMonth << 5 | day
+#
+# so that a lookup only has to add the ordinal.
+_day_table = None
+_day_table_enabled = False
+_DAY_TABLE_MAGIC = b"CNLDTBL2"
+_DAY_TABLE_HEADER_SIZE = 16  # magic, first ordinal and day count
+_DAY_TABLE_TYPECODE = "I"
+
+
+def _unpack_ymdl(code):
+    return code >> 10 & 0x3fff, code >> 6 & 15, code & 31, code & 32 != 0
+
+
+def _build_day_table():
+    if _month_starts is None:
+        _load_month_index()
+    table = array(_DAY_TABLE_TYPECODE)
+    for code, days in zip(_month_codes, _month_days):
+        table.extend(range(code + 1, code + days + 1))
+    return table
+
+
+def build_day_table(path=None):
+    """Build and activate the day-level lookup table.
+
+    If path is given, the table is also written there so that it can later
+    be shared between processes with load_day_table().
+    """
+    global _day_table, _day_table_enabled
+    table = _build_day_table()
+    if path is not None:
+        header = _DAY_TABLE_MAGIC + \
+            _MINORDINAL.to_bytes(4, "little") + len(table).to_bytes(4, "little")
+        data = array(_DAY_TABLE_TYPECODE, table)
+        if sys.byteorder != "little":
+            data.byteswap()
+        with open(path, "wb") as f:
+            f.write(header)
+            f.write(data.tobytes())
+    _day_table = table
+    _day_table_enabled = True
+
+
+def load_day_table(path):
+    """Memory-map a table written by build_day_table() and activate it."""
+    global _day_table, _day_table_enabled
+    import mmap
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header = mm[:_DAY_TABLE_HEADER_SIZE]
+    count = _MAXORDINAL - _MINORDINAL + 1
+    if (header[:8] != _DAY_TABLE_MAGIC or
+            int.from_bytes(header[8:12], "little") != _MINORDINAL or
+            int.from_bytes(header[12:16], "little") != count or
+            len(mm) != _DAY_TABLE_HEADER_SIZE + count * 4):
+        mm.close()
+        raise ValueError(f"{path!r} is not a cnlunardate day table")
+    table = memoryview(mm)[_DAY_TABLE_HEADER_SIZE:].cast(_DAY_TABLE_TYPECODE)
+    if sys.byteorder != "little":
+        table = array(_DAY_TABLE_TYPECODE, table)
+        table.byteswap()
+    _day_table = table
+    _day_table_enabled = True
+
+
+def _load_day_table():
+    with _init_lock:
+        if _day_table is None:
+            build_day_table()
+        return _day_table
+
+
+def enable_day_table():
+    """Opt in to the day-level lookup table, built on first use."""
+    global _day_table_enabled
+    _day_table_enabled = True
+
+
+def disable_day_table():
+    """Stop using the day-level lookup table and release it."""
+    global _day_table, _day_table_enabled
+    _day_table = None
+    _day_table_enabled = False
+
+
+def day_table_active():
+    """Return True if conversions are served from the day-level lookup table."""
+    return _day_table is not None
+
+
+# Years beyond the built-in tables, computed by the cnlunardate_astro module.
+
+_BUILTIN_YEAR_TABLES = (MIN_YEAR, _LUNAR_YEAR_DATA, _LUNAR_YEAR_FIRST_DAY_IN_SOLAR,
+                        MAX_DATE, _max_year_last_month_days, {})
+
+
+def _set_year_tables(min_year, lunar_data, first_days, max_date, last_month_days,
+                     solar_terms):
+    global MIN_YEAR, MAX_YEAR, MIN_DATE, MAX_DATE, _MINORDINAL, _MAXORDINAL
+    global _LUNAR_YEAR_DATA, _LUNAR_YEAR_FIRST_DAY_IN_SOLAR, _max_year_last_month_days
+    global _month_starts, _day_table, _np_month_index, _np_year_index
+    global _solar_term_ordinals, _extended_solar_terms, _np_solar_terms
+    with _init_lock:
+        _LUNAR_YEAR_DATA = lunar_data
+        _LUNAR_YEAR_FIRST_DAY_IN_SOLAR = first_days
+        _max_year_last_month_days = last_month_days
+        MIN_YEAR = min_year
+        MAX_YEAR = min_year + len(lunar_data) - 1
+        MIN_DATE = _convert_lunar_first_day_to_solar_by_idx(0)
+        MAX_DATE = max_date
+        _MINORDINAL = MIN_DATE.toordinal()
+        _MAXORDINAL = MAX_DATE.toordinal()
+        # Everything derived from the tables is rebuilt on next use.
+        _month_starts = None
+        _day_table = None
+        _np_month_index = _np_year_index = None
+        _extended_solar_terms = solar_terms
+        _solar_term_ordinals = _np_solar_terms = None
+        _monthcalendar.cache_clear()
+        _solarmonthcalendar.cache_clear()
+        _caches_cleared("monthcalendar", "solarmonthcalendar")
+        cnlunardate.min = cnlunardate(MIN_YEAR, 1, 1)
+        cnlunardate.max = _fromcode(_ord2code(_MAXORDINAL))
+        cnlunardatetime.min = _fromcodetime(cnlunardate.min._code, time.min)
+        cnlunardatetime.max = _fromcodetime(cnlunardate.max._code, time.max)
+
+
+def extend_years(first_year=None, last_year=None, cache=None):
+    """Extend the supported years with astronomically computed ones.
+
+    Years from first_year up to MIN_YEAR and from MAX_YEAR up to last_year
+    are computed by cnlunardate_astro, which caches them in a file (see
+    cnlunardate_astro.year_data() for cache), and the module constants,
+    cnlunardate.min and cnlunardate.max are updated. The supported years
+    never shrink, and conversions keep running from the same tables. Call
+    it before converting from other threads, which could otherwise see a
+    mix of the old and new tables.
+    """
+    import cnlunardate_astro
+    first_year = MIN_YEAR if first_year is None else _return_int_if_valid(first_year)
+    last_year = MAX_YEAR if last_year is None else _return_int_if_valid(last_year)
+    # The last computable year only gives the end of the one before.
+    lo, hi = cnlunardate_astro.MIN_YEAR, cnlunardate_astro.MAX_YEAR - 1
+    for year in first_year, last_year:
+        if not lo <= year <= hi:
+            raise ValueError(f"year {year} must be in {lo}..{hi}")
+    before = list(range(first_year, MIN_YEAR))
+    after = list(range(MAX_YEAR + 1, last_year + 2)) if last_year > MAX_YEAR else []
+    if not before and not after:
+        return
+    data = cnlunardate_astro.year_data(before + after, cache)
+    lunar_data = array("I", [data[y][0] for y in before])
+    lunar_data += _LUNAR_YEAR_DATA
+    lunar_data.extend(data[y][0] for y in after[:-1])
+    first_days = array("I", [data[y][1] for y in before])
+    first_days += _LUNAR_YEAR_FIRST_DAY_IN_SOLAR
+    first_days.extend(data[y][1] for y in after[:-1])
+    if after:
+        max_date = _convert_first_day_bits_to_solar(data[after[-1]][1]) - timedelta(1)
+        last_month_days = 0
+    else:
+        max_date = MAX_DATE
+        last_month_days = _max_year_last_month_days
+    solar_terms = dict(_extended_solar_terms)
+    solar_terms.update((y, data[y][2]) for y in before + after)
+    _set_year_tables(min(first_year, MIN_YEAR), lunar_data, first_days,
+                     max_date, last_month_days, solar_terms)
+
+
+def _check_ordinal(n):
+    if not _MINORDINAL <= n <= _MAXORDINAL:
+        raise ValueError(
+            f"ordinal {n} must be in {_MINORDINAL}..{_MAXORDINAL}")
+    return n
+
+
+def _ord2ymdl(n):
+    _check_ordinal(n)
+    if _day_table_enabled:
+        table = _day_table
+        if table is None:
+            table = _load_day_table()
+        return _unpack_ymdl(table[n - _MINORDINAL])
+    if _month_starts is None:
+        _load_month_index()
+    i = bisect_right(_month_starts, n) - 1
+    return (_month_years[i], _month_numbers[i],
+            n - _month_starts[i] + 1, _month_is_leap[i])
+
+
+def _solar2ord(s):
     if s < MIN_DATE or MAX_DATE < s:
         raise ValueError(f"date {s} must be in {MIN_DATE}..{MAX_DATE}")
-    idx = s.year - MIN_YEAR
-    solar_first_day = _convert_lunar_first_day_to_solar_by_idx(idx)
-    if s < solar_first_day:
-        idx -= 1
-        solar_first_day = _convert_lunar_first_day_to_solar_by_idx(idx)
-
-    # Why +1? To make days diff between 01/01 and 01/01 be 1 not 0
-    days_diff = (s - solar_first_day).days + 1
-    lunar_months = _convert_lunar_year_to_months_by_idx(idx)
-    for i in range(len(lunar_months)):
-        if days_diff > lunar_months[i][1]:
-            days_diff -= lunar_months[i][1]
-        else:
-            break
-    return solar_first_day.year, lunar_months[i][0], days_diff, lunar_months[i][2]
+    return s.toordinal()
+
 
+# A cnlunardate holds one integer, its ordinal followed by its fields:
+#
+# ordinal << 24 | year << 10 | month << 6 | isLeapMonth << 5 | day
+#
+# so that it orders, compares and hashes like the date, and every field
+# is a shift and a mask away.
 
-def _ymdl2solar(y, m, d, l):
-    idx = y - MIN_YEAR
-    solar_first_day = _convert_lunar_first_day_to_solar_by_idx(idx)
-    lunar_months = _convert_lunar_year_to_months_by_idx(idx)
-    days_diff = sum(month[1] for month in lunar_months if (month[0] < m) or (
-        month[0] == m and month[2] == False and l == True)) + d - 1
-    solar = solar_first_day + timedelta(days=days_diff)
-    return solar
+def _pack(n, y, m, d, l):
+    return n << 24 | y << 10 | m << 6 | l << 5 | d
+
+
+def _ord2code(n):
+    _check_ordinal(n)
+    if _day_table_enabled:
+        table = _day_table
+        if table is None:
+            table = _load_day_table()
+        return n << 24 | table[n - _MINORDINAL]
+    if _month_starts is None:
+        _load_month_index()
+    i = bisect_right(_month_starts, n) - 1
+    return n << 24 | _month_codes[i] | n - _month_starts[i] + 1
+
+
+def _ymdl2code(y, m, d, l):
+    # The fields must be valid.
+    if _month_starts is None:
+        _load_month_index()
+    info = _year_infos[y - MIN_YEAR]
+    n = (info._leap_start if l else info._regular_starts[m]) + d - 1
+    return n << 24 | y << 10 | m << 6 | l << 5 | d
 
 
 class cnlunardate:
@@ -234,13 +639,20 @@ class cnlunardate:
     fromsolardate()
     fromtimestamp()
     fromordinal()
+    fromisoformat()
+    fromchinese()
     today()
 
+    Iterators:
+
+    range()
+    solarrange()
+
     Operators:
 
-    __repr__, __str__
+    __repr__, __str__, __format__
     __eq__, __le__, __lt__, __ge__, __gt__, __hash__
-    __add__, __radd__, __sub__ (add/radd only with timedelta arg)
+    __add__, __radd__, __sub__ (add/radd only with timedelta or LunarDelta arg)
 
     Methods:
 
@@ -248,6 +660,8 @@ class cnlunardate:
     timetuple()
     toordinal()
     replace()
+    isoformat()
+    strftime()
 
     weekday()
     isoweekday()
@@ -255,8 +669,9 @@ class cnlunardate:
 
     Properties (read-only):
     year, month, day, isLeapMonth
+    yearGanzhi, monthGanzhi, dayGanzhi, zodiac
     """
-    __slots__ = '_year', '_month', '_day', '_isLeapMonth', '_hashcode'
+    __slots__ = '_code',
 
     def __new__(cls, year, month=None, day=None, isLeapMonth=False):
         """Constructor
@@ -281,16 +696,24 @@ class cnlunardate:
                         "pickle.load(data, encoding='latin1') is assumed.")
             self = object.__new__(cls)
             self.__setstate(year)
-            self._hashcode = -1
             return self
         year, month, day, isLeapMonth = _check_date_fields(
             year, month, day, isLeapMonth)
         self = object.__new__(cls)
-        self._year = year
-        self._month = month
-        self._day = day
-        self._isLeapMonth = isLeapMonth
-        self._hashcode = -1
+        self._code = _ymdl2code(year, month, day, isLeapMonth)
+        return self
+
+    @classmethod
+    def _fromvalidordinal(cls, n):
+        # n must already be in _MINORDINAL.._MAXORDINAL. Instances of the
+        # base class skip field validation and may be interned; subclasses
+        # still go through their own constructor.
+        if cls is not cnlunardate:
+            return cls(*_ord2ymdl(n))
+        if _intern_cache is not None:
+            return _intern(n)
+        self = object.__new__(cls)
+        self._code = _ord2code(n)
         return self
 
     # Additional constructors
@@ -298,141 +721,230 @@ class cnlunardate:
     @classmethod
     def fromsolardate(cls, s):
         """Construct a cnlunardate from a solar date."""
-        return cls(*_solar2ymdl(s))
+        return cls._fromvalidordinal(_solar2ord(s))
 
     @classmethod
-    def fromtimestamp(cls, t):
-        """Construct a cnlunardate from a POSIX timestamp (like time.time())."""
-        return cls.fromsolardate(date.fromtimestamp(t))
+    def fromtimestamp(cls, t, tz=None):
+        """Construct a cnlunardate from a POSIX timestamp (like time.time()).
+
+        The day is that of the local timezone, or of tz if given, such as
+        CHINA_TZ.
+        """
+        if tz is None:
+            return cls.fromsolardate(date.fromtimestamp(t))
+        return cls.fromsolardate(datetime.fromtimestamp(t, tz).date())
+
+    @classmethod
+    def fromisoformat(cls, date_string):
+        """Construct a cnlunardate from YYYY-MM-DD, or YYYY-LMM-DD in a leap month.
+
+        YYYY-MM-DDL, as formatted by strftime("%Y-%m-%d%L"), is also accepted.
+        """
+        return cls(*_parse_iso(date_string))
+
+    @classmethod
+    def fromchinese(cls, date_string, year=None):
+        """Construct a cnlunardate from a Chinese date such as 二〇一七年闰六月初一.
+
+        The year may be left out (农历六月廿三), and is then taken from year.
+        """
+        return cls(*_parse_chinese(date_string, year))
 
     @classmethod
     def fromordinal(cls, n):
         """Construct a cnlunardate from a proleptic Gregorian ordinal."""
-        return cls.fromsolardate(date.fromordinal(n))
+        return cls._fromvalidordinal(_check_ordinal(_return_int_if_valid(n)))
 
     @classmethod
     def today(cls):
         """Construct a cnlunardate from date.today()."""
         return cls.fromsolardate(date.today())
 
+    # Iteration
+
+    @classmethod
+    def range(cls, start, stop, step=timedelta(days=1)):
+        """Return an iterator of cnlunardates from start up to stop (excluded).
+
+        Like the builtin range(), a negative step counts down. Only the days
+        of step are used.
+        """
+        if not isinstance(start, cnlunardate) or not isinstance(stop, cnlunardate):
+            raise TypeError("start and stop must be cnlunardate")
+        return _iter_range(cls, start.toordinal(), stop.toordinal(), step)
+
+    @classmethod
+    def solarrange(cls, start, stop, step=timedelta(days=1)):
+        """Return an iterator of cnlunardates between two solar dates.
+
+        start must be within MIN_DATE..MAX_DATE; iteration also ends at the
+        edges of the supported range.
+        """
+        if start < MIN_DATE or MAX_DATE < start:
+            raise ValueError(f"date {start} must be in {MIN_DATE}..{MAX_DATE}")
+        stop = min(max(stop.toordinal(), _MINORDINAL - 1), _MAXORDINAL + 1)
+        return _iter_range(cls, start.toordinal(), stop, step)
+
     # Conversions to string
 
     def __repr__(self):
         """Convert to formal string, for repr()."""
         return f"{self.__class__.__module__}."\
             f"{self.__class__.__qualname__}"\
-            f"({self._year}, {self._month}, {self._day}, {self._isLeapMonth})"
+            f"({self.year}, {self.month}, {self.day}, {self.isLeapMonth})"
 
     __str__ = __repr__
 
+    def isoformat(self):
+        """Return the date formatted as YYYY-MM-DD, or YYYY-LMM-DD in a leap month."""
+        leap = "L" if self.isLeapMonth else ""
+        return f"{self.year:04d}-{leap}{self.month:02d}-{self.day:02d}"
+
+    def strftime(self, fmt):
+        """Format using strftime()-style directives.
+
+        %Y, %m and %d are the lunar fields, %L is L in a leap month, %N
+        and %D the month and day in Chinese (闰六月, 廿三), %C the year in
+        Chinese digits, %G its ganzhi and %Z its zodiac animal. %sX is
+        directive %X of the solar date, and %a, %A, %w and %u the weekday.
+        """
+        return _compile_format(fmt)(self._code)
+
+    def __format__(self, fmt):
+        if not isinstance(fmt, str):
+            raise TypeError(f"must be str, not {type(fmt).__name__}")
+        if len(fmt) != 0:
+            return self.strftime(fmt)
+        return str(self)
+
     # Read-only field accessors
 
     @property
     def year(self):
         """year (1900-2100)"""
-        return self._year
+        return self._code >> 10 & 0x3fff
 
     @property
     def month(self):
         """month (1-12)"""
-        return self._month
+        return self._code >> 6 & 15
 
     @property
     def day(self):
         """day (1-30)"""
-        return self._day
+        return self._code & 31
 
     @property
     def isLeapMonth(self):
         """isLeapMonth (bool)"""
-        return self._isLeapMonth
+        return self._code & 32 != 0
+
+    # Sexagenary cycle
+
+    @property
+    def yearGanzhi(self):
+        """yearGanzhi (str), of the lunar year"""
+        return GANZHI[(self.year - 4) % 60]
+
+    @property
+    def monthGanzhi(self):
+        """monthGanzhi (str), of the month between two odd solar terms"""
+        return GANZHI[_month_ganzhi_code(self.toordinal())]
+
+    @property
+    def dayGanzhi(self):
+        """dayGanzhi (str)"""
+        return GANZHI[(self.toordinal() + _DAY_GANZHI_OFFSET) % 60]
+
+    @property
+    def zodiac(self):
+        """zodiac (str), the animal of the lunar year"""
+        return ZODIAC_ANIMALS[(self.year - 4) % 12]
 
     # Standard conversions, __eq__, __le__, __lt__, __ge__, __gt__,
     # __hash__ (and helpers)
 
     def tosolardate(self):
         """Return a solar date for the cnlunardate."""
-        return _ymdl2solar(self._year, self._month, self._day, self._isLeapMonth)
+        return date.fromordinal(self.toordinal())
 
     def timetuple(self):
         """Return local time tuple compatible with time.localtime()."""
-        return _ymdl2solar(self._year, self._month, self._day, self._isLeapMonth).timetuple()
+        return date.fromordinal(self.toordinal()).timetuple()
 
     def toordinal(self):
         """Return a proleptic Gregorian ordinal for the cnlunardate."""
-        return _ymdl2solar(self._year, self._month, self._day, self._isLeapMonth).toordinal()
+        return self._code >> 24
 
     def replace(self, year=None, month=None, day=None, isLeapMonth=None):
         """Return a new cnlunardate with new values for the specified fields."""
         if year is None:
-            year = self._year
+            year = self.year
         if month is None:
-            month = self._month
+            month = self.month
         if day is None:
-            day = self._day
+            day = self.day
         if isLeapMonth is None:
-            isLeapMonth = self._isLeapMonth
+            isLeapMonth = self.isLeapMonth
         return type(self)(year, month, day, isLeapMonth)
 
-    # Comparisons of cnlunardate objects with other.
-
-    def _cmp(self, other):
-        assert isinstance(other, cnlunardate)
-        y, m, d, l = self._year, self._month, self._day, self._isLeapMonth
-        y2, m2, d2, l2 = other._year, other._month, other._day, other._isLeapMonth
-        return _cmp((y, m, d, l), (y2, m2, d2, l2))
+    # Comparisons of cnlunardate objects with other, in chronological order.
 
     def __eq__(self, other):
         if isinstance(other, cnlunardate):
-            return self._cmp(other) == 0
+            return self._code == other._code
         return NotImplemented
 
     def __le__(self, other):
         if isinstance(other, cnlunardate):
-            return self._cmp(other) <= 0
+            return self._code <= other._code
         return NotImplemented
 
     def __lt__(self, other):
         if isinstance(other, cnlunardate):
-            return self._cmp(other) < 0
+            return self._code < other._code
         return NotImplemented
 
     def __ge__(self, other):
         if isinstance(other, cnlunardate):
-            return self._cmp(other) >= 0
+            return self._code >= other._code
         return NotImplemented
 
     def __gt__(self, other):
         if isinstance(other, cnlunardate):
-            return self._cmp(other) > 0
+            return self._code > other._code
         return NotImplemented
 
     def __hash__(self):
-        if self._hashcode == -1:
-            self._hashcode = hash(self._getstate())
-        return self._hashcode
+        return hash(self._code)
 
     # Computations
 
     def __add__(self, other):
-        """Add a cnlunardate to a timedelta."""
+        """Add a cnlunardate to a timedelta or a LunarDelta."""
         if isinstance(other, timedelta):
             o = self.toordinal() + other.days
             if _MINORDINAL <= o <= _MAXORDINAL:
-                return type(self).fromordinal(o)
+                return type(self)._fromvalidordinal(o)
             raise OverflowError("result out of range")
+        if isinstance(other, LunarDelta):
+            return _add_lunar_delta(self, other, 1)
         return NotImplemented
 
     __radd__ = __add__
 
     def __sub__(self, other):
-        """Subtract two cnlunardates, or a cnlunardate and a timedelta."""
+        """Subtract two cnlunardates, or a cnlunardate and a timedelta or a
+        LunarDelta."""
         if isinstance(other, timedelta):
-            return self + timedelta(-other.days)
+            o = self.toordinal() - other.days
+            if _MINORDINAL <= o <= _MAXORDINAL:
+                return type(self)._fromvalidordinal(o)
+            raise OverflowError("result out of range")
+        if isinstance(other, LunarDelta):
+            return _add_lunar_delta(self, other, -1)
         if isinstance(other, cnlunardate):
-            days1 = self.toordinal()
-            days2 = other.toordinal()
-            return timedelta(days1 - days2)
+            return timedelta(self.toordinal() - other.toordinal())
         return NotImplemented
 
     def weekday(self):
@@ -447,22 +959,1650 @@ class cnlunardate:
 
     def isocalendar(self):
         """Return a 3-tuple containing ISO year, week number, and weekday."""
-        return _ymdl2solar(self._year, self._month, self._day, self._isLeapMonth).isocalendar()
+        return date.fromordinal(self.toordinal()).isocalendar()
 
     # Pickle support.
 
     def _getstate(self):
-        yhi, ylo = divmod(self._year, 256)
-        return bytes([yhi, ylo, self._month, self._day, self._isLeapMonth]),
+        code = self._code
+        yhi, ylo = divmod(code >> 10 & 0x3fff, 256)
+        return bytes([yhi, ylo, code >> 6 & 15, code & 31, code >> 5 & 1]),
 
     def __setstate(self, string):
-        yhi, ylo, self._month, self._day, self._isLeapMonth = string
-        self._year = yhi * 256 + ylo
+        yhi, ylo, m, d, l = string
+        self._code = _ymdl2code(*_check_date_fields(yhi * 256 + ylo, m, d, bool(l)))
 
     def __reduce__(self):
         return (self.__class__, self._getstate())
 
 
-cnlunardate.min = cnlunardate(1900, 1, 1)
-cnlunardate.max = cnlunardate(2100, 12, 1)
+# Interning of cnlunardate instances
+
+InternInfo = namedtuple("InternInfo", "hits misses maxsize currsize")
+
+# Hits only read the cache dict, published through _intern_cache, so that
+# interned constructors never take a lock. _intern_lock is taken on misses
+# to insert and evict, oldest first, and when the cache is reconfigured.
+# Each thread counts its own hits and misses, summed by _intern_counts().
+_intern_cache = None  # dict of ordinal -> cnlunardate when enabled
+_intern_order = None  # deque of the ordinals of _intern_cache, the clock
+_intern_referenced = set()  # ordinals hit since the clock hand passed them
+_intern_maxsize = 0
+_intern_lock = RLock()
+_intern_local = _local()
+_intern_counters = {}  # id -> weakref to the _InternCounter of a live thread
+_intern_retired = [0, 0]  # [hits, misses] of the threads that have ended
+
+
+class _InternCounter(list):
+    # The [hits, misses] of one thread. It lives in thread-local storage,
+    # and folds itself into _intern_retired when its thread ends.
+    __slots__ = '__weakref__',
+
+    # The globals are bound as defaults, as the main thread's counter may
+    # only be released after the module is torn down at exit.
+    def __del__(self, lock=_intern_lock, counters=_intern_counters,
+                retired=_intern_retired):
+        with lock:
+            counters.pop(id(self), None)
+            retired[0] += self[0]
+            retired[1] += self[1]
+
+
+def _intern_counter():
+    try:
+        return _intern_local.counter
+    except AttributeError:
+        counter = _intern_local.counter = _InternCounter((0, 0))
+        _intern_counters[id(counter)] = ref(counter)  # atomic, no lock needed
+        return counter
+
+
+def _intern_counts():
+    with _intern_lock:
+        hits, misses = _intern_retired
+        for counter in list(_intern_counters.values()):
+            counter = counter()
+            if counter is not None:
+                hits += counter[0]
+                misses += counter[1]
+    return hits, misses
+
+
+def _intern(n):
+    cache = _intern_cache
+    if cache is None:  # disabled by another thread
+        return cnlunardate(*_ord2ymdl(n))
+    self = cache.get(n)
+    if self is not None:
+        _intern_referenced.add(n)
+        _intern_counter()[0] += 1
+        return self
+    self = object.__new__(cnlunardate)
+    self._code = _ord2code(n)
+    _intern_counter()[1] += 1
+    with _intern_lock:
+        cache = _intern_cache
+        if cache is None:
+            return self
+        other = cache.get(n)
+        if other is not None:  # inserted by another thread meanwhile
+            return other
+        cache[n] = self
+        _intern_referenced.discard(n)
+        _intern_order.append(n)
+        if len(_intern_order) > _intern_maxsize:
+            _intern_evict()
+    return self
+
+
+def _intern_evict():
+    # Approximate LRU with the CLOCK algorithm, so that hits only have to
+    # set a reference bit: entries hit since the hand last passed them get
+    # a second chance. Called with _intern_lock held.
+    order = _intern_order
+    n = order.popleft()
+    for _ in range(len(order)):
+        if n not in _intern_referenced:
+            break
+        _intern_referenced.discard(n)
+        order.append(n)
+        n = order.popleft()
+    _intern_referenced.discard(n)
+    del _intern_cache[n]
+
+
+def enable_interning(maxsize=8192):
+    """Share cnlunardate instances created from ordinals.
+
+    fromsolardate(), fromordinal(), fromtimestamp(), today() and timedelta
+    arithmetic then return instances from a cache holding up to maxsize
+    dates, roughly the least recently used evicted first. Instances built
+    with the constructor and instances of subclasses are never interned.
+    """
+    global _intern_cache, _intern_order, _intern_maxsize
+    maxsize = _return_int_if_valid(maxsize)
+    if maxsize < 1:
+        raise ValueError(f"maxsize {maxsize} must be positive")
+    with _intern_lock:
+        if _intern_cache is None:
+            _intern_order = deque()
+            _intern_cache = {}
+        _intern_maxsize = maxsize
+        while len(_intern_order) > maxsize:
+            _intern_evict()
+
+
+def disable_interning():
+    """Stop interning cnlunardate instances and drop the cache."""
+    global _intern_cache, _intern_order, _intern_maxsize
+    with _intern_lock:
+        _intern_cache = _intern_order = None
+        _intern_referenced.clear()
+        _intern_maxsize = 0
+
+
+def clear_intern_cache():
+    """Empty the intern cache and reset its statistics."""
+    with _intern_lock:
+        if _intern_cache is not None:
+            _intern_cache.clear()
+            _intern_order.clear()
+        _intern_referenced.clear()
+        _intern_retired[:] = 0, 0
+        _caches_cleared("intern")
+        for counter in list(_intern_counters.values()):
+            counter = counter()
+            if counter is not None:
+                counter[0] = counter[1] = 0
+
+
+def intern_info():
+    """Report intern cache statistics as an InternInfo named tuple.
+
+    hits and misses are counted by each thread without locking, and may
+    be slightly behind while other threads are converting.
+    """
+    cache = _intern_cache
+    return InternInfo(*_intern_counts(), _intern_maxsize,
+                      0 if cache is None else len(cache))
+
+
+def _iter_range(cls, n, stop, step):
+    if not isinstance(step, timedelta):
+        raise TypeError(
+            f"step must be timedelta (got type {type(step).__name__})")
+    step = step.days
+    if step == 0:
+        raise ValueError("step must not be zero")
+    return _iter_ordinals(cls, n, stop, step)
+
+
+def _iter_ordinals(cls, n, stop, step):
+    # Advance the month index and the day counter together instead of
+    # converting every ordinal from scratch.
+    if _month_starts is None:
+        _load_month_index()
+    starts, days = _month_starts, _month_days
+    i = bisect_right(starts, n) - 1
+    day = n - starts[i] + 1
+    while n < stop if step > 0 else n > stop:
+        if cls is cnlunardate:
+            self = object.__new__(cls)
+            self._code = n << 24 | _month_codes[i] | day
+            yield self
+        else:
+            yield cls(_month_years[i], _month_numbers[i], day, _month_is_leap[i])
+        n += step
+        day += step
+        if not (n < stop if step > 0 else n > stop):
+            break
+        while day > days[i]:
+            day -= days[i]
+            i += 1
+        while day < 1:
+            i -= 1
+            day += days[i]
+
+
+def _fromcode(code):
+    self = object.__new__(cnlunardate)
+    self._code = code
+    return self
+
+
+# Built from their known ordinals, as the month index is not loaded yet.
+cnlunardate.min = _fromcode(_pack(_MINORDINAL, 1900, 1, 1, False))
+cnlunardate.max = _fromcode(_pack(_MAXORDINAL, 2100, 12, 1, False))
 cnlunardate.resolution = timedelta(days=1)
+
+
+class cnlunardatetime(cnlunardate):
+    """A cnlunardate with a time of day and an optional tzinfo.
+
+    Like datetime.datetime, instances are naive or aware. The constructors
+    from timestamps and the current time give aware instances in CHINA_TZ
+    by default, so that lunar days start at Beijing midnight whatever the
+    local timezone. Arithmetic, comparisons and hashing follow those of the
+    solar datetime, and strftime() formats the date fields only.
+
+    Constructors:
+
+    __new__()
+    combine()
+    fromsolardatetime()
+    fromtimestamp()
+    now(), today()
+
+    Methods:
+
+    date(), time(), timetz()
+    tosolardatetime()
+    timestamp()
+    utcoffset()
+    astimezone()
+    isoformat()
+
+    Properties (read-only):
+    hour, minute, second, microsecond, tzinfo
+    """
+    __slots__ = '_time',
+
+    def __new__(cls, year, month, day, isLeapMonth=False, hour=0, minute=0,
+                second=0, microsecond=0, tzinfo=None):
+        self = cnlunardate.__new__(cls, year, month, day, isLeapMonth)
+        self._time = time(hour, minute, second, microsecond, tzinfo)
+        return self
+
+    @classmethod
+    def _fromordinaltime(cls, n, t):
+        # n must be in _MINORDINAL.._MAXORDINAL and t a datetime.time.
+        if cls is not cnlunardatetime:
+            return cls(*_ord2ymdl(n), t.hour, t.minute, t.second, t.microsecond,
+                       t.tzinfo)
+        self = object.__new__(cls)
+        self._code = _ord2code(n)
+        self._time = t
+        return self
+
+    # Additional constructors
+
+    @classmethod
+    def combine(cls, d, t):
+        """Construct a cnlunardatetime from a cnlunardate and a datetime.time."""
+        if not isinstance(d, cnlunardate):
+            raise TypeError(f"a cnlunardate is required (got type {type(d).__name__})")
+        if not isinstance(t, time):
+            raise TypeError(f"a time is required (got type {type(t).__name__})")
+        return cls._fromordinaltime(d.toordinal(), t)
+
+    @classmethod
+    def fromsolardatetime(cls, dt, tz=None):
+        """Construct a cnlunardatetime from a datetime.datetime.
+
+        dt is first converted to tz if given, then its wall time and tzinfo
+        are kept.
+        """
+        if not isinstance(dt, datetime):
+            raise TypeError(f"a datetime is required (got type {type(dt).__name__})")
+        if tz is not None:
+            dt = dt.astimezone(tz)
+        return cls._fromordinaltime(_solar2ord(dt.date()), dt.timetz())
+
+    @classmethod
+    def fromtimestamp(cls, t, tz=CHINA_TZ):
+        """Construct a cnlunardatetime from a POSIX timestamp.
+
+        The result is in tz, CHINA_TZ by default, or naive in the local
+        timezone if tz is None.
+        """
+        return cls.fromsolardatetime(datetime.fromtimestamp(t, tz))
+
+    @classmethod
+    def now(cls, tz=CHINA_TZ):
+        """Construct a cnlunardatetime from the current time in tz, as fromtimestamp()."""
+        return cls.fromsolardatetime(datetime.now(tz))
+
+    @classmethod
+    def today(cls):
+        """Construct a cnlunardatetime from the current time in CHINA_TZ."""
+        return cls.now()
+
+    # Conversions to string
+
+    def __repr__(self):
+        """Convert to formal string, for repr()."""
+        t = self._time
+        args = (f"{self.year}, {self.month}, {self.day}, {self.isLeapMonth}, "
+                f"{t.hour}, {t.minute}")
+        if t.second or t.microsecond:
+            args += f", {t.second}"
+        if t.microsecond:
+            args += f", {t.microsecond}"
+        if t.tzinfo is not None:
+            args += f", tzinfo={t.tzinfo!r}"
+        return f"{self.__class__.__module__}.{self.__class__.__qualname__}({args})"
+
+    __str__ = __repr__
+
+    def isoformat(self, sep="T", timespec="auto"):
+        """Return the date as by cnlunardate.isoformat(), then sep and the time."""
+        return (cnlunardate.isoformat(self) + sep +
+                self._time.isoformat(timespec))
+
+    # Read-only field accessors
+
+    @property
+    def hour(self):
+        """hour (0-23)"""
+        return self._time.hour
+
+    @property
+    def minute(self):
+        """minute (0-59)"""
+        return self._time.minute
+
+    @property
+    def second(self):
+        """second (0-59)"""
+        return self._time.second
+
+    @property
+    def microsecond(self):
+        """microsecond (0-999999)"""
+        return self._time.microsecond
+
+    @property
+    def tzinfo(self):
+        """timezone info object"""
+        return self._time.tzinfo
+
+    # Standard conversions
+
+    def date(self):
+        """Return the cnlunardate part."""
+        return _fromcode(self._code)
+
+    def time(self):
+        """Return the time part, with tzinfo None."""
+        return self._time.replace(tzinfo=None)
+
+    def timetz(self):
+        """Return the time part, with the same tzinfo."""
+        return self._time
+
+    def tosolardatetime(self):
+        """Return a solar datetime.datetime for the cnlunardatetime."""
+        return datetime.combine(date.fromordinal(self.toordinal()), self._time)
+
+    def timetuple(self):
+        """Return local time tuple compatible with time.localtime()."""
+        return self.tosolardatetime().timetuple()
+
+    def timestamp(self):
+        """Return the POSIX timestamp, naive instances being in local time."""
+        return self.tosolardatetime().timestamp()
+
+    def utcoffset(self):
+        """Return the UTC offset of tzinfo, None if naive."""
+        return self._time.utcoffset()
+
+    def astimezone(self, tz=CHINA_TZ):
+        """Return the same instant in tz, CHINA_TZ by default."""
+        return type(self).fromsolardatetime(self.tosolardatetime(), tz)
+
+    def replace(self, year=None, month=None, day=None, isLeapMonth=None,
+                hour=None, minute=None, second=None, microsecond=None, tzinfo=True):
+        """Return a new cnlunardatetime with new values for the specified fields."""
+        t = self._time
+        return type(self)(
+            self.year if year is None else year,
+            self.month if month is None else month,
+            self.day if day is None else day,
+            self.isLeapMonth if isLeapMonth is None else isLeapMonth,
+            t.hour if hour is None else hour,
+            t.minute if minute is None else minute,
+            t.second if second is None else second,
+            t.microsecond if microsecond is None else microsecond,
+            t.tzinfo if tzinfo is True else tzinfo)
+
+    # Comparisons, as those of the solar datetimes. Comparing with a
+    # cnlunardate is an error, and == is False, as for datetime and date.
+
+    def _cmp_other(self, other):
+        if isinstance(other, cnlunardatetime):
+            return other.tosolardatetime()
+        if isinstance(other, cnlunardate):
+            raise TypeError(f"can't compare {type(self).__name__} to "
+                            f"{type(other).__name__}")
+        return NotImplemented
+
+    def __eq__(self, other):
+        if isinstance(other, cnlunardatetime):
+            return self.tosolardatetime() == other.tosolardatetime()
+        if isinstance(other, cnlunardate):
+            return False
+        return NotImplemented
+
+    def __le__(self, other):
+        other = self._cmp_other(other)
+        return other if other is NotImplemented else self.tosolardatetime() <= other
+
+    def __lt__(self, other):
+        other = self._cmp_other(other)
+        return other if other is NotImplemented else self.tosolardatetime() < other
+
+    def __ge__(self, other):
+        other = self._cmp_other(other)
+        return other if other is NotImplemented else self.tosolardatetime() >= other
+
+    def __gt__(self, other):
+        other = self._cmp_other(other)
+        return other if other is NotImplemented else self.tosolardatetime() > other
+
+    def __hash__(self):
+        return hash(self.tosolardatetime())
+
+    # Computations
+
+    def __add__(self, other):
+        """Add a cnlunardatetime to a timedelta or a LunarDelta."""
+        if isinstance(other, timedelta):
+            dt = self.tosolardatetime() + other
+            n = dt.toordinal()
+            if _MINORDINAL <= n <= _MAXORDINAL:
+                return type(self)._fromordinaltime(n, dt.timetz())
+            raise OverflowError("result out of range")
+        if isinstance(other, LunarDelta):
+            n = _add_lunar_delta(self, other, 1).toordinal()
+            return type(self)._fromordinaltime(n, self._time)
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        """Subtract two cnlunardatetimes, or a cnlunardatetime and a
+        timedelta or a LunarDelta."""
+        if isinstance(other, (timedelta, LunarDelta)):
+            return self + -other
+        if isinstance(other, cnlunardatetime):
+            return self.tosolardatetime() - other.tosolardatetime()
+        return NotImplemented
+
+    def __rsub__(self, other):
+        # Checked before cnlunardate.__sub__, which would drop the time.
+        if isinstance(other, cnlunardate):
+            raise TypeError(f"unsupported operand type(s) for -: "
+                            f"'{type(other).__name__}' and '{type(self).__name__}'")
+        return NotImplemented
+
+    # Pickle support.
+
+    def __reduce__(self):
+        t = self._time
+        return (self.__class__, (self.year, self.month, self.day, self.isLeapMonth,
+                                 t.hour, t.minute, t.second, t.microsecond, t.tzinfo))
+
+
+def _fromcodetime(code, t):
+    self = object.__new__(cnlunardatetime)
+    self._code = code
+    self._time = t
+    return self
+
+
+cnlunardatetime.min = _fromcodetime(cnlunardate.min._code, time.min)
+cnlunardatetime.max = _fromcodetime(cnlunardate.max._code, time.max)
+cnlunardatetime.resolution = timedelta(microseconds=1)
+
+
+# Lunar month and year arithmetic
+#
+# Months are numbered consecutively by their position in the month index,
+# leap months included, so adding months is an index addition.
+
+_MISSING_DAY_POLICIES = ("last", "next", "raise")
+_MISSING_LEAP_POLICIES = ("regular", "raise")
+
+
+class LunarDelta:
+    """A difference of lunar years, months and days, to add to cnlunardates.
+
+    Years are added first, keeping the month and its leap flag, then
+    months, leap months counting like the others, then days. missing says
+    what to do when the month reached has no such day (day 30 of a month
+    of 29 days): use its "last" day, the first of the "next" month, or
+    "raise" ValueError. leap says what to do when the year reached has no
+    such leap month: use the "regular" month, or "raise" ValueError.
+
+    Supported operators: ==, hash(), unary -, + and - with a LunarDelta
+    (the policies are those of the left operand), * with an integer.
+    """
+    __slots__ = '_years', '_months', '_days', '_missing', '_leap', '_hashcode'
+
+    def __new__(cls, years=0, months=0, days=0, missing="last", leap="regular"):
+        if missing not in _MISSING_DAY_POLICIES:
+            raise ValueError(f"missing {missing!r} must be one of {_MISSING_DAY_POLICIES}")
+        if leap not in _MISSING_LEAP_POLICIES:
+            raise ValueError(f"leap {leap!r} must be one of {_MISSING_LEAP_POLICIES}")
+        self = object.__new__(cls)
+        self._years = _return_int_if_valid(years)
+        self._months = _return_int_if_valid(months)
+        self._days = _return_int_if_valid(days)
+        self._missing = missing
+        self._leap = leap
+        self._hashcode = -1
+        return self
+
+    def __repr__(self):
+        """Convert to formal string, for repr()."""
+        args = f"years={self._years}, months={self._months}, days={self._days}"
+        if self._missing != "last":
+            args += f", missing={self._missing!r}"
+        if self._leap != "regular":
+            args += f", leap={self._leap!r}"
+        return f"{self.__class__.__module__}.{self.__class__.__qualname__}({args})"
+
+    @property
+    def years(self):
+        """years (int)"""
+        return self._years
+
+    @property
+    def months(self):
+        """months (int)"""
+        return self._months
+
+    @property
+    def days(self):
+        """days (int)"""
+        return self._days
+
+    @property
+    def missing(self):
+        """missing (str), the policy for a missing day"""
+        return self._missing
+
+    @property
+    def leap(self):
+        """leap (str), the policy for a missing leap month"""
+        return self._leap
+
+    def _getstate(self):
+        return self._years, self._months, self._days, self._missing, self._leap
+
+    def _replace_counts(self, years, months, days):
+        return type(self)(years, months, days, self._missing, self._leap)
+
+    def __eq__(self, other):
+        if isinstance(other, LunarDelta):
+            return self._getstate() == other._getstate()
+        return NotImplemented
+
+    def __hash__(self):
+        if self._hashcode == -1:
+            self._hashcode = hash(self._getstate())
+        return self._hashcode
+
+    def __bool__(self):
+        return bool(self._years or self._months or self._days)
+
+    def __neg__(self):
+        return self._replace_counts(-self._years, -self._months, -self._days)
+
+    def __add__(self, other):
+        if isinstance(other, LunarDelta):
+            return self._replace_counts(self._years + other._years,
+                                        self._months + other._months,
+                                        self._days + other._days)
+        return NotImplemented
+
+    def __sub__(self, other):
+        if isinstance(other, LunarDelta):
+            return self + -other
+        return NotImplemented
+
+    def __mul__(self, other):
+        if isinstance(other, int) and not isinstance(other, bool):
+            return self._replace_counts(self._years * other, self._months * other,
+                                        self._days * other)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __reduce__(self):
+        return (self.__class__, self._getstate())
+
+
+def _month_seq(d):
+    # The position of d's month in the month index.
+    if _month_starts is None:
+        _load_month_index()
+    idx = d.year - MIN_YEAR
+    return _year_first_month[idx] + _month_pos_in_year(idx, d.month, d.isLeapMonth)
+
+
+def _add_lunar_delta(d, delta, sign):
+    y, m, day, l = d.year, d.month, d.day, d.isLeapMonth
+    if delta._years:
+        y += sign * delta._years
+        if not MIN_YEAR <= y <= MAX_YEAR:
+            raise OverflowError("result out of range")
+        if _month_starts is None:
+            _load_month_index()
+        if l and _year_leap_month[y - MIN_YEAR] != m:
+            if delta._leap == "raise":
+                raise ValueError(f"month {m} is not leap in {y}")
+            l = False
+        idx = y - MIN_YEAR
+        i = _year_first_month[idx] + _month_pos_in_year(idx, m, l)
+    else:
+        i = _month_seq(d)
+    i += sign * delta._months
+    if not 0 <= i < len(_month_starts):
+        raise OverflowError("result out of range")
+    month_days = _month_days[i]
+    if day > month_days:
+        if i == len(_month_starts) - 1 and _max_year_last_month_days:
+            raise OverflowError("result out of range")
+        if delta._missing == "raise":
+            raise ValueError(f"day {day} must be in 1..{month_days}")
+        day = month_days if delta._missing == "last" else month_days + 1
+    o = _month_starts[i] + day - 1 + sign * delta._days
+    if _MINORDINAL <= o <= _MAXORDINAL:
+        return type(d)._fromvalidordinal(o)
+    raise OverflowError("result out of range")
+
+
+def months_between(start, end):
+    """Return the number of whole lunar months from start to end.
+
+    Leap months count like the others. The count is the largest one that
+    added to start (as LunarDelta(months=count)) does not pass end, and is
+    negative if end is before start.
+    """
+    if not isinstance(start, cnlunardate) or not isinstance(end, cnlunardate):
+        raise TypeError("start and end must be cnlunardate")
+    i = _month_seq(start)
+    n = _month_seq(end) - i
+    if n:
+        j = i + n
+        month_days = _month_days[j]
+        if j == len(_month_starts) - 1 and _max_year_last_month_days:
+            month_days = 30  # the rest of the month is past MAX_DATE
+        o = _month_starts[j] + min(start.day, month_days) - 1
+        e = end.toordinal()
+        if n > 0 and o > e:
+            n -= 1
+        elif n < 0 and o < e:
+            n += 1
+    return n
+
+
+# Month calendars
+
+_CALENDAR_CACHE_SIZE = 256
+
+
+def _check_firstweekday(firstweekday):
+    firstweekday = _return_int_if_valid(firstweekday)
+    if not 0 <= firstweekday <= 6:
+        raise ValueError(f"firstweekday {firstweekday} must be in 0..6")
+    return firstweekday
+
+
+def _weeks(cells, first_ordinal, firstweekday):
+    lead = ((first_ordinal + 6) % 7 - firstweekday) % 7
+    cells = [None] * lead + cells
+    cells += [None] * (-len(cells) % 7)
+    return tuple(tuple(cells[i:i + 7]) for i in range(0, len(cells), 7))
+
+
+@lru_cache(maxsize=_CALENDAR_CACHE_SIZE)
+def _monthcalendar(year, month, isLeapMonth, firstweekday):
+    info = _year_infos[year - MIN_YEAR]
+    if isLeapMonth:
+        first, days = info._leap_start, info._leap_days
+    else:
+        first, days = info._regular_starts[month], info._regular_days[month]
+    weeks = _weeks(list(range(1, days + 1)), first, firstweekday)
+    return tuple(tuple(0 if d is None else d for d in week) for week in weeks)
+
+
+def monthcalendar(year, month, isLeapMonth=False, firstweekday=0):
+    """Return a lunar month's calendar as a tuple of weeks.
+
+    Like calendar.monthcalendar(), each week is a 7-tuple of day numbers
+    starting on firstweekday (0 is Monday), and days outside the month are
+    0. Results are cached.
+    """
+    year, month, _, isLeapMonth = _check_date_fields(year, month, 1, isLeapMonth)
+    return _monthcalendar(year, month, isLeapMonth,
+                          _check_firstweekday(firstweekday))
+
+
+@lru_cache(maxsize=_CALENDAR_CACHE_SIZE)
+def _solarmonthcalendar(year, month, firstweekday):
+    first = date(year, month, 1).toordinal()
+    end = (date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)).toordinal()
+    lo, hi = max(first, _MINORDINAL), min(end, _MAXORDINAL + 1)
+    lunar = [None] * (lo - first)
+    if lo < hi:
+        lunar += _iter_ordinals(cnlunardate, lo, hi, 1)
+    lunar += [None] * (end - first - len(lunar))
+    return _weeks([(d + 1, l) for d, l in enumerate(lunar)], first, firstweekday)
+
+
+def solarmonthcalendar(year, month, firstweekday=0):
+    """Return a solar month's calendar annotated with lunar dates.
+
+    Each week is a 7-tuple starting on firstweekday (0 is Monday). Days of
+    the month are (day, cnlunardate) pairs, with None instead of the
+    cnlunardate outside MIN_DATE..MAX_DATE, and days outside the month are
+    None. Results are cached.
+    """
+    year = _return_int_if_valid(year)
+    month = _return_int_if_valid(month)
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        raise ValueError(f"year {year} must be in {MIN_YEAR}..{MAX_YEAR}")
+    if not 1 <= month <= 12:
+        raise ValueError(f"month {month} must be in 1..12")
+    return _solarmonthcalendar(year, month, _check_firstweekday(firstweekday))
+
+
+# Recurrence rules
+#
+# rrule() jumps from one occurrence to the next through the month index,
+# so each costs a few list lookups whatever the distance between them.
+
+YEARLY = "yearly"
+MONTHLY = "monthly"
+
+_LEAP_POLICIES = ("skip", "both", "regular")
+_MISSING_POLICIES = ("skip", "last", "next")
+
+
+def rrule(freq, start, stop=None, month=None, day=1, isLeapMonth=False,
+          interval=1, leap=None, missing="skip"):
+    """Return an iterator of the cnlunardates matching a recurrence rule.
+
+    freq is YEARLY, on the given month (and leap flag) of every lunar
+    year, or MONTHLY, on every lunar month, and interval keeps one period
+    in that many starting from the one of start. day is 1..30, or -1..-29
+    to count from the end of the month (-1 is the last day).
+
+    leap says what to do with leap months: "skip" ignores them, "both" also
+    uses the leap month after month (and every leap month with MONTHLY),
+    and "regular" uses the regular month in the years that lack the leap
+    month asked for. It defaults to "both" for MONTHLY and "skip" for
+    YEARLY. missing says what to do when the month has no day 30: "skip"
+    it, use the "last" day of the month, or the first of the "next" month.
+
+    Occurrences run from start up to stop (excluded), dates or
+    cnlunardates; start must be supported and stop defaults to the end of
+    the supported range.
+    """
+    if freq not in (YEARLY, MONTHLY):
+        raise ValueError(f"freq {freq!r} must be YEARLY or MONTHLY")
+    if leap is None:
+        leap = "both" if freq == MONTHLY else "skip"
+    if leap not in _LEAP_POLICIES:
+        raise ValueError(f"leap {leap!r} must be one of {_LEAP_POLICIES}")
+    if missing not in _MISSING_POLICIES:
+        raise ValueError(f"missing {missing!r} must be one of {_MISSING_POLICIES}")
+    day = _return_int_if_valid(day)
+    if not (1 <= day <= 30 or -29 <= day <= -1):
+        raise ValueError(f"day {day} must be in 1..30 or -29..-1")
+    interval = _return_int_if_valid(interval)
+    if interval < 1:
+        raise ValueError(f"interval {interval} must be positive")
+    isLeapMonth = _return_bool_if_valid(isLeapMonth)
+    if freq == YEARLY:
+        month = _return_int_if_valid(month)
+        if not 1 <= month <= 12:
+            raise ValueError(f"month {month} must be in 1..12")
+    elif month is not None or isLeapMonth:
+        raise ValueError("month and isLeapMonth only apply to YEARLY")
+    n = _check_ordinal(start.toordinal())
+    stop = _MAXORDINAL + 1 if stop is None else min(stop.toordinal(), _MAXORDINAL + 1)
+    if _month_starts is None:
+        _load_month_index()
+    if freq == YEARLY:
+        months = _yearly_months(n, month, isLeapMonth, interval, leap)
+    else:
+        months = _monthly_months(n, interval, leap)
+    return _iter_occurrences(months, n, stop, day, missing)
+
+
+def _yearly_months(n, month, isLeapMonth, interval, leap):
+    # The month indexes of a YEARLY rule, in chronological order.
+    for idx in range(_ord2ymdl(n)[0] - MIN_YEAR, len(_LUNAR_YEAR_DATA), interval):
+        i = _year_first_month[idx]
+        has_leap = _year_leap_month[idx] == month
+        if isLeapMonth:
+            if has_leap:
+                yield i + month
+            elif leap == "regular":
+                yield i + _month_pos_in_year(idx, month, False)
+        else:
+            yield i + _month_pos_in_year(idx, month, False)
+            if has_leap and leap == "both":
+                yield i + month
+
+
+def _monthly_months(n, interval, leap):
+    # The month indexes of a MONTHLY rule.
+    count = 0
+    for i in range(bisect_right(_month_starts, n) - 1, len(_month_starts)):
+        if leap == "skip" and _month_is_leap[i]:
+            continue
+        if count % interval == 0:
+            yield i
+        count += 1
+
+
+def _iter_occurrences(months, n, stop, day, missing):
+    starts, days, last = _month_starts, _month_days, len(_month_starts) - 1
+    for i in months:
+        month_days = days[i]
+        d = day + month_days + 1 if day < 0 else day
+        if i == last and _max_year_last_month_days and (day < 0 or d > month_days):
+            return  # the rest of the month is past MAX_DATE
+        if d > month_days:
+            if missing == "skip":
+                continue
+            if missing == "last":
+                d = month_days
+            else:
+                i, d = i + 1, 1
+                if i > last:
+                    return
+        o = starts[i] + d - 1
+        if o >= stop:
+            return
+        if o < n:
+            continue
+        if _intern_cache is not None:
+            yield _intern(o)
+            continue
+        self = object.__new__(cnlunardate)
+        self._code = o << 24 | _month_codes[i] | d
+        yield self
+
+
+# Solar terms
+#
+# _SOLAR_TERM_DATA holds 6 bytes per solar year from 1900 to 2100, a
+# big-endian integer with 2 bits per term in calendar order from the
+# lowest bits: term k falls on day _SOLAR_TERM_BASE_DAYS[k] plus those
+# bits of month k // 2 + 1. It is decoded on first use into a sorted
+# array of ordinals, together with the years added by extend_years().
+
+SOLAR_TERMS = ("小寒", "大寒", "立春", "雨水", "惊蛰", "春分",
+               "清明", "谷雨", "立夏", "小满", "芒种", "夏至",
+               "小暑", "大暑", "立秋", "处暑", "白露", "秋分",
+               "寒露", "霜降", "立冬", "小雪", "大雪", "冬至")
+
+SolarTerm = namedtuple("SolarTerm", "index name date")
+
+_SOLAR_TERM_FIRST_YEAR = 1900
+_SOLAR_TERM_BASE_DAYS = (4, 19, 3, 18, 4, 19, 4, 19, 4, 20, 4, 20,
+                         6, 22, 6, 22, 6, 22, 7, 22, 6, 21, 6, 21)
+_SOLAR_TERM_DATA = bytes.fromhex(
+    "5aa665a65a566aaaa6aa9a5aaaaaaabaaa6aaaabbabbafaa5aa665a65aab"  # 1900-1904
+    "6aaaa6aa9a5aaaaaaaaaaa6aaaabbabbafaa5aa665a65aab6aaaa6aa9a5a"  # 1905-1909
+    "aaaaaaaaaa6aaaabbabbafaa56a665a65aab6aa6a6aa9a56aaaaaaaa9a5a"  # 1910-1914
+    "aaabaabaaeaa569665a65aaa6aa6a6a69a566aaaaaaa9a5aaaabaabaaeaa"  # 1915-1919
+    "569665a65aaa5aa6a6a65a566aaaaaaa9a5aaaabaabaaa6a569665a65aaa"  # 1920-1924
+    "5aa6a6a65a566aaaa6aa9a5aaaabaabaaa6a555665a65aaa5aa665a65a56"  # 1925-1929
+    "6aaaa6aa9a5aaaaaaabaaa6a555665665aaa5aa665a65a566aaaa6aa9a5a"  # 1930-1934
+    "aaaaaaaaaa6a555665665aaa5aa665a65a566aaaa6aa9a5aaaaaaaaaaa6a"  # 1935-1939
+    "555665665aaa5aa665a65a566aaaa6aa9a5aaaaaaaaaaa6a555665655aaa"  # 1940-1944
+    "569665a65a566aa6a6aa9a56aaaaaaaa9a5a5556556559aa569665a65a55"  # 1945-1949
+    "6aa6a6a65a56aaaaaaaa9a5a5556556559aa569665a65a555aa6a6a65a56"  # 1950-1954
+    "6aaaa6aa9a5a5556556555aa569665a65a555aa665a65a566aaaa6aa9a5a"  # 1955-1959
+    "55555565556a555665665a555aa665a65a566aaaa6aa9a5a55555565556a"  # 1960-1964
+    "555665665a555aa665a65a566aaaa6aa9a5a55555555556a555665665a55"  # 1965-1969
+    "5aa665a65a566aaaa6aa9a5a55555555556a555665655a555aa665a65a56"  # 1970-1974
+    "6aa6a6aa9a5a55555555456a555655655a555a9665a65a566aa6a6a69a5a"  # 1975-1979
+    "55555555456a555655655a55569665a65a566aa6a6a65a5655555155455a"  # 1980-1984
+    "555655655955569665a65a555aa6a5a65a5615555155455a555555655555"  # 1985-1989
+    "569665665a555aa665a65a5615555155455a555555655515555665665a55"  # 1990-1994
+    "5aa665a65a5615555155455a555555555515555665665a555aa665a65a56"  # 1995-1999
+    "15555155455a555555555515555665665a555aa665a65a5615555155455a"  # 2000-2004
+    "555555555515555655655a555aa665a65a5615515155455a555555554515"  # 2005-2009
+    "555655655a555a9665a65a5615515151455a555551554515555655655a55"  # 2010-2014
+    "569665a65a56155151510556555551554505555655655955569665665a55"  # 2015-2019
+    "155110510556155551554505555555655555569665665a55055110510556"  # 2020-2024
+    "155551554505555555555515555665665a55055110510556155551554505"  # 2025-2029
+    "555555555515555665665a55055110510556155551554505555555555515"  # 2030-2034
+    "555655655a55055110510556155551554505555555555515555655655a55"  # 2035-2039
+    "055110510556155151514505555555554515555655655a55054110510556"  # 2040-2044
+    "155151510505555551554515555655655a55014110110556155110510501"  # 2045-2049
+    "555551554505555555655555014110110555155110510501555551554505"  # 2050-2054
+    "555555555555014110110555055110510501155551554505555555555555"  # 2055-2059
+    "000110110555055110510501155551554505555555555515000110110555"  # 2060-2064
+    "055110510501155551554505555555555515000100100555055110510501"  # 2065-2069
+    "155151514505555555555515000100100555054110510501155151514505"  # 2070-2074
+    "555551554515000100100555054110510501155150510505555551554515"  # 2075-2079
+    "000100100555014110110501155110510505555551554505000000100055"  # 2080-2084
+    "014110110500155110510501555551554505000000000055014110110500"  # 2085-2089
+    "055110510501155551554505000000000055000110110500055110510501"  # 2090-2094
+    "155551554505000000000015000100110500055110510501155551554505"  # 2095-2099
+    "555555555515")  # 2100
+_solar_term_ordinals = None
+_extended_solar_terms = {}  # year -> 24 ordinals, for years added by extend_years()
+
+
+def _load_solar_terms():
+    global _solar_term_ordinals
+    with _init_lock:
+        if _solar_term_ordinals is not None:
+            return _solar_term_ordinals
+        ordinals = array("I")
+        # Terms of the year after MAX_YEAR, when known, cover the dates up
+        # to MAX_DATE that fall in it.
+        for year in range(MIN_YEAR, MAX_YEAR + 2):
+            if year in _extended_solar_terms:
+                ordinals.extend(_extended_solar_terms[year])
+                continue
+            i = (year - _SOLAR_TERM_FIRST_YEAR) * 6
+            if not 0 <= i < len(_SOLAR_TERM_DATA):
+                break
+            bits = int.from_bytes(_SOLAR_TERM_DATA[i:i + 6], "big")
+            ordinals.extend(date(year, k // 2 + 1,
+                                 _SOLAR_TERM_BASE_DAYS[k] + (bits >> 2 * k & 3)).toordinal()
+                            for k in range(24))
+        _solar_term_ordinals = ordinals
+        return ordinals
+
+
+def _month_ganzhi_code(n):
+    # Sexagenary months start at the terms of even index (小寒, 立春, ...),
+    # 小寒 of 1900 starting 丁丑 (13).
+    ordinals = _solar_term_ordinals or _load_solar_terms()
+    return (12 * MIN_YEAR + (bisect_right(ordinals, n) - 1) // 2 + 13) % 60
+
+
+def _solar_term(ordinals, i):
+    k = i % 24
+    return SolarTerm(k, SOLAR_TERMS[k], date.fromordinal(ordinals[i]))
+
+
+def solar_term(d):
+    """Return the SolarTerm in effect on d, a date or a cnlunardate.
+
+    That is the last term starting on or before d, as an (index, name,
+    date) named tuple; d is the first day of the term if date == d.
+    """
+    ordinals = _solar_term_ordinals or _load_solar_terms()
+    i = bisect_right(ordinals, d.toordinal()) - 1
+    if i < 0:
+        raise ValueError(f"{d!r} is before the first solar term on "
+                         f"{date.fromordinal(ordinals[0])}")
+    return _solar_term(ordinals, i)
+
+
+def next_solar_term(d):
+    """Return the first SolarTerm starting after d, a date or a cnlunardate."""
+    ordinals = _solar_term_ordinals or _load_solar_terms()
+    i = bisect_right(ordinals, d.toordinal())
+    if i == len(ordinals):
+        raise ValueError(f"{d!r} is after the last solar term on "
+                         f"{date.fromordinal(ordinals[-1])}")
+    return _solar_term(ordinals, i)
+
+
+def solar_terms_in_year(year):
+    """Return the 24 SolarTerms of a solar year, from 小寒 to 冬至."""
+    year = _return_int_if_valid(year)
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        raise ValueError(f"year {year} must be in {MIN_YEAR}..{MAX_YEAR}")
+    ordinals = _solar_term_ordinals or _load_solar_terms()
+    first = (year - MIN_YEAR) * 24
+    return tuple(_solar_term(ordinals, i) for i in range(first, first + 24))
+
+
+# Sexagenary cycle. Codes run from 0 (甲子) to 59 (癸亥); the stem of code
+# c is c % 10 and its branch c % 12.
+
+HEAVENLY_STEMS = "甲乙丙丁戊己庚辛壬癸"
+EARTHLY_BRANCHES = "子丑寅卯辰巳午未申酉戌亥"
+ZODIAC_ANIMALS = "鼠牛虎兔龙蛇马羊猴鸡狗猪"
+GANZHI = tuple(HEAVENLY_STEMS[c % 10] + EARTHLY_BRANCHES[c % 12] for c in range(60))
+
+_DAY_GANZHI_OFFSET = 14  # date(1900, 1, 1) is 甲戌 (10)
+
+
+# Formatting
+#
+# A format string is compiled once into a function rendering the date
+# from cnlunardate._code, with the fields extracted inline.
+#
+#   %Y %y %m %d  lunar year, 2-digit year, 2-digit month and day
+#   %L           L in a leap month, else nothing
+#   %N %D        month and day in Chinese (闰六月, 初一, 廿三)
+#   %C           year in Chinese digits (二〇一七)
+#   %G %Z        ganzhi and zodiac animal of the year
+#   %a %A %w %u  weekday, as in date.strftime()
+#   %sX          directive %X of date.strftime() for the solar date
+#   %%           a literal %
+
+_FORMAT_CACHE_SIZE = 256
+_CN_DIGITS = str.maketrans("0123456789", "〇一二三四五六七八九")
+_CN_NUMERALS = "一二三四五六七八九十"
+_CN_MONTH_NAMES = ("正", "二", "三", "四", "五", "六", "七", "八", "九", "十", "冬", "腊")
+_CN_DAY_NAMES = (("",) + tuple("初" + n for n in _CN_NUMERALS) +
+                 tuple("十" + n for n in _CN_NUMERALS[:9]) + ("二十",) +
+                 tuple("廿" + n for n in _CN_NUMERALS[:9]) + ("三十",))
+# Indexed by code >> 5 & 31, month << 1 | isLeapMonth.
+_MONTH_TEXT = ("", "") + tuple(("闰" if l else "") + _CN_MONTH_NAMES[m - 1] + "月"
+                               for m in range(1, 13) for l in (False, True))
+
+# The format spec and expression of each directive, code being the _code.
+_LUNAR_DIRECTIVES = {
+    "Y": ("{}", "code >> 10 & 0x3fff"),
+    "y": ("{:02d}", "(code >> 10 & 0x3fff) % 100"),
+    "m": ("{:02d}", "code >> 6 & 15"),
+    "d": ("{:02d}", "code & 31"),
+    "L": ("{}", "'L' if code & 32 else ''"),
+    "N": ("{}", "_MONTH_TEXT[code >> 5 & 31]"),
+    "D": ("{}", "_CN_DAY_NAMES[code & 31]"),
+    "C": ("{}", "str(code >> 10 & 0x3fff).translate(_CN_DIGITS)"),
+    "G": ("{}", "GANZHI[((code >> 10 & 0x3fff) - 4) % 60]"),
+    "Z": ("{}", "ZODIAC_ANIMALS[((code >> 10 & 0x3fff) - 4) % 12]"),
+    "w": ("{}", "(code >> 24) % 7"),
+    "u": ("{}", "(code >> 24) % 7 or 7"),
+    "a": ("{}", "date.fromordinal(code >> 24).strftime('%a')"),
+    "A": ("{}", "date.fromordinal(code >> 24).strftime('%A')"),
+}
+_SOLAR_DIRECTIVES = "aAbBcdGjmuUVwWxyY"
+_FORMAT_NAMESPACE = {"_MONTH_TEXT": _MONTH_TEXT, "_CN_DAY_NAMES": _CN_DAY_NAMES,
+                     "_CN_DIGITS": _CN_DIGITS, "GANZHI": GANZHI,
+                     "ZODIAC_ANIMALS": ZODIAC_ANIMALS, "date": date}
+
+
+@lru_cache(maxsize=_FORMAT_CACHE_SIZE)
+def _compile_format(fmt):
+    """Return a function formatting a cnlunardate._code with fmt."""
+    if not isinstance(fmt, str):
+        raise TypeError(f"format must be str, not {type(fmt).__name__}")
+    template, exprs = [], []
+    i = 0
+    while True:
+        j = fmt.find("%", i)
+        if j < 0:
+            template.append(fmt[i:].replace("{", "{{").replace("}", "}}"))
+            break
+        template.append(fmt[i:j].replace("{", "{{").replace("}", "}}"))
+        directive = fmt[j + 1:j + 2]
+        i = j + 2
+        if directive == "%":
+            template.append("%")
+        elif directive in _LUNAR_DIRECTIVES:
+            spec, expr = _LUNAR_DIRECTIVES[directive]
+            template.append(spec)
+            exprs.append(expr)
+        elif directive == "s" and fmt[i:i + 1] and fmt[i] in _SOLAR_DIRECTIVES:
+            template.append("{}")
+            exprs.append(f"date.fromordinal(code >> 24).strftime('%{fmt[i]}')")
+            i += 1
+        else:
+            bad = fmt[j:i + 1] if directive == "s" else fmt[j:i]
+            raise ValueError(f"invalid format directive {bad!r} in {fmt!r}")
+    # Only the expressions above reach the source; the text of fmt is
+    # passed in the template.
+    namespace = dict(_FORMAT_NAMESPACE, _template="".join(template))
+    return eval(f"lambda code: _template.format({', '.join(exprs)})", namespace)
+
+
+def format_many(dates, fmt):
+    """Return a list of the cnlunardates formatted with strftime(fmt).
+
+    fmt is compiled once for the whole list. None items give None.
+    """
+    render = _compile_format(fmt)
+    out = []
+    for d in dates:
+        try:
+            code = d._code
+        except AttributeError:
+            if d is not None:
+                raise TypeError(
+                    f"a cnlunardate is required (got type {type(d).__name__})") from None
+            out.append(None)
+        else:
+            out.append(render(code))
+    return out
+
+
+# Parsing
+#
+# Both text forms are matched by one compiled pattern each, and Chinese
+# numerals are read from lookup tables:
+#
+#   2017-06-01, 2017-L06-01     fromisoformat(), also 2017-06-01L as
+#                               written by strftime("%Y-%m-%d%L")
+#   二〇一七年闰六月初一        fromchinese(), with an optional 农历 or
+#   农历六月廿三                阴历 prefix, year and trailing 日
+
+_TWO_DIGITS = {f"{n:02d}": n for n in range(100)}
+_CN_YEAR_DIGITS = str.maketrans("〇零一二三四五六七八九", "00123456789")
+_CN_MONTH_VALUES = dict({name: m for m, name in enumerate(_CN_MONTH_NAMES, 1)},
+                        一=1, 十一=11, 十二=12)
+_CN_DAY_VALUES = dict({name: d for d, name in enumerate(_CN_DAY_NAMES) if name},
+                      卅=30, **{"二十" + n: 20 + d
+                               for d, n in enumerate(_CN_NUMERALS[:9], 1)})
+
+
+def _alternatives(names):
+    # Longest first, so that 十一 is not matched as 十.
+    return "|".join(sorted(names, key=len, reverse=True))
+
+
+@lru_cache(maxsize=None)
+def _patterns():
+    # Compiled on first use, to keep importing cheap.
+    import re
+    iso = re.compile(r"(\d\d)(\d\d)-(L?)(\d\d)-(\d\d)(L?)", re.ASCII)
+    chinese = re.compile(
+        r"(?:农历|阴历)?\s*(?:([0-9〇零一二三四五六七八九]{4})\s*年)?\s*"
+        rf"(闰)?({_alternatives(_CN_MONTH_VALUES)})月\s*"
+        rf"({_alternatives(_CN_DAY_VALUES)})日?")
+    return iso.fullmatch, chinese.fullmatch
+
+
+def _parse_iso(text):
+    # Return the fields of an ISO-like lunar date, unchecked.
+    if not isinstance(text, str):
+        raise TypeError(f"fromisoformat: argument must be str, not {type(text).__name__}")
+    match = _patterns()[0](text)
+    if match is None:
+        raise ValueError(f"invalid lunar date string: {text!r}")
+    y_hi, y_lo, leap, m, d, leap_suffix = match.groups()
+    if leap and leap_suffix:
+        raise ValueError(f"invalid lunar date string: {text!r}")
+    return (_TWO_DIGITS[y_hi] * 100 + _TWO_DIGITS[y_lo], _TWO_DIGITS[m],
+            _TWO_DIGITS[d], leap != leap_suffix)
+
+
+def _parse_chinese(text, year):
+    # Return the fields of a Chinese lunar date, unchecked.
+    if not isinstance(text, str):
+        raise TypeError(f"fromchinese: argument must be str, not {type(text).__name__}")
+    match = _patterns()[1](text.strip())
+    if match is None:
+        raise ValueError(f"invalid Chinese lunar date string: {text!r}")
+    y, leap, m, d = match.groups()
+    if y is not None:
+        year = int(y.translate(_CN_YEAR_DIGITS))
+    elif year is None:
+        raise ValueError(f"no year in {text!r} and no default year given")
+    else:
+        year = _return_int_if_valid(year)
+    return year, _CN_MONTH_VALUES[m], _CN_DAY_VALUES[d], leap is not None
+
+
+def parse_many(strings, year=None):
+    """Parse lunar date strings and return the dates and the errors.
+
+    Each string may be in either form accepted by
+    cnlunardate.fromisoformat() and cnlunardate.fromchinese(), which
+    uses year when the string has none. Returns two lists as long as
+    strings: the cnlunardates, None where parsing failed or the string was
+    None, and the error messages, None where it did not fail. Repeated
+    strings are parsed once.
+    """
+    parsed = {}
+    dates, errors = [], []
+    for text in strings:
+        if text is None:
+            result = None, None
+        elif not isinstance(text, str):
+            result = None, f"a str is required (got type {type(text).__name__})"
+        else:
+            result = parsed.get(text)
+            if result is None:
+                stripped = text.strip()
+                try:
+                    # Chinese dates never hold a -.
+                    fields = (_parse_iso(stripped) if "-" in stripped
+                              else _parse_chinese(stripped, year))
+                    result = _fromcode(_ymdl2code(*_check_field_ranges(*fields))), None
+                except (TypeError, ValueError) as e:
+                    result = None, str(e)
+                parsed[text] = result
+        dates.append(result[0])
+        errors.append(result[1])
+    return dates, errors
+
+
+# Bulk serialization
+#
+# dumps_many() writes an 8-byte header followed by one little-endian
+# signed 32-bit day offset from cnlunardate(1900, 1, 1) per date, which
+# is negative only for years added by extend_years():
+#
+#   "CNLD" | version (1) | record width (4) | 2 reserved bytes | records
+#
+# With legacy=True the records are instead the 5-byte pickle states of
+# the dates (record width 5). loads_many() also accepts a bare
+# concatenation of 5-byte states.
+
+_BULK_MAGIC = b"CNLD"
+_BULK_VERSION = 1
+_BULK_HEADER_SIZE = 8
+_BULK_BASE_ORDINAL = 693626  # cnlunardate(1900, 1, 1).toordinal()
+_BULK_TYPECODE = "i"
+
+
+def dumps_many(dates, legacy=False):
+    """Return a compact bytes encoding of an iterable of cnlunardates."""
+    width = 5 if legacy else 4
+    header = _BULK_MAGIC + bytes([_BULK_VERSION, width, 0, 0])
+    dates = list(dates)
+    for d in dates:
+        if not isinstance(d, cnlunardate):
+            raise TypeError(
+                f"cnlunardate expected, got type {type(d).__name__}")
+    if legacy:
+        return header + b"".join(d._getstate()[0] for d in dates)
+    records = array(_BULK_TYPECODE, [d.toordinal() - _BULK_BASE_ORDINAL for d in dates])
+    if sys.byteorder != "little":
+        records.byteswap()
+    return header + records.tobytes()
+
+
+def _loads_states(view):
+    if len(view) % 5:
+        raise ValueError("truncated cnlunardate state records")
+    return [cnlunardate((view[i] << 8) + view[i + 1], view[i + 2], view[i + 3],
+                        bool(view[i + 4]))
+            for i in range(0, len(view), 5)]
+
+
+def loads_many(data):
+    """Decode the bytes-like output of dumps_many() into a list of cnlunardates."""
+    view = memoryview(data).cast("B")
+    if view[:4] != _BULK_MAGIC:
+        return _loads_states(view)
+    if len(view) < _BULK_HEADER_SIZE or view[4] != _BULK_VERSION:
+        raise ValueError("unsupported cnlunardate bulk data")
+    width = view[5]
+    view = view[_BULK_HEADER_SIZE:]
+    if width == 5:
+        return _loads_states(view)
+    if width != 4 or len(view) % 4:
+        raise ValueError("malformed cnlunardate bulk data")
+    offsets = view.cast(_BULK_TYPECODE)
+    if sys.byteorder != "little":
+        offsets = array(_BULK_TYPECODE, offsets)
+        offsets.byteswap()
+    if offsets and not (_MINORDINAL - _BULK_BASE_ORDINAL <= min(offsets) and
+                        max(offsets) <= _MAXORDINAL - _BULK_BASE_ORDINAL):
+        raise ValueError("cnlunardate bulk data out of range")
+    fromvalidordinal = cnlunardate._fromvalidordinal
+    return [fromvalidordinal(_BULK_BASE_ORDINAL + k) for k in offsets]
+
+
+# Instrumentation
+#
+# When enabled, the conversion helpers below and the public constructors
+# are replaced by wrappers that count and time their calls, so nothing is
+# paid while it is off. Times are inclusive: fromtimestamp() also counts
+# the fromsolardate() and _solar2ord() calls it makes. Counters are not
+# locked, so calls made at the same time from several threads may be
+# undercounted.
+
+_INSTRUMENTED_FUNCTIONS = ("_solar2ord", "_ord2code", "_ymdl2code", "_check_date_fields")
+_INSTRUMENTED_CONSTRUCTORS = ("__new__", "fromsolardate", "fromtimestamp",
+                              "fromordinal", "today")
+_instrumented_originals = None  # name -> original attribute when enabled
+_call_stats = {}  # name -> [calls, seconds]
+_cache_baseline = {}  # name -> (generation, hits, misses) at the last reset
+_cache_generations = {}  # name -> number of times the cache was cleared
+
+
+def _caches_cleared(*names):
+    # Tell instrumentation_snapshot() that the counters of these caches
+    # started again from zero.
+    for name in names:
+        _cache_generations[name] = _cache_generations.get(name, 0) + 1
+
+
+def _timed(name, func):
+    stats = _call_stats.setdefault(name, [0, 0.0])
+
+    def wrapper(*args, **kwargs):
+        t = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats[1] += perf_counter() - t
+            stats[0] += 1
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+def _own_cache_counters():
+    counters = {"intern": _intern_counts()}
+    for name, func in (("monthcalendar", _monthcalendar),
+                       ("solarmonthcalendar", _solarmonthcalendar),
+                       ("strftime", _compile_format)):
+        info = func.cache_info()
+        counters[name] = info.hits, info.misses
+    return counters
+
+
+def enable_instrumentation():
+    """Count and time calls to the conversion helpers and constructors.
+
+    Cache hits and misses are recorded too. Enabling resets the counters.
+    """
+    global _instrumented_originals
+    reset_instrumentation()
+    if _instrumented_originals is not None:
+        return
+    originals = {}
+    g = globals()
+    for name in _INSTRUMENTED_FUNCTIONS:
+        originals[name] = g[name]
+        g[name] = _timed(name, g[name])
+    for name in _INSTRUMENTED_CONSTRUCTORS:
+        attr = originals[name] = cnlunardate.__dict__[name]
+        kind = type(attr)
+        setattr(cnlunardate, name, kind(_timed(name, attr.__func__)))
+    _instrumented_originals = originals
+
+
+def disable_instrumentation():
+    """Restore the uninstrumented functions. Counters are kept."""
+    global _instrumented_originals
+    if _instrumented_originals is None:
+        return
+    g = globals()
+    for name, attr in _instrumented_originals.items():
+        if name in _INSTRUMENTED_FUNCTIONS:
+            g[name] = attr
+        else:
+            setattr(cnlunardate, name, attr)
+    _instrumented_originals = None
+
+
+def instrumentation_enabled():
+    """Return True if calls are being counted and timed."""
+    return _instrumented_originals is not None
+
+
+def reset_instrumentation():
+    """Zero all counters."""
+    for stats in _call_stats.values():
+        stats[:] = 0, 0.0
+    for name, (h, m) in _own_cache_counters().items():
+        _cache_baseline[name] = _cache_generations.get(name, 0), h, m
+
+
+def instrumentation_snapshot():
+    """Return the counters as a dict.
+
+    "calls" maps each instrumented function to a dict of its "calls" and
+    total "seconds", and "caches" maps each cache to a dict of its "hits"
+    and "misses".
+    """
+    calls = {name: {"calls": n, "seconds": t}
+             for name, (n, t) in _call_stats.items()}
+    caches = {}
+    for name, (h, m) in _own_cache_counters().items():
+        generation, h0, m0 = _cache_baseline.get(name, (0, 0, 0))
+        if generation != _cache_generations.get(name, 0):
+            h0 = m0 = 0  # cleared since the reset; count from the clear
+        caches[name] = {"hits": h - h0, "misses": m - m0}
+    return {"calls": calls, "caches": caches}
+
+
+def _snapshot_diff(after, before):
+    return {section: {name: {key: value - before[section].get(name, {}).get(key, 0)
+                             for key, value in stats.items()}
+                      for name, stats in after[section].items()}
+            for section in after}
+
+
+@contextmanager
+def instrumented():
+    """Collect instrumentation for the duration of a with block.
+
+    The yielded dict is filled with what was collected inside the block,
+    in the format of instrumentation_snapshot(), when the block exits.
+    Instrumentation is left as it was before the block.
+    """
+    was_enabled = instrumentation_enabled()
+    if not was_enabled:
+        enable_instrumentation()
+    before = instrumentation_snapshot()
+    result = {}
+    try:
+        yield result
+    finally:
+        result.update(_snapshot_diff(instrumentation_snapshot(), before))
+        if not was_enabled:
+            disable_instrumentation()
+
+
+# Vectorized conversions over NumPy arrays. NumPy is an optional dependency
+# and is only imported when one of these functions is first called.
+
+_EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+_np_month_index = None
+
+
+def _get_np_month_index():
+    global _np_month_index
+    index = _np_month_index
+    if index is None:
+        import numpy as np
+        with _init_lock:
+            if _np_month_index is None:
+                if _month_starts is None:
+                    _load_month_index()
+                _np_month_index = (np.array(_month_starts, dtype=np.int64),
+                                   np.array(_month_years, dtype=np.int16),
+                                   np.array(_month_numbers, dtype=np.int8),
+                                   np.array(_month_is_leap, dtype=np.bool_))
+            index = _np_month_index
+    return index
+
+
+def _lunar_dtype():
+    import numpy as np
+    return np.dtype([("year", np.int16), ("month", np.int8),
+                     ("day", np.int8), ("isLeapMonth", np.bool_)])
+
+
+def _ordinals_from_array(values):
+    import numpy as np
+    a = np.asarray(values)
+    if a.dtype.kind == "M":
+        a = a.astype("datetime64[D]")
+        nat = np.isnat(a)
+        ords = np.where(nat, 0, a.view(np.int64)) + _EPOCH_ORDINAL
+        return ords, nat
+    if a.dtype.kind in "iu":
+        return a.astype(np.int64), np.zeros(a.shape, dtype=np.bool_)
+    raise TypeError(
+        f"datetime64 or integer array expected, got dtype {a.dtype}")
+
+
+def solar2lunar(values):
+    """Convert an array of solar dates to lunar fields in one pass.
+
+    values is a NumPy datetime64 array (converted to days) or an integer
+    array of proleptic Gregorian ordinals. Return a (lunar, invalid) pair:
+    lunar is a structured array with year, month, day and isLeapMonth
+    fields, and invalid is a boolean mask of the NaT and out-of-range
+    inputs, whose fields are zeroed.
+    """
+    return _ordinals_to_lunar(*_ordinals_from_array(values))
+
+
+def _ordinals_to_lunar(ords, invalid):
+    import numpy as np
+    invalid |= (ords < _MINORDINAL) | (ords > _MAXORDINAL)
+    ords = np.where(invalid, _MINORDINAL, ords)
+    starts, years, months, leaps = _get_np_month_index()
+    i = np.searchsorted(starts, ords, side="right") - 1
+    lunar = np.empty(ords.shape, dtype=_lunar_dtype())
+    lunar["year"] = years[i]
+    lunar["month"] = months[i]
+    lunar["day"] = ords - starts[i] + 1
+    lunar["isLeapMonth"] = leaps[i]
+    lunar[invalid] = 0
+    return lunar, invalid
+
+
+_TIMESTAMP_UNITS = {"s": 1, "ms": 1000, "us": 1000000, "ns": 1000000000}
+
+
+def timestamp2lunar(values, unit="s", tz=CHINA_TZ):
+    """Convert an array of POSIX timestamps to lunar fields in one pass.
+
+    values is an integer array of seconds, or of milliseconds,
+    microseconds or nanoseconds with unit "ms", "us" or "ns", since the
+    epoch. Days are those of tz, a timezone with a fixed UTC offset,
+    CHINA_TZ by default. Return a (lunar, invalid) pair as solar2lunar().
+    """
+    import numpy as np
+    if unit not in _TIMESTAMP_UNITS:
+        raise ValueError(f"unit {unit!r} must be one of {tuple(_TIMESTAMP_UNITS)}")
+    if not isinstance(tz, tzinfo):
+        raise TypeError(f"a tzinfo is required (got type {type(tz).__name__})")
+    offset = tz.utcoffset(None)
+    if offset is None:
+        raise ValueError(f"tz {tz!r} must have a fixed UTC offset")
+    a = np.asarray(values)
+    if a.dtype.kind not in "iu":
+        raise TypeError(f"integer array expected, got dtype {a.dtype}")
+    per_second = _TIMESTAMP_UNITS[unit]
+    offset = offset // timedelta(microseconds=1) * per_second // 1000000
+    # Values that do not fit in int64 once shifted by offset are far
+    # outside the supported years; mark them before they can wrap.
+    limits = np.iinfo(np.int64)
+    invalid = a > limits.max - max(offset, 0)
+    if a.dtype.kind == "i":
+        invalid |= a < limits.min - min(offset, 0)
+    if invalid.any():
+        a = np.where(invalid, 0, a)
+    days = np.floor_divide(a.astype(np.int64) + offset, 86400 * per_second)
+    return _ordinals_to_lunar(days + _EPOCH_ORDINAL, invalid)
+
+
+_np_year_index = None
+
+
+def _get_np_year_index():
+    global _np_year_index
+    index = _np_year_index
+    if index is None:
+        import numpy as np
+        with _init_lock:
+            if _np_year_index is None:
+                if _month_starts is None:
+                    _load_month_index()
+                _np_year_index = (
+                    np.array(_year_first_month, dtype=np.int64),
+                    np.array(_year_leap_month, dtype=np.int8),
+                    np.array(_month_days, dtype=np.int64))
+            index = _np_year_index
+    return index
+
+
+def lunar2solar(year, month, day, isLeapMonth=False, ordinal=False):
+    """Convert arrays of lunar fields to solar dates in one pass.
+
+    The arguments are broadcast against each other and validated with the
+    same rules as the cnlunardate constructor. Return a (solar, invalid)
+    pair: solar is a datetime64[D] array, or an int64 array of proleptic
+    Gregorian ordinals if ordinal is true, and invalid is a boolean mask of
+    the rows that do not name a valid lunar date. Invalid rows are NaT, or
+    0 as ordinals.
+    """
+    import numpy as np
+    year, month, day, isLeapMonth = np.broadcast_arrays(
+        year, month, day, isLeapMonth)
+    for name, a in (("year", year), ("month", month), ("day", day)):
+        if a.dtype.kind not in "iu":
+            raise TypeError(
+                f"integer array expected for {name}, got dtype {a.dtype}")
+    year = year.astype(np.int64)
+    month = month.astype(np.int64)
+    day = day.astype(np.int64)
+    isLeapMonth = isLeapMonth.astype(np.bool_)
+    starts = _get_np_month_index()[0]
+    year_first, year_leap_month, month_days = _get_np_year_index()
+
+    invalid = ((year < MIN_YEAR) | (year > MAX_YEAR) |
+               (month < 1) | (month > 12))
+    idx = np.where(invalid, 0, year - MIN_YEAR)
+    month = np.where(invalid, 1, month)
+    leap_month = year_leap_month[idx]
+    invalid |= isLeapMonth & (leap_month != month)
+    after_leap = (leap_month != 0) & (
+        (month > leap_month) | ((month == leap_month) & isLeapMonth))
+    i = year_first[idx] + month - 1 + after_leap
+    invalid |= (day < 1) | (day > month_days[i])
+    ords = np.where(invalid, 0, starts[i] + day - 1)
+    if ordinal:
+        return ords, invalid
+    solar = np.asarray(ords - _EPOCH_ORDINAL).astype("datetime64[D]")
+    return np.where(invalid, np.datetime64("NaT"), solar), invalid
+
+
+_np_solar_terms = None
+
+
+def _get_np_solar_terms():
+    global _np_solar_terms
+    terms = _np_solar_terms
+    if terms is None:
+        import numpy as np
+        with _init_lock:
+            if _np_solar_terms is None:
+                _np_solar_terms = np.array(_solar_term_ordinals or _load_solar_terms(),
+                                           dtype=np.int64)
+            terms = _np_solar_terms
+    return terms
+
+
+def ganzhi(values):
+    """Return the sexagenary codes of an array of dates in one pass.
+
+    values is an array as accepted by solar2lunar(), or a structured array
+    of lunar fields as returned by it. Return a (codes, invalid) pair:
+    codes is a structured array with int8 year, month and day fields, from
+    0 (甲子) to 59 (癸亥) as indexes into GANZHI, and invalid is a boolean
+    mask of the rows that are not a supported date, whose codes are -1.
+    """
+    import numpy as np
+    a = np.asarray(values)
+    if a.dtype.names:
+        ords, invalid = lunar2solar(a["year"], a["month"], a["day"],
+                                    a["isLeapMonth"], ordinal=True)
+        years = a["year"].astype(np.int64)
+    else:
+        lunar, invalid = solar2lunar(a)
+        ords = _ordinals_from_array(a)[0]
+        years = lunar["year"].astype(np.int64)
+    ords = np.where(invalid, _MINORDINAL, ords)
+    i = np.searchsorted(_get_np_solar_terms(), ords, side="right") - 1
+    codes = np.empty(ords.shape, dtype=[("year", np.int8), ("month", np.int8),
+                                        ("day", np.int8)])
+    codes["year"] = (years - 4) % 60
+    codes["month"] = (12 * MIN_YEAR + i // 2 + 13) % 60
+    codes["day"] = (ords + _DAY_GANZHI_OFFSET) % 60
+    codes[invalid] = -1
+    return codes, invalid
+
+
+if __name__ == "__main__":
+    import cnlunardate_cli
+    sys.exit(cnlunardate_cli.main())
@@ -0,0 +1,389 @@
+"""Astronomical computation of Chinese lunar years.
+
+New moons and principal solar terms are computed with the methods of
+Jean Meeus, Astronomical Algorithms (2nd ed.), chapters 10, 22, 25, 32
+and 49, and the rules of GB/T 33661-2017 are applied in UTC+8 to derive
+year data in the layout of cnlunardate._LUNAR_YEAR_DATA and
+cnlunardate._LUNAR_YEAR_FIRST_DAY_IN_SOLAR. The modern rules are applied
+proleptically, so results before 1645 differ from historical calendars.
+
+Computed years are cached in a JSON file, see year_data().
+"""
+
+import json
+import os
+from datetime import date
+from functools import lru_cache
+from math import cos, floor, fmod, radians, sin
+
+MIN_YEAR = 1
+MAX_YEAR = 9999
+
+_J2000 = 2451545.0
+_JD_ORDINAL_OFFSET = 1721424.5  # Julian day at 00:00 of ordinal 0
+_UTC_OFFSET = 8 / 24
+_SYNODIC_MONTH = 29.530588861
+
+_CACHE_FORMAT = "cnlunardate-years"
+_CACHE_VERSION = 2
+
+
+def _delta_t(year):
+    """Return TT - UT in seconds, after Espenak and Meeus (2006)."""
+    if year < -500:
+        u = (year - 1820) / 100
+        return -20 + 32 * u * u
+    if year < 500:
+        u = year / 100
+        return (10583.6 - 1014.41 * u + 33.78311 * u ** 2 - 5.952053 * u ** 3 -
+                0.1798452 * u ** 4 + 0.022174192 * u ** 5 + 0.0090316521 * u ** 6)
+    if year < 1600:
+        u = (year - 1000) / 100
+        return (1574.2 - 556.01 * u + 71.23472 * u ** 2 + 0.319781 * u ** 3 -
+                0.8503463 * u ** 4 - 0.005050998 * u ** 5 + 0.0083572073 * u ** 6)
+    if year < 1700:
+        t = year - 1600
+        return 120 - 0.9808 * t - 0.01532 * t ** 2 + t ** 3 / 7129
+    if year < 1800:
+        t = year - 1700
+        return (8.83 + 0.1603 * t - 0.0059285 * t ** 2 + 0.00013336 * t ** 3 -
+                t ** 4 / 1174000)
+    if year < 1860:
+        t = year - 1800
+        return (13.72 - 0.332447 * t + 0.0068612 * t ** 2 + 0.0041116 * t ** 3 -
+                0.00037436 * t ** 4 + 0.0000121272 * t ** 5 -
+                0.0000001699 * t ** 6 + 0.000000000875 * t ** 7)
+    if year < 1900:
+        t = year - 1860
+        return (7.62 + 0.5737 * t - 0.251754 * t ** 2 + 0.01680668 * t ** 3 -
+                0.0004473624 * t ** 4 + t ** 5 / 233174)
+    if year < 1920:
+        t = year - 1900
+        return (-2.79 + 1.494119 * t - 0.0598939 * t ** 2 + 0.0061966 * t ** 3 -
+                0.000197 * t ** 4)
+    if year < 1941:
+        t = year - 1920
+        return 21.20 + 0.84493 * t - 0.076100 * t ** 2 + 0.0020936 * t ** 3
+    if year < 1961:
+        t = year - 1950
+        return 29.07 + 0.407 * t - t ** 2 / 233 + t ** 3 / 2547
+    if year < 1986:
+        t = year - 1975
+        return 45.45 + 1.067 * t - t ** 2 / 260 - t ** 3 / 718
+    if year < 2005:
+        t = year - 2000
+        return (63.86 + 0.3345 * t - 0.060374 * t ** 2 + 0.0017275 * t ** 3 +
+                0.000651814 * t ** 4 + 0.00002373599 * t ** 5)
+    if year < 2050:
+        t = year - 2000
+        return 62.92 + 0.32217 * t + 0.005589 * t ** 2
+    u = (year - 1820) / 100
+    if year < 2150:
+        return -20 + 32 * u * u - 0.5628 * (2150 - year)
+    return -20 + 32 * u * u
+
+
+def _jde_to_ordinal(jde):
+    """Return the proleptic Gregorian ordinal of the UTC+8 day of a JDE."""
+    year = 2000 + (jde - _J2000) / 365.25
+    jd = jde - _delta_t(year) / 86400 + _UTC_OFFSET
+    return floor(jd - _JD_ORDINAL_OFFSET)
+
+
+# Periodic terms of the Earth's heliocentric longitude (VSOP87, as
+# abridged by Meeus in Appendix III): amplitude in 1e-8 radians, phase
+# in radians, frequency in radians per Julian millennium.
+_L0 = ((175347046, 0, 0), (3341656, 4.6692568, 6283.07585),
+       (34894, 4.6261, 12566.1517), (3497, 2.7441, 5753.3849),
+       (3418, 2.8289, 3.5231), (3136, 3.6277, 77713.7715),
+       (2676, 4.4181, 7860.4194), (2343, 6.1352, 3930.2097),
+       (1324, 0.7425, 11506.7698), (1273, 2.0371, 529.691),
+       (1199, 1.1096, 1577.3435), (990, 5.233, 5884.927),
+       (902, 2.045, 26.298), (857, 3.508, 398.149), (780, 1.179, 5223.694),
+       (753, 2.533, 5507.553), (505, 4.583, 18849.228),
+       (492, 4.205, 775.523), (357, 2.92, 0.067), (317, 5.849, 11790.629),
+       (284, 1.899, 796.298), (271, 0.315, 10977.079),
+       (243, 0.345, 5486.778), (206, 4.806, 2544.314),
+       (205, 1.869, 5573.143), (202, 2.458, 6069.777),
+       (156, 0.833, 213.299), (132, 3.411, 2942.463), (126, 1.083, 20.775),
+       (115, 0.645, 0.98), (103, 0.636, 4694.003), (102, 0.976, 15720.839),
+       (102, 4.267, 7.114), (99, 6.21, 2146.17), (98, 0.68, 155.42),
+       (86, 5.98, 161000.69), (85, 1.3, 6275.96), (85, 3.67, 71430.7),
+       (80, 1.81, 17260.15), (79, 3.04, 12036.46), (75, 1.76, 5088.63),
+       (74, 3.5, 3154.69), (74, 4.68, 801.82), (70, 0.83, 9437.76),
+       (62, 3.98, 8827.39), (61, 1.82, 7084.9), (57, 2.78, 6286.6),
+       (56, 4.39, 14143.5), (56, 3.47, 6279.55), (52, 0.19, 12139.55),
+       (52, 1.33, 1748.02), (51, 0.28, 5856.48), (49, 0.49, 1194.45),
+       (41, 5.37, 8429.24), (41, 2.4, 19651.05), (39, 6.17, 10447.39),
+       (37, 6.04, 10213.29), (37, 2.57, 1059.38), (36, 1.71, 2352.87),
+       (36, 1.78, 6812.77), (33, 0.59, 17789.85), (30, 0.44, 83996.85),
+       (30, 2.74, 1349.87), (25, 3.16, 4690.48))
+_L1 = ((628331966747, 0, 0), (206059, 2.678235, 6283.07585),
+       (4303, 2.6351, 12566.1517), (425, 1.59, 3.523), (119, 5.796, 26.298),
+       (109, 2.966, 1577.344), (93, 2.59, 18849.23), (72, 1.14, 529.69),
+       (68, 1.87, 398.15), (67, 4.41, 5507.55), (59, 2.89, 5223.69),
+       (56, 2.17, 155.42), (45, 0.4, 796.3), (36, 0.47, 775.52),
+       (29, 2.65, 7.11), (21, 5.34, 0.98), (19, 1.85, 5486.78),
+       (19, 4.97, 213.3), (17, 2.99, 6275.96), (16, 0.03, 2544.31),
+       (16, 1.43, 2146.17), (15, 1.21, 10977.08), (12, 2.83, 1748.02),
+       (12, 3.26, 5088.63), (12, 5.27, 1194.45), (12, 2.08, 4694.0),
+       (11, 0.77, 553.57), (10, 1.3, 6286.6), (10, 4.24, 1349.87),
+       (9, 2.7, 242.73), (9, 5.64, 951.72), (8, 5.3, 2352.87),
+       (6, 2.65, 9437.76), (6, 4.67, 4690.48))
+_L2 = ((52919, 0, 0), (8720, 1.0721, 6283.0758), (309, 0.867, 12566.152),
+       (27, 0.05, 3.52), (16, 5.19, 26.3), (16, 3.68, 155.42),
+       (10, 0.76, 18849.23), (9, 2.06, 77713.77), (7, 0.83, 775.52),
+       (5, 4.66, 1577.34), (4, 1.03, 7.11), (4, 3.44, 5573.14),
+       (3, 5.14, 796.3), (3, 6.05, 5507.55), (3, 1.19, 242.73),
+       (3, 6.12, 529.69), (3, 0.31, 398.15), (3, 2.28, 553.57),
+       (2, 4.38, 5223.69), (2, 3.75, 0.98))
+_L3 = ((289, 5.844, 6283.076), (35, 0, 0), (17, 5.49, 12566.15),
+       (3, 5.2, 155.42), (1, 4.72, 3.52), (1, 5.3, 18849.23),
+       (1, 5.97, 242.73))
+_L4 = ((114, 3.142, 0), (8, 4.13, 6283.08), (1, 3.84, 12566.15))
+_L5 = ((1, 3.14, 0),)
+_LONGITUDE_SERIES = (_L0, _L1, _L2, _L3, _L4, _L5)
+
+
+def _series(terms, tau):
+    return sum(a * cos(b + c * tau) for a, b, c in terms)
+
+
+def _sun_longitude(jde):
+    """Return the apparent geocentric longitude of the Sun in degrees."""
+    tau = (jde - _J2000) / 365250
+    value = 0.0
+    for i, terms in enumerate(_LONGITUDE_SERIES):
+        value += _series(terms, tau) * tau ** i
+    longitude = value / 1e8 * 57.29577951308232 + 180
+    t = tau * 10
+    # Conversion to the FK5 system, nutation in longitude and aberration,
+    # all in arc seconds.
+    omega = radians(125.04452 - 1934.136261 * t)
+    sun = radians(280.4665 + 36000.7698 * t)
+    moon = radians(218.3165 + 481267.8813 * t)
+    nutation = (-17.2 * sin(omega) - 1.32 * sin(2 * sun) -
+                0.23 * sin(2 * moon) + 0.21 * sin(2 * omega))
+    anomaly = radians(357.52911 + 35999.05029 * t)
+    distance = 1.000140 - 0.016708 * cos(anomaly) - 0.000139 * cos(2 * anomaly)
+    longitude += (-0.09033 + nutation - 20.4898 / distance) / 3600
+    return fmod(longitude, 360) % 360
+
+
+def solar_term_jde(year, longitude):
+    """Return the JDE at which the Sun reaches longitude in a solar year.
+
+    longitude is in degrees, and is reached in March (0) to February (330)
+    of the year after.
+    """
+    jde = 2451623.8 + 365.2422 * (year - 2000 + (longitude % 360) / 360)
+    for _ in range(20):
+        diff = (longitude - _sun_longitude(jde) + 180) % 360 - 180
+        jde += diff * 365.2422 / 360
+        if abs(diff) < 1e-7:
+            break
+    return jde
+
+
+# Periodic terms of the true new moon (Meeus chapter 49): coefficient,
+# power of E, and multipliers of M, M' and F.
+_NEW_MOON_TERMS = (
+    (-0.40720, 0, 0, 1, 0), (0.17241, 1, 1, 0, 0), (0.01608, 0, 0, 2, 0),
+    (0.01039, 0, 0, 0, 2), (0.00739, 1, -1, 1, 0), (-0.00514, 1, 1, 1, 0),
+    (0.00208, 2, 2, 0, 0), (-0.00111, 0, 0, 1, -2), (-0.00057, 0, 0, 1, 2),
+    (0.00056, 1, 1, 2, 0), (-0.00042, 0, 0, 3, 0), (0.00042, 1, 1, 0, 2),
+    (0.00038, 1, 1, 0, -2), (-0.00024, 1, -1, 2, 0), (-0.00007, 0, 2, 1, 0),
+    (0.00004, 0, 0, 2, -2), (0.00004, 0, 3, 0, 0), (0.00003, 0, 1, 1, -2),
+    (0.00003, 0, 0, 2, 2), (-0.00003, 0, 1, 1, 2), (0.00003, 0, -1, 1, 2),
+    (-0.00002, 0, -1, 1, -2), (-0.00002, 0, 1, 3, 0), (0.00002, 0, 0, 4, 0))
+# Planetary arguments A2-A14: constant, multiplier of k, coefficient. A1
+# also depends on T and is computed apart.
+_PLANETARY_TERMS = (
+    (251.88, 0.016321, 0.000165),
+    (251.83, 26.651886, 0.000164), (349.42, 36.412478, 0.000126),
+    (84.66, 18.206239, 0.000110), (141.74, 53.303771, 0.000062),
+    (207.14, 2.453732, 0.000060), (154.84, 7.306860, 0.000056),
+    (34.52, 27.261239, 0.000047), (207.19, 0.121824, 0.000042),
+    (291.34, 1.844379, 0.000040), (161.72, 24.198154, 0.000037),
+    (239.56, 25.513099, 0.000035), (331.55, 3.592518, 0.000023))
+
+
+def new_moon_jde(k):
+    """Return the JDE of new moon number k, 0 being that of 2000-01-06."""
+    t = k / 1236.85
+    jde = (2451550.09766 + _SYNODIC_MONTH * k + 0.00015437 * t ** 2 -
+           0.00000015 * t ** 3 + 0.00000000073 * t ** 4)
+    e = 1 - 0.002516 * t - 0.0000074 * t ** 2
+    m = radians(2.5534 + 29.1053567 * k - 0.0000014 * t ** 2 - 0.00000011 * t ** 3)
+    mp = radians(201.5643 + 385.81693528 * k + 0.0107582 * t ** 2 +
+                 0.00001238 * t ** 3 - 0.000000058 * t ** 4)
+    f = radians(160.7108 + 390.67050284 * k - 0.0016118 * t ** 2 -
+                0.00000227 * t ** 3 + 0.000000011 * t ** 4)
+    omega = radians(124.7746 - 1.56375588 * k + 0.0020672 * t ** 2 +
+                    0.00000215 * t ** 3)
+    for coef, e_power, cm, cmp, cf in _NEW_MOON_TERMS:
+        jde += coef * e ** e_power * sin(cm * m + cmp * mp + cf * f)
+    jde -= 0.00017 * sin(omega)
+    a1 = 299.77 + 0.107408 * k - 0.009173 * t ** 2
+    jde += 0.000325 * sin(radians(a1))
+    for const, per_k, coef in _PLANETARY_TERMS:
+        jde += coef * sin(radians(const + per_k * k))
+    return jde
+
+
+def _new_moons(first, last):
+    """Return the ordinals of the UTC+8 days of new moons in first..last."""
+    k = floor((first + _JD_ORDINAL_OFFSET - 2451550.1) / _SYNODIC_MONTH) - 1
+    days = []
+    while True:
+        n = _jde_to_ordinal(new_moon_jde(k))
+        if n > last:
+            return days
+        if n >= first:
+            days.append(n)
+        k += 1
+
+
+def _winter_solstice(year):
+    return _jde_to_ordinal(solar_term_jde(year, 270))
+
+
+@lru_cache(maxsize=4)  # consecutive years share a sui
+def _sui(year):
+    """Return the months from month 11 of year - 1 to month 11 of year.
+
+    Each month is a (first day ordinal, month, is leap) triple; the last one
+    is month 11 of year, which starts the next sui.
+    """
+    start, end = _winter_solstice(year - 1), _winter_solstice(year)
+    # There is always a new moon in the 30 days up to the solstice.
+    moons = _new_moons(start - 29, end)
+    moons = moons[max(i for i, n in enumerate(moons) if n <= start):]
+    # Principal terms, from the winter solstice of year - 1 to that of year.
+    terms = ([_jde_to_ordinal(solar_term_jde(year - 1, lon)) for lon in (270, 300, 330)] +
+             [_jde_to_ordinal(solar_term_jde(year, lon)) for lon in range(0, 271, 30)])
+    leap = len(moons) == 14
+    months = [(moons[0], 11, False)]
+    for i in range(1, len(moons)):
+        prev, is_leap = months[-1][1], False
+        if leap and i < 13:
+            has_term = any(moons[i] <= t < moons[i + 1] for t in terms)
+            if not has_term:
+                leap, is_leap = False, True
+        months.append((moons[i], prev if is_leap else prev % 12 + 1, is_leap))
+    return months
+
+
+def compute_year(year):
+    """Return the (lunar bits, first day bits) of a lunar year.
+
+    The values are laid out as the entries of cnlunardate._LUNAR_YEAR_DATA
+    and cnlunardate._LUNAR_YEAR_FIRST_DAY_IN_SOLAR.
+
+    New moons are only accurate to a few minutes, so a month may start a
+    day off when its new moon falls within about 25 minutes of midnight
+    in UTC+8. Within 1900..2100 this makes the result differ from the
+    built-in table for 1914, 1915, 1916, 1920, 1933, 1996, 2057 and 2060
+    (the new moons of 1933-07-23 at 00:03 and 2057-09-28 at 23:59.9, for
+    example); the table is authoritative there.
+    """
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        raise ValueError(f"year {year} must be in {MIN_YEAR}..{MAX_YEAR}")
+    months = _sui(year)[:-1] + _sui(year + 1)
+    first = next(i for i, (_, m, leap) in enumerate(months) if m == 1 and not leap)
+    end = next(i for i, (_, m, leap) in enumerate(months)
+               if i > first and m == 1 and not leap)
+    lunar_bits = 0
+    for i in range(first, end):
+        _, month, is_leap = months[i]
+        long_month = months[i + 1][0] - months[i][0] == 30
+        if is_leap:
+            lunar_bits |= month | long_month << 16
+        else:
+            lunar_bits |= long_month << (16 - month)
+    s = date.fromordinal(months[first][0])
+    return lunar_bits, s.year << 9 | s.month << 5 | s.day
+
+
+def compute_solar_terms(year):
+    """Return the ordinals of the days of the 24 solar terms of a solar year.
+
+    The terms are in calendar order, from Xiaohan (285 degrees) in January
+    to the winter solstice (270 degrees) in December.
+    """
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        raise ValueError(f"year {year} must be in {MIN_YEAR}..{MAX_YEAR}")
+    return tuple(_jde_to_ordinal(solar_term_jde(year - (k < 5), (285 + 15 * k) % 360))
+                 for k in range(24))
+
+
+def _compute(year):
+    return compute_year(year) + (compute_solar_terms(year),)
+
+
+def default_cache_path():
+    """Return the default path of the computed years cache."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "cnlunardate", "years.json")
+
+
+def _read_cache(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if (not isinstance(data, dict) or data.get("format") != _CACHE_FORMAT or
+            data.get("version") != _CACHE_VERSION):
+        return {}
+    years = data.get("years")
+    if not isinstance(years, dict):
+        return {}
+    cached = {}
+    for year, entry in years.items():
+        # A malformed entry makes the whole file be rebuilt.
+        if not (isinstance(entry, list) and len(entry) == 3 and
+                isinstance(entry[2], list) and len(entry[2]) == 24 and
+                all(type(v) is int for v in entry[:2] + entry[2])):
+            return {}
+        try:
+            year = int(year)
+        except ValueError:
+            return {}
+        cached[year] = entry[0], entry[1], tuple(entry[2])
+    return cached
+
+
+def _write_cache(path, years):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    data = {"format": _CACHE_FORMAT, "version": _CACHE_VERSION,
+            "years": {str(year): [lunar_bits, first_day_bits, list(terms)]
+                      for year, (lunar_bits, first_day_bits, terms) in sorted(years.items())}}
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def year_data(years, cache=None):
+    """Return a dict of the data of each of years.
+
+    The data of a year is its compute_year() pair followed by its
+    compute_solar_terms() tuple.
+
+    Years are read from the JSON file at the path cache, or at
+    default_cache_path() if cache is None, and the ones missing there are
+    computed and added to it. Pass cache=False to compute every year
+    without touching any file.
+    """
+    if cache is False:
+        return {year: _compute(year) for year in years}
+    path = default_cache_path() if cache is None else cache
+    cached = _read_cache(path)
+    missing = [year for year in years if year not in cached]
+    if missing:
+        for year in missing:
+            cached[year] = _compute(year)
+        _write_cache(path, cached)
+    return {year: cached[year] for year in years}
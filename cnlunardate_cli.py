@@ -0,0 +1,242 @@
+"""Convert the dates of a CSV or JSONL stream between the two calendars.
+
+Run as python -m cnlunardate. Each record gets extra columns (CSV) or
+keys (JSONL) with the converted date: lunar_year, lunar_month, lunar_day
+and lunar_leap for solar dates, or solar for lunar dates. Solar dates are
+written YYYY-MM-DD, and lunar dates the same with an L suffix for leap
+months (2017-06-01L). Invalid dates get empty values (null in JSONL),
+unless --strict is given.
+
+Records are read and written in chunks, so the input is never held in
+memory, and --jobs spreads the chunks over worker processes while the
+output keeps the input order.
+
+Usage:
+
+    python -m cnlunardate [FILE] [--to {lunar,solar}] [--column COLUMN]
+                          [--format {csv,jsonl}] [--no-header]
+                          [--delimiter CHAR] [--strict] [-o FILE]
+                          [--jobs N] [--chunk-size N]
+"""
+
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import sys
+from collections import deque
+from datetime import date
+from functools import lru_cache
+from itertools import islice
+
+from cnlunardate import cnlunardate
+
+COLUMNS = {
+    "lunar": ("lunar_year", "lunar_month", "lunar_day", "lunar_leap"),
+    "solar": ("solar",),
+}
+
+
+def _parse_ymd(text):
+    y, m, d = text.strip().split("-")
+    return int(y), int(m), int(d)
+
+
+@lru_cache(maxsize=4096)
+def _to_lunar(text):
+    d = cnlunardate.fromsolardate(date(*_parse_ymd(text)))
+    return d.year, d.month, d.day, d.isLeapMonth
+
+
+@lru_cache(maxsize=4096)
+def _to_solar(text):
+    text = text.strip()
+    leap = text.endswith("L")
+    d = cnlunardate(*_parse_ymd(text[:-1] if leap else text), leap)
+    return (d.tosolardate().isoformat(),)
+
+
+_CONVERTERS = {"lunar": _to_lunar, "solar": _to_solar}
+
+
+def _convert(value, to, strict, record):
+    # Return the values of the extra columns, None where invalid.
+    try:
+        return _CONVERTERS[to](value)
+    except (AttributeError, TypeError, ValueError, OverflowError):
+        if strict:
+            kind = "lunar" if to == "solar" else "solar"
+            raise ValueError(f"record {record}: invalid {kind} date {value!r}") from None
+        return (None,) * len(COLUMNS[to])
+
+
+def convert_csv_chunk(job):
+    """Convert a chunk of CSV rows and return them formatted as CSV."""
+    first, rows, column, to, strict, delimiter = job
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=delimiter, lineterminator="\n")
+    for record, row in enumerate(rows, first):
+        value = row[column] if column < len(row) else None
+        values = _convert(value, to, strict, record)
+        if to == "lunar" and values[3] is not None:
+            values = values[:3] + (int(values[3]),)
+        writer.writerow(row + ["" if v is None else v for v in values])
+    return out.getvalue()
+
+
+def convert_jsonl_chunk(job):
+    """Convert a chunk of JSONL lines and return them as JSONL."""
+    first, lines, column, to, strict = job
+    out = []
+    for record, line in enumerate(lines, first):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"record {record}: invalid JSON: {e}") from None
+        if not isinstance(obj, dict):
+            raise ValueError(f"record {record}: JSON object expected, "
+                             f"got {type(obj).__name__}")
+        obj.update(zip(COLUMNS[to], _convert(obj.get(column), to, strict, record)))
+        out.append(json.dumps(obj, ensure_ascii=False))
+        out.append("\n")
+    return "".join(out)
+
+
+def _chunks(records, size):
+    records = iter(records)
+    first = 1
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield first, chunk
+        first += len(chunk)
+
+
+def run(jobs_args, convert, out, jobs=1):
+    """Write convert(args) for each of jobs_args to out, in order.
+
+    With more than one job, the chunks are converted by a process pool
+    and at most two per process are in flight at a time.
+    """
+    if jobs == 1:
+        for args in jobs_args:
+            out.write(convert(args))
+        return
+    with multiprocessing.Pool(jobs) as pool:
+        pending = deque()
+        for args in jobs_args:
+            pending.append(pool.apply_async(convert, (args,)))
+            if len(pending) > 2 * jobs:
+                out.write(pending.popleft().get())
+        while pending:
+            out.write(pending.popleft().get())
+
+
+def _convert_csv(args, infile, out):
+    reader = csv.reader(infile, delimiter=args.delimiter)
+    column = args.column
+    if args.no_header:
+        header = None
+        if column is None:
+            column = 0
+    else:
+        header = next(reader, None)
+        if header is None:
+            return  # empty input
+        if column is None:
+            column = "date"
+        if column in header:
+            column = header.index(column)
+    try:
+        column = int(column)
+    except ValueError:
+        if header is None:
+            raise ValueError(
+                f"--column {column!r} must be a 0-based index with --no-header") from None
+        raise ValueError(f"no column {column!r} in the header") from None
+    if header:
+        csv.writer(out, delimiter=args.delimiter, lineterminator="\n").writerow(
+            header + list(COLUMNS[args.to]))
+    run(((first, rows, column, args.to, args.strict, args.delimiter)
+         for first, rows in _chunks(reader, args.chunk_size)),
+        convert_csv_chunk, out, args.jobs)
+
+
+def _convert_jsonl(args, infile, out):
+    column = "date" if args.column is None else args.column
+    run(((first, lines, column, args.to, args.strict)
+         for first, lines in _chunks(infile, args.chunk_size)),
+        convert_jsonl_chunk, out, args.jobs)
+
+
+def _positive(text):
+    n = int(text)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"{n} must be positive")
+    return n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m cnlunardate",
+        description="Convert the dates of a CSV or JSONL stream between the "
+                    "solar and lunar calendars.")
+    parser.add_argument("file", nargs="?", default="-",
+                        help="input file, standard input if omitted or -")
+    parser.add_argument("--to", choices=("lunar", "solar"), default="lunar",
+                        help="convert solar dates to lunar (default) or lunar to solar")
+    parser.add_argument("--column",
+                        help="CSV column name or 0-based index, or JSONL key "
+                             "holding the dates (default: date, or the first "
+                             "column with --no-header)")
+    parser.add_argument("--format", choices=("csv", "jsonl"),
+                        help="input and output format (default: from the file "
+                             "name, else csv)")
+    parser.add_argument("--no-header", action="store_true",
+                        help="the CSV input has no header row")
+    parser.add_argument("--delimiter", default=",", help="CSV delimiter")
+    parser.add_argument("--strict", action="store_true",
+                        help="fail on the first invalid date")
+    parser.add_argument("-o", "--output", default="-",
+                        help="output file, standard output if omitted or -")
+    parser.add_argument("--jobs", type=_positive, default=1,
+                        help="worker processes (default: 1)")
+    parser.add_argument("--chunk-size", type=_positive, default=10000,
+                        help="records per chunk (default: 10000)")
+    args = parser.parse_args(argv)
+    if args.format is None:
+        args.format = "jsonl" if args.file.endswith((".jsonl", ".ndjson")) else "csv"
+
+    if args.file == "-":
+        infile = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    else:
+        infile = open(args.file, encoding="utf-8", newline="")
+    if args.output == "-":
+        out = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="",
+                               write_through=True)
+    else:
+        out = open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        if args.format == "csv":
+            _convert_csv(args, infile, out)
+        else:
+            _convert_jsonl(args, infile, out)
+    except ValueError as e:
+        parser.exit(1, f"{parser.prog}: error: {e}\n")
+    finally:
+        out.flush()
+        # Leave the standard streams open.
+        for f, name in ((infile, args.file), (out, args.output)):
+            if name == "-":
+                f.detach()
+            else:
+                f.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
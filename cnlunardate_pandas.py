@@ -0,0 +1,260 @@
+"""pandas extension type and accessor for cnlunardate.
+
+Importing this module registers the "cnlunardate" dtype (LunarDateDtype,
+backed by LunarDateArray) and the "cnlunar" accessor on Series and Index
+objects. Values are stored as int64 proleptic Gregorian ordinals, so
+sorting, grouping and counting work on plain integers, and lunar fields
+are decoded for a whole column at once with cnlunardate.solar2lunar().
+"""
+
+import numbers
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import (ExtensionArray, ExtensionDtype,
+                                   register_extension_dtype,
+                                   register_index_accessor,
+                                   register_series_accessor, take)
+
+import cnlunardate as _cnlunardate
+from cnlunardate import cnlunardate
+
+_NA_ORDINAL = 0
+
+
+@register_extension_dtype
+class LunarDateDtype(ExtensionDtype):
+    """pandas dtype for cnlunardate values."""
+    name = "cnlunardate"
+    type = cnlunardate
+    kind = "O"
+    na_value = pd.NA
+
+    @classmethod
+    def construct_array_type(cls):
+        return LunarDateArray
+
+
+def _scalar_to_ordinal(value):
+    if isinstance(value, cnlunardate):
+        return value.toordinal()
+    if value is None or value is pd.NA or value is pd.NaT or (
+            isinstance(value, float) and np.isnan(value)):
+        return _NA_ORDINAL
+    raise TypeError(
+        f"cnlunardate expected, got type {type(value).__name__}")
+
+
+def _solar_ordinals(values):
+    """Return in-range ordinals of datetime-like values, 0 elsewhere."""
+    values = pd.DatetimeIndex(values)
+    if values.tz is not None:
+        values = values.tz_localize(None)
+    ords, invalid = _cnlunardate._ordinals_from_array(values.values)
+    invalid |= ((ords < _cnlunardate._MINORDINAL) |
+                (ords > _cnlunardate._MAXORDINAL))
+    return np.where(invalid, _NA_ORDINAL, ords)
+
+
+class LunarDateArray(ExtensionArray):
+    """pandas extension array of cnlunardate values stored as ordinals."""
+
+    def __init__(self, ordinals, copy=False):
+        if copy:
+            self._ordinals = np.array(ordinals, dtype=np.int64)
+        else:
+            self._ordinals = np.asarray(ordinals, dtype=np.int64)
+
+    # Constructors
+
+    @classmethod
+    def _from_sequence(cls, scalars, dtype=None, copy=False):
+        if isinstance(scalars, cls):
+            return scalars.copy() if copy else scalars
+        return cls(np.fromiter((_scalar_to_ordinal(v) for v in scalars),
+                               dtype=np.int64))
+
+    @classmethod
+    def _from_factorized(cls, values, original):
+        return cls(values)
+
+    @classmethod
+    def from_solar(cls, values):
+        """Construct from datetime-like values; out-of-range values are NA."""
+        return cls(_solar_ordinals(values))
+
+    @classmethod
+    def _concat_same_type(cls, to_concat):
+        return cls(np.concatenate([a._ordinals for a in to_concat]))
+
+    # Required ExtensionArray interface
+
+    @property
+    def dtype(self):
+        return LunarDateDtype()
+
+    @property
+    def nbytes(self):
+        return self._ordinals.nbytes
+
+    def __len__(self):
+        return len(self._ordinals)
+
+    def __getitem__(self, item):
+        if isinstance(item, numbers.Integral):
+            n = int(self._ordinals[item])
+            return pd.NA if n == _NA_ORDINAL else cnlunardate.fromordinal(n)
+        item = pd.api.indexers.check_array_indexer(self, item)
+        return type(self)(self._ordinals[item])
+
+    def __setitem__(self, key, value):
+        if isinstance(value, (cnlunardate, type(None), type(pd.NA))):
+            value = _scalar_to_ordinal(value)
+        elif isinstance(value, LunarDateArray):
+            value = value._ordinals
+        else:
+            value = type(self)._from_sequence(value)._ordinals
+        key = pd.api.indexers.check_array_indexer(self, key)
+        self._ordinals[key] = value
+
+    def isna(self):
+        return self._ordinals == _NA_ORDINAL
+
+    def take(self, indices, allow_fill=False, fill_value=None):
+        if allow_fill and fill_value is not None:
+            fill_value = _scalar_to_ordinal(fill_value)
+        else:
+            fill_value = _NA_ORDINAL
+        return type(self)(take(self._ordinals, indices, allow_fill=allow_fill,
+                               fill_value=fill_value))
+
+    def copy(self):
+        return type(self)(self._ordinals, copy=True)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array([self[i] for i in range(len(self))], dtype=object)
+
+    # Sorting, grouping and counting work on the ordinals
+
+    def _values_for_argsort(self):
+        return self._ordinals
+
+    def _values_for_factorize(self):
+        return self._ordinals, _NA_ORDINAL
+
+    def _reduce(self, name, *, skipna=True, keepdims=False, **kwargs):
+        if name not in ("min", "max"):
+            return super()._reduce(name, skipna=skipna, keepdims=keepdims,
+                                   **kwargs)
+        mask = self.isna()
+        if mask.all() or (mask.any() and not skipna):
+            result = pd.NA
+        else:
+            ords = self._ordinals[~mask]
+            result = cnlunardate.fromordinal(
+                int(ords.min() if name == "min" else ords.max()))
+        return type(self)._from_sequence([result]) if keepdims else result
+
+    # Comparisons
+
+    def _compare(self, other, op):
+        if isinstance(other, (pd.Series, pd.Index)):
+            return NotImplemented
+        if isinstance(other, LunarDateArray):
+            other = other._ordinals
+            mask = self.isna() | (other == _NA_ORDINAL)
+        elif isinstance(other, cnlunardate):
+            other = other.toordinal()
+            mask = self.isna()
+        else:
+            other = type(self)._from_sequence(other)._ordinals
+            mask = self.isna() | (other == _NA_ORDINAL)
+        result = op(self._ordinals, other)
+        result[mask] = op is np.not_equal
+        return result
+
+    def __eq__(self, other):
+        return self._compare(other, np.equal)
+
+    def __ne__(self, other):
+        return self._compare(other, np.not_equal)
+
+    def __lt__(self, other):
+        return self._compare(other, np.less)
+
+    def __le__(self, other):
+        return self._compare(other, np.less_equal)
+
+    def __gt__(self, other):
+        return self._compare(other, np.greater)
+
+    def __ge__(self, other):
+        return self._compare(other, np.greater_equal)
+
+    # Conversions
+
+    def to_solar(self):
+        """Return the solar dates as a datetime64[ns] array, NaT for NA."""
+        solar = (self._ordinals - _cnlunardate._EPOCH_ORDINAL).astype(
+            "datetime64[D]")
+        solar[self.isna()] = np.datetime64("NaT")
+        return solar.astype("datetime64[ns]")
+
+
+@register_series_accessor("cnlunar")
+@register_index_accessor("cnlunar")
+class CnlunarAccessor:
+    """Lunar date fields and conversions for Series and Index objects.
+
+    The accessor works on cnlunardate values and on datetime64 values,
+    which are read as solar dates.
+    """
+
+    def __init__(self, obj):
+        if isinstance(obj.dtype, LunarDateDtype):
+            self._array = obj.array
+        elif pd.api.types.is_datetime64_any_dtype(obj.dtype):
+            self._array = LunarDateArray.from_solar(obj)
+        else:
+            raise AttributeError(
+                "Can only use .cnlunar accessor with cnlunardate or "
+                "datetime64 values")
+        self._obj = obj
+        self._fields = None
+
+    def _wrap(self, values):
+        if isinstance(self._obj, pd.Index):
+            return pd.Index(values, name=self._obj.name)
+        return pd.Series(values, index=self._obj.index, name=self._obj.name)
+
+    def _field(self, name, dtype):
+        if self._fields is None:
+            self._fields = _cnlunardate.solar2lunar(self._array._ordinals)
+        lunar, invalid = self._fields
+        values = pd.array(lunar[name], dtype=dtype)
+        values[invalid] = pd.NA
+        return self._wrap(values)
+
+    @property
+    def year(self):
+        return self._field("year", "Int16")
+
+    @property
+    def month(self):
+        return self._field("month", "Int8")
+
+    @property
+    def day(self):
+        return self._field("day", "Int8")
+
+    @property
+    def is_leap_month(self):
+        return self._field("isLeapMonth", "boolean")
+
+    def to_solar(self):
+        """Return the solar dates as datetime64 values."""
+        return self._wrap(self._array.to_solar())
+
+    def from_solar(self):
+        """Return the values as cnlunardate values."""
+        return self._wrap(self._array.copy())
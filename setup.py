@@ -12,12 +12,16 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/YuBPan/cnlunardate",
-    py_modules=['cnlunardate'],
+    py_modules=['cnlunardate', 'cnlunardate_astro', 'cnlunardate_cli', 'cnlunardate_pandas'],
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
     python_requires='>=3.6',
+    extras_require={
+        "numpy": ["numpy"],
+        "pandas": ["numpy", "pandas"],
+    },
     keywords="Chinese lunar date",
 )
@@ -1,12 +1,34 @@
 """Test cnlunardate."""
 
+import contextlib
+import io
+import json
+import os
 import unittest
 import pickle
-
-from cnlunardate import cnlunardate
+import subprocess
+import sys
+import tempfile
+import threading
+
+import cnlunardate as cnlunardate_module
+import cnlunardate_astro
+import cnlunardate_cli
+from cnlunardate import cnlunardate, cnlunardatetime, CHINA_TZ
 from cnlunardate import MIN_YEAR, MAX_YEAR
 
-from datetime import timedelta
+from datetime import date, datetime, time, timedelta, timezone
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pandas as pd
+    import cnlunardate_pandas
+except ImportError:
+    pd = None
 
 pickle_loads = {pickle.loads, pickle._loads}
 pickle_choices = [(pickle, pickle, proto)
@@ -120,6 +142,28 @@ class TestCnlunardate(unittest.TestCase):
                         self.assertEqual(d, self.theclass.fromordinal(n))
                         n += 1
 
+    def test_ordinal_conversions_full_range(self):
+        from cnlunardate import _MINORDINAL, _MAXORDINAL
+
+        # Walk every supported day and verify the lunar fields advance
+        # one day at a time and round-trip through toordinal().
+        prev = self.theclass.fromordinal(_MINORDINAL)
+        self.assertEqual(prev, self.theclass.min)
+        for n in range(_MINORDINAL + 1, _MAXORDINAL + 1):
+            d = self.theclass.fromordinal(n)
+            self.assertEqual(d.toordinal(), n)
+            if d.day != 1:
+                self.assertEqual((d.year, d.month, d.day - 1, d.isLeapMonth),
+                                 (prev.year, prev.month, prev.day, prev.isLeapMonth))
+            elif d.isLeapMonth:
+                self.assertEqual((d.year, d.month), (prev.year, prev.month))
+            elif d.month == 1:
+                self.assertEqual((d.year - 1, 12), (prev.year, prev.month))
+            else:
+                self.assertEqual((d.year, d.month - 1), (prev.year, prev.month))
+            prev = d
+        self.assertEqual(prev, self.theclass.max)
+
     def test_extreme_ordinals(self):
         a = self.theclass.min
         a = self.theclass(a.year, a.month, a.day)
@@ -401,6 +445,49 @@ class TestCnlunardate(unittest.TestCase):
             self.assertEqual(self.theclass(2017, 1, 3+i).weekday(), i)
             self.assertEqual(self.theclass(2017, 1, 3+i).isoweekday(), i+1)
 
+    def test_range(self):
+        day = timedelta(1)
+        start = self.theclass(2017, 6, 28)
+        stop = self.theclass(2017, 6, 3, True)
+        expected = [self.theclass(2017, 6, 28), self.theclass(2017, 6, 29),
+                    self.theclass(2017, 6, 1, True), self.theclass(2017, 6, 2, True)]
+        self.assertEqual(list(self.theclass.range(start, stop)), expected)
+        self.assertEqual(list(self.theclass.range(stop, start, -day)),
+                         [self.theclass(2017, 6, 3, True)] + expected[:0:-1])
+        self.assertEqual(list(self.theclass.range(stop, start)), [])
+        for d in self.theclass.range(start, stop):
+            self.assertIsInstance(d, self.theclass)
+
+        # Every day of the supported range, and a long step across years.
+        a, b = self.theclass.min, self.theclass.max
+        n = a.toordinal()
+        for d in self.theclass.range(a, b):
+            self.assertEqual(d.toordinal(), n)
+            n += 1
+        self.assertEqual(n, b.toordinal())
+        week = timedelta(weeks=53)
+        days = list(self.theclass.range(b, a, -week))
+        self.assertEqual(days, [b - k * week for k in range(len(days))])
+        self.assertLess(days[-1].toordinal() - week.days, a.toordinal())
+        self.assertRaises(ValueError, self.theclass.range, a, b, timedelta(0))
+        self.assertRaises(TypeError, self.theclass.range, a, b, 1)
+        self.assertRaises(TypeError, self.theclass.range, a, date(2000, 1, 1))
+
+    def test_solarrange(self):
+        first = self.theclass.solarrange(date(2017, 7, 21), date(2017, 7, 25))
+        self.assertEqual(list(first), [self.theclass(2017, 6, 28),
+                                       self.theclass(2017, 6, 29),
+                                       self.theclass(2017, 6, 1, True),
+                                       self.theclass(2017, 6, 2, True)])
+        # Iteration stops at the end of the supported range.
+        tail = list(self.theclass.solarrange(date(2100, 12, 30), date(2200, 1, 1)))
+        self.assertEqual(tail, [self.theclass.max - timedelta(1), self.theclass.max])
+        head = list(self.theclass.solarrange(date(1900, 2, 1), date(1800, 1, 1),
+                                             timedelta(-1)))
+        self.assertEqual(head, [self.theclass.min + timedelta(1), self.theclass.min])
+        self.assertRaises(ValueError, self.theclass.solarrange,
+                          date(1900, 1, 30), date(1900, 3, 1))
+
     def test_isocalendar(self):
         # Check examples from
         # http://www.phys.uu.nl/~vgent/calendar/isocalendar.htm
@@ -702,3 +789,1271 @@ class TestCnlunardate(unittest.TestCase):
             green = pickler.dumps(orig, proto)
             derived = unpickler.loads(green)
             self.assertEqual(orig, derived)
+
+
+class TestCnlunardateWithDayTable(TestCnlunardate):
+
+    def setUp(self):
+        cnlunardate_module.enable_day_table()
+
+    def tearDown(self):
+        cnlunardate_module.disable_day_table()
+
+
+class TestDayTable(unittest.TestCase):
+
+    def tearDown(self):
+        cnlunardate_module.disable_day_table()
+
+    def test_lazy_build(self):
+        self.assertFalse(cnlunardate_module.day_table_active())
+        cnlunardate_module.enable_day_table()
+        self.assertFalse(cnlunardate_module.day_table_active())
+        self.assertEqual(cnlunardate.fromordinal(736504),
+                         cnlunardate(2017, 6, 1))
+        self.assertTrue(cnlunardate_module.day_table_active())
+        cnlunardate_module.disable_day_table()
+        self.assertFalse(cnlunardate_module.day_table_active())
+
+    def test_save_and_load(self):
+        import os
+        import tempfile
+
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        cnlunardate_module.build_day_table(path)
+        cnlunardate_module.disable_day_table()
+        cnlunardate_module.load_day_table(path)
+        self.assertTrue(cnlunardate_module.day_table_active())
+        for n in range(cnlunardate.min.toordinal(),
+                       cnlunardate.max.toordinal() + 1, 97):
+            d = cnlunardate.fromordinal(n)
+            self.assertEqual(d.toordinal(), n)
+        self.assertEqual(cnlunardate.fromordinal(cnlunardate.max.toordinal()),
+                         cnlunardate.max)
+        cnlunardate_module.disable_day_table()
+
+        with open(path, "r+b") as f:
+            f.write(b"garbage!")
+        self.assertRaises(ValueError, cnlunardate_module.load_day_table, path)
+        self.assertFalse(cnlunardate_module.day_table_active())
+
+
+class TestPackedRepresentation(unittest.TestCase):
+
+    def test_chronological_order(self):
+        regular, leap = cnlunardate(2017, 6, 29), cnlunardate(2017, 6, 1, True)
+        self.assertLess(regular, leap)
+        self.assertLess(leap, cnlunardate(2017, 7, 1))
+        dates = [cnlunardate.fromordinal(n)
+                 for n in range(cnlunardate(2017, 1, 1).toordinal(),
+                                cnlunardate(2018, 1, 1).toordinal())]
+        self.assertEqual(sorted(reversed(dates)), dates)
+        self.assertEqual(sorted(dates, key=cnlunardate.toordinal), dates)
+
+    def test_fields(self):
+        for d in (cnlunardate.min, cnlunardate.max, cnlunardate(2017, 6, 30, True)):
+            e = cnlunardate.fromordinal(d.toordinal())
+            self.assertEqual((e.year, e.month, e.day, e.isLeapMonth),
+                             (d.year, d.month, d.day, d.isLeapMonth))
+            self.assertIs(type(e.isLeapMonth), bool)
+            self.assertEqual(hash(d), hash(e))
+        self.assertEqual(cnlunardate.__slots__, ('_code',))
+
+    def test_arithmetic_results(self):
+        d = cnlunardate(2017, 6, 29)
+        e = d + timedelta(1)
+        self.assertEqual(e, cnlunardate(2017, 6, 1, True))
+        self.assertEqual(e.toordinal(), d.toordinal() + 1)
+        f = e - timedelta(1)
+        self.assertEqual(f, d)
+        self.assertEqual(e - d, timedelta(1))
+
+    def test_subclass_arithmetic(self):
+        self.assertIs(type(SubclassDate(2017, 6, 29) + timedelta(1)),
+                      SubclassDate)
+        self.assertIs(type(SubclassDate(2017, 6, 29) - timedelta(1)),
+                      SubclassDate)
+
+
+class TestLazyMonthIndex(unittest.TestCase):
+
+    def test_not_built_on_import(self):
+        code = ("import cnlunardate as c\n"
+                "assert c._month_starts is None\n"
+                "assert c.cnlunardate.min.toordinal() == c._MINORDINAL\n"
+                "assert c.cnlunardate.max.toordinal() == c._MAXORDINAL\n"
+                "assert c._month_starts is None\n"
+                "assert c.cnlunardate(1900, 1, 1) == c.cnlunardate.min\n"
+                "assert c._month_starts is not None\n")
+        subprocess.run([sys.executable, "-c", code], check=True,
+                       cwd=os.path.dirname(os.path.abspath(cnlunardate_module.__file__)))
+
+    def test_concurrent_first_use(self):
+        # Slow builds widen the window in which threads race to build.
+        code = (
+            "import threading, time\n"
+            "from datetime import date\n"
+            "import cnlunardate as c\n"
+            "builds = []\n"
+            "def slow(build):\n"
+            "    def wrapper():\n"
+            "        builds.append(build.__name__)\n"
+            "        time.sleep(0.05)\n"
+            "        return build()\n"
+            "    return wrapper\n"
+            "c._build_month_index = slow(c._build_month_index)\n"
+            "c._build_day_table = slow(c._build_day_table)\n"
+            "def run_threads():\n"
+            "    barrier = threading.Barrier(8)\n"
+            "    results = []\n"
+            "    def convert():\n"
+            "        barrier.wait()\n"
+            "        results.append((c.cnlunardate.fromsolardate(date(2017, 7, 23)),\n"
+            "                        c.solar_term(date(2017, 7, 23)).name))\n"
+            "    threads = [threading.Thread(target=convert) for i in range(8)]\n"
+            "    for t in threads: t.start()\n"
+            "    for t in threads: t.join()\n"
+            "    assert results == [(c.cnlunardate(2017, 6, 1, True), '大暑')] * 8, results\n"
+            "run_threads()\n"
+            "assert builds == ['_build_month_index'], builds\n"
+            "builds.clear()\n"
+            "c.enable_day_table()\n"
+            "run_threads()\n"
+            "assert builds == ['_build_day_table'], builds\n")
+        subprocess.run([sys.executable, "-c", code], check=True,
+                       cwd=os.path.dirname(os.path.abspath(cnlunardate_module.__file__)))
+
+
+class TestYearInfo(unittest.TestCase):
+
+    def test_matches_dates(self):
+        for year in range(MIN_YEAR, MAX_YEAR + 1):
+            info = cnlunardate_module.year_info(year)
+            first = cnlunardate(year, 1, 1).toordinal()
+            end = (cnlunardate.max.toordinal() + 1 if year == MAX_YEAR
+                   else cnlunardate(year + 1, 1, 1).toordinal())
+            self.assertEqual(info.year, year)
+            self.assertEqual(info.first_ordinal, first)
+            self.assertEqual(info.days, end - first)
+            self.assertEqual(cnlunardate_module.days_in_year(year), end - first)
+            self.assertEqual(sum(info.month_days), info.days)
+            self.assertEqual(len(info.month_days), 13 if info.leap_month else 12)
+            months = [(m, False) for m in range(1, 13)]
+            if info.leap_month:
+                months.insert(info.leap_month, (info.leap_month, True))
+            for i, (m, l) in enumerate(months):
+                days = info.month_days[i]
+                self.assertEqual(cnlunardate_module.days_in_month(year, m, l), days)
+                self.assertEqual(info.month_offset(m, l), info.month_offsets[i])
+                self.assertEqual(cnlunardate(year, m, 1, l).toordinal(),
+                                 first + info.month_offsets[i])
+                cnlunardate(year, m, days, l)
+                if year != MAX_YEAR or m != 12:
+                    self.assertRaises(ValueError, cnlunardate, year, m, days + 1, l)
+
+    def test_leap_month(self):
+        self.assertEqual(cnlunardate_module.leap_month(2017), 6)
+        self.assertEqual(cnlunardate_module.leap_month(2018), 0)
+        info = cnlunardate_module.year_info(2017)
+        self.assertEqual(info.month_days[5:7], (29, 30))
+        self.assertEqual(cnlunardate_module.days_in_month(2017, 6), 29)
+        self.assertEqual(cnlunardate_module.days_in_month(2017, 6, True), 30)
+        self.assertRaises(ValueError, cnlunardate_module.days_in_month, 2018, 6, True)
+
+    def test_max_year(self):
+        info = cnlunardate_module.year_info(MAX_YEAR)
+        self.assertEqual(info.month_days[-1], cnlunardate.max.day)
+        self.assertEqual(info.first_ordinal + info.days - 1,
+                         cnlunardate.max.toordinal())
+
+    def test_invalid(self):
+        for year in MIN_YEAR - 1, MAX_YEAR + 1:
+            self.assertRaises(ValueError, cnlunardate_module.year_info, year)
+            self.assertRaises(ValueError, cnlunardate_module.leap_month, year)
+            self.assertRaises(ValueError, cnlunardate_module.days_in_year, year)
+        self.assertRaises(TypeError, cnlunardate_module.year_info, 2017.0)
+        for month in 0, 13:
+            self.assertRaises(ValueError, cnlunardate_module.days_in_month, 2017, month)
+        self.assertRaises(TypeError, cnlunardate_module.days_in_month, 2017, 1, "1")
+        self.assertRaises(TypeError, cnlunardate_module.LunarYearInfo)
+
+    def test_shared(self):
+        info = cnlunardate_module.year_info(2017)
+        self.assertIs(cnlunardate_module.year_info(2017), info)
+        self.assertIs(pickle.loads(pickle.dumps(info)), info)
+        self.assertRaises(AttributeError, setattr, info, "days", 0)
+        self.assertEqual(repr(info),
+                         "cnlunardate.LunarYearInfo(year=2017, leap_month=6, days=384)")
+
+
+@unittest.skipIf(np is None, "requires numpy")
+class TestSolar2Lunar(unittest.TestCase):
+
+    def test_full_range(self):
+        from cnlunardate import _MINORDINAL, _MAXORDINAL
+
+        ords = np.arange(_MINORDINAL - 1, _MAXORDINAL + 2)
+        lunar, invalid = cnlunardate_module.solar2lunar(ords)
+        self.assertEqual(invalid.tolist(),
+                         [True] + [False] * (len(ords) - 2) + [True])
+        self.assertEqual(tuple(lunar[0]), (0, 0, 0, False))
+        self.assertEqual(tuple(lunar[-1]), (0, 0, 0, False))
+        for n, fields in zip(ords[1:-1:101].tolist(), lunar[1:-1:101].tolist()):
+            d = cnlunardate.fromordinal(n)
+            self.assertEqual(fields, (d.year, d.month, d.day, d.isLeapMonth))
+        self.assertEqual(tuple(lunar[-2]), (2100, 12, 1, False))
+
+    def test_datetime64(self):
+        values = np.array(["2017-06-24", "2017-07-23T23:59", "NaT",
+                           "1900-01-30", "2017-08-22"], dtype="datetime64[m]")
+        lunar, invalid = cnlunardate_module.solar2lunar(values)
+        self.assertEqual(invalid.tolist(), [False, False, True, True, False])
+        self.assertEqual(lunar["year"].tolist(), [2017, 2017, 0, 0, 2017])
+        self.assertEqual(lunar["month"].tolist(), [6, 6, 0, 0, 7])
+        self.assertEqual(lunar["day"].tolist(), [1, 1, 0, 0, 1])
+        self.assertEqual(lunar["isLeapMonth"].tolist(),
+                         [False, True, False, False, False])
+
+    def test_bad_dtype(self):
+        self.assertRaises(TypeError, cnlunardate_module.solar2lunar,
+                          np.array([1.0]))
+
+
+@unittest.skipIf(np is None, "requires numpy")
+class TestTimestamp2Lunar(unittest.TestCase):
+
+    def test_matches_fromtimestamp(self):
+        stamps = np.arange(-2208988800, 4102444800 + 86400, 86400 * 37 + 3607, dtype=np.int64)
+        lunar, invalid = cnlunardate_module.timestamp2lunar(stamps)
+        for t, fields, bad in zip(stamps.tolist(), lunar.tolist(), invalid.tolist()):
+            try:
+                dt = cnlunardatetime.fromtimestamp(t)
+            except ValueError:
+                self.assertTrue(bad)
+                self.assertEqual(fields, (0, 0, 0, False))
+            else:
+                self.assertFalse(bad)
+                self.assertEqual(fields, (dt.year, dt.month, dt.day, dt.isLeapMonth))
+
+    def test_units_and_timezones(self):
+        start = TestCnlunardatetime.LEAP_MONTH_START
+        stamps = np.array([start - 1, start])
+        expected = [(2017, 6, 29, False), (2017, 6, 1, True)]
+        for unit, scale in ("s", 1), ("ms", 1000), ("us", 10 ** 6), ("ns", 10 ** 9):
+            lunar, invalid = cnlunardate_module.timestamp2lunar(stamps * scale, unit)
+            self.assertEqual(lunar.tolist(), expected)
+            self.assertFalse(invalid.any())
+        lunar, _ = cnlunardate_module.timestamp2lunar(stamps, tz=timezone.utc)
+        self.assertEqual(lunar.tolist(), [(2017, 6, 29, False)] * 2)
+        lunar, _ = cnlunardate_module.timestamp2lunar(
+            stamps + 8 * 3600, tz=timezone(timedelta(hours=-8)))
+        self.assertEqual(lunar.tolist(), [(2017, 6, 29, False)] * 2)
+
+    def test_invalid(self):
+        lunar, invalid = cnlunardate_module.timestamp2lunar(
+            np.array([-2208988800, 0, 10 ** 12]))
+        self.assertEqual(invalid.tolist(), [True, False, True])
+        self.assertEqual(lunar[0].tolist(), (0, 0, 0, False))
+        timestamp2lunar = cnlunardate_module.timestamp2lunar
+        # Nothing outside int64 may wrap around into a valid date.
+        big = np.array([2 ** 64 - 86400 * 365 * 10, 2 ** 63, 2 ** 63 - 1, 0],
+                       dtype=np.uint64)
+        lunar, invalid = timestamp2lunar(big)
+        self.assertEqual(invalid.tolist(), [True, True, True, False])
+        self.assertEqual(lunar[0].tolist(), (0, 0, 0, False))
+        limits = np.iinfo(np.int64)
+        extremes = np.array([limits.min, limits.max, 0], dtype=np.int64)
+        for tz in CHINA_TZ, timezone(timedelta(hours=-8)), timezone.utc:
+            for unit in "s", "ns":
+                lunar, invalid = timestamp2lunar(extremes, unit, tz)
+                self.assertEqual(invalid.tolist(), [True, True, False])
+                self.assertEqual(lunar[:2].tolist(), [(0, 0, 0, False)] * 2)
+        self.assertRaises(TypeError, timestamp2lunar, np.array([1.0]))
+        self.assertRaises(ValueError, timestamp2lunar, np.array([0]), "m")
+        self.assertRaises(TypeError, timestamp2lunar, np.array([0]), tz=8)
+
+
+@unittest.skipIf(np is None, "requires numpy")
+class TestLunar2Solar(unittest.TestCase):
+
+    def test_matches_constructor(self):
+        grid = np.array(np.meshgrid([MIN_YEAR - 1, MIN_YEAR, 2017, 2018, MAX_YEAR, MAX_YEAR + 1],
+                                    range(0, 14), range(0, 32), [False, True])
+                        ).reshape(4, -1)
+        year, month, day, isLeapMonth = grid[0], grid[1], grid[2], grid[3].astype(bool)
+        ords, invalid = cnlunardate_module.lunar2solar(
+            year, month, day, isLeapMonth, ordinal=True)
+        for row in zip(year.tolist(), month.tolist(), day.tolist(),
+                       isLeapMonth.tolist(), ords.tolist(), invalid.tolist()):
+            try:
+                expected = cnlunardate(*row[:4]).toordinal()
+            except ValueError:
+                self.assertTrue(row[5], row)
+                self.assertEqual(row[4], 0)
+            else:
+                self.assertFalse(row[5], row)
+                self.assertEqual(row[4], expected)
+
+    def test_datetime64_and_broadcasting(self):
+        solar, invalid = cnlunardate_module.lunar2solar(2017, 6, [1, 30, 31], True)
+        self.assertEqual(solar.dtype, np.dtype("datetime64[D]"))
+        self.assertEqual(solar.astype(str).tolist(),
+                         ["2017-07-23", "2017-08-21", "NaT"])
+        self.assertEqual(invalid.tolist(), [False, False, True])
+
+    def test_scalars(self):
+        solar, invalid = cnlunardate_module.lunar2solar(2017, 6, 1, True)
+        self.assertEqual(solar.shape, ())
+        self.assertEqual(solar, np.datetime64("2017-07-23"))
+        self.assertFalse(invalid)
+        solar, invalid = cnlunardate_module.lunar2solar(2017, 13, 1)
+        self.assertTrue(np.isnat(solar))
+        self.assertTrue(invalid)
+        ords, invalid = cnlunardate_module.lunar2solar(2017, 6, 1, True, ordinal=True)
+        self.assertEqual(ords, 736533)
+        self.assertFalse(invalid)
+
+    def test_round_trip(self):
+        ords = np.arange(cnlunardate.min.toordinal(),
+                         cnlunardate.max.toordinal() + 1)
+        lunar, _ = cnlunardate_module.solar2lunar(ords)
+        back, invalid = cnlunardate_module.lunar2solar(
+            lunar["year"], lunar["month"], lunar["day"], lunar["isLeapMonth"],
+            ordinal=True)
+        self.assertFalse(invalid.any())
+        self.assertTrue((back == ords).all())
+
+    def test_bad_dtype(self):
+        self.assertRaises(TypeError, cnlunardate_module.lunar2solar,
+                          2017.0, 1, 1)
+
+
+@unittest.skipIf(pd is None, "requires pandas")
+class TestPandasExtension(unittest.TestCase):
+
+    def setUp(self):
+        self.solar = pd.Series(pd.to_datetime(
+            ["2017-07-23", "2017-06-24", None, "1800-01-01", "2017-06-25"]),
+            name="d")
+
+    def test_fields_from_datetime(self):
+        acc = self.solar.cnlunar
+        self.assertEqual(acc.year.tolist(), [2017, 2017, pd.NA, pd.NA, 2017])
+        self.assertEqual(acc.month.tolist(), [6, 6, pd.NA, pd.NA, 6])
+        self.assertEqual(acc.day.tolist(), [1, 1, pd.NA, pd.NA, 2])
+        self.assertEqual(acc.is_leap_month.tolist(),
+                         [True, False, pd.NA, pd.NA, False])
+        self.assertEqual(acc.year.name, "d")
+        index = pd.DatetimeIndex(["2017-06-24"])
+        self.assertEqual(index.cnlunar.month.tolist(), [6])
+
+    def test_from_and_to_solar(self):
+        lunar = self.solar.cnlunar.from_solar()
+        self.assertIsInstance(lunar.dtype, cnlunardate_pandas.LunarDateDtype)
+        self.assertEqual(lunar[0], cnlunardate(2017, 6, 1, True))
+        self.assertIs(lunar[2], pd.NA)
+        self.assertEqual(lunar.cnlunar.day.tolist(), [1, 1, pd.NA, pd.NA, 2])
+        back = lunar.cnlunar.to_solar()
+        self.assertEqual(back[[0, 1, 4]].tolist(), self.solar[[0, 1, 4]].tolist())
+        self.assertTrue(back[[2, 3]].isna().all())
+
+    def test_sort_and_group(self):
+        lunar = self.solar.cnlunar.from_solar()
+        self.assertEqual(lunar.sort_values().tolist()[:3],
+                         [cnlunardate(2017, 6, 1), cnlunardate(2017, 6, 2),
+                          cnlunardate(2017, 6, 1, True)])
+        counts = pd.concat([lunar, lunar]).value_counts()
+        self.assertEqual(counts[cnlunardate(2017, 6, 1, True)], 2)
+        self.assertEqual(len(counts), 3)
+        self.assertEqual(lunar.groupby(lunar).size().tolist(), [1, 1, 1])
+        self.assertEqual(lunar.min(), cnlunardate(2017, 6, 1))
+        self.assertEqual(lunar.max(), cnlunardate(2017, 6, 1, True))
+        self.assertEqual((lunar == cnlunardate(2017, 6, 1)).tolist(),
+                         [False, True, False, False, False])
+
+    def test_construct_from_scalars(self):
+        s = pd.Series([cnlunardate(2017, 6, 1), None], dtype="cnlunardate")
+        self.assertEqual(s.isna().tolist(), [False, True])
+        self.assertRaises(TypeError, pd.Series, [1], dtype="cnlunardate")
+        self.assertRaises(AttributeError, lambda: pd.Series([1]).cnlunar)
+
+
+class TestMonthCalendar(unittest.TestCase):
+
+    def test_monthcalendar(self):
+        import calendar
+
+        # Leap month 6 of 2017 starts on Sunday 2017-07-23 and has 30 days.
+        weeks = cnlunardate_module.monthcalendar(2017, 6, True)
+        self.assertEqual(weeks[0], (0, 0, 0, 0, 0, 0, 1))
+        self.assertEqual(weeks[-1], (30, 0, 0, 0, 0, 0, 0))
+        self.assertEqual([d for week in weeks for d in week if d],
+                         list(range(1, 31)))
+        weeks = cnlunardate_module.monthcalendar(2017, 6, True, firstweekday=6)
+        self.assertEqual(weeks[0], (1, 2, 3, 4, 5, 6, 7))
+        self.assertEqual(cnlunardate_module.monthcalendar(2100, 12),
+                         ((0, 0, 0, 0, 1, 0, 0),))
+        # Month 5 of 2017 starts on Friday 2017-05-26, like solar
+        # September 2017 starts on a Friday.
+        lunar = cnlunardate_module.monthcalendar(2017, 5)
+        self.assertEqual(lunar[0], tuple(calendar.monthcalendar(2017, 9)[0]))
+
+        self.assertRaises(ValueError, cnlunardate_module.monthcalendar, 2017, 1, True)
+        self.assertRaises(ValueError, cnlunardate_module.monthcalendar, 2017, 13)
+        self.assertRaises(ValueError, cnlunardate_module.monthcalendar, 2017, 1,
+                          False, 7)
+
+    def test_solarmonthcalendar(self):
+        import calendar
+
+        weeks = cnlunardate_module.solarmonthcalendar(2017, 7)
+        days = [None if cell is None else cell[0] for week in weeks for cell in week]
+        expected = [d or None for week in calendar.monthcalendar(2017, 7) for d in week]
+        self.assertEqual(days, expected)
+        cells = [cell for week in weeks for cell in week if cell is not None]
+        for day, lunar in cells:
+            self.assertEqual(lunar.tosolardate(), date(2017, 7, day))
+
+        # Days before MIN_DATE have no lunar date.
+        weeks = cnlunardate_module.solarmonthcalendar(1900, 1)
+        cells = [cell for week in weeks for cell in week if cell is not None]
+        self.assertEqual([lunar for _, lunar in cells[:30]], [None] * 30)
+        self.assertEqual(cells[30], (31, cnlunardate.min))
+
+        self.assertRaises(ValueError, cnlunardate_module.solarmonthcalendar, 1899, 12)
+        self.assertRaises(ValueError, cnlunardate_module.solarmonthcalendar, 2017, 0)
+
+    def test_cached(self):
+        self.assertIs(cnlunardate_module.monthcalendar(2017, 6, True),
+                      cnlunardate_module.monthcalendar(2017, 6, True))
+        self.assertIs(cnlunardate_module.solarmonthcalendar(2017, 7),
+                      cnlunardate_module.solarmonthcalendar(2017, 7))
+
+
+class TestCnlunardateWithInterning(TestCnlunardate):
+
+    def setUp(self):
+        cnlunardate_module.enable_interning(64)
+
+    def tearDown(self):
+        cnlunardate_module.disable_interning()
+        cnlunardate_module.clear_intern_cache()
+
+
+class TestInterning(unittest.TestCase):
+
+    def tearDown(self):
+        cnlunardate_module.disable_interning()
+        cnlunardate_module.clear_intern_cache()
+
+    def test_threads(self):
+        cnlunardate_module.enable_interning(maxsize=16)
+        errors = []
+
+        def convert(offset):
+            try:
+                for n in range(736504 + offset, 736504 + offset + 2000, 3):
+                    if cnlunardate.fromordinal(n).toordinal() != n:
+                        errors.append(n)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=convert, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(cnlunardate_module.intern_info().currsize, 16)
+
+    def test_hits_do_not_lock(self):
+        cnlunardate_module.enable_interning(4)
+        a = cnlunardate.fromordinal(736504)
+        locked, release, done = threading.Event(), threading.Event(), threading.Event()
+        results = []
+
+        def hold_lock():
+            with cnlunardate_module._intern_lock:
+                locked.set()
+                release.wait(10)
+
+        def hit():
+            results.append(cnlunardate.fromordinal(736504))
+            done.set()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            locked.wait(10)
+            reader = threading.Thread(target=hit)
+            reader.start()
+            done.wait(5)
+            self.assertEqual(results, [a])
+            self.assertIs(results[0], a)
+        finally:
+            release.set()
+            holder.join()
+            reader.join()
+
+    def test_counts_from_threads(self):
+        cnlunardate_module.enable_interning(4)
+        cnlunardate.fromordinal(736504)
+
+        def hit():
+            for _ in range(100):
+                cnlunardate.fromordinal(736504)
+
+        threads = [threading.Thread(target=hit) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(cnlunardate_module.intern_info()[:2], (400, 1))
+
+    def test_ended_threads_release_counters(self):
+        cnlunardate_module.enable_interning(4)
+        cnlunardate.fromordinal(736504)
+        for _ in range(200):
+            t = threading.Thread(target=cnlunardate.fromordinal, args=(736504,))
+            t.start()
+            t.join()
+        self.assertLessEqual(len(cnlunardate_module._intern_counters), 2)
+        self.assertEqual(cnlunardate_module.intern_info()[:2], (200, 1))
+        cnlunardate_module.clear_intern_cache()
+        self.assertEqual(cnlunardate_module.intern_info()[:2], (0, 0))
+
+    def test_disabled_by_default(self):
+        self.assertIsNot(cnlunardate.fromordinal(736504),
+                         cnlunardate.fromordinal(736504))
+        self.assertEqual(cnlunardate_module.intern_info(), (0, 0, 0, 0))
+
+    def test_shared_instances(self):
+        cnlunardate_module.enable_interning(2)
+        a = cnlunardate.fromordinal(736504)
+        self.assertIs(cnlunardate.fromsolardate(date(2017, 6, 24)), a)
+        self.assertIs(cnlunardate(2017, 5, 29) + timedelta(1), a)
+        self.assertIs(cnlunardate(2017, 6, 2) - timedelta(1), a)
+        self.assertIsNot(cnlunardate(2017, 6, 1), a)
+        self.assertIsNot(SubclassDate.fromordinal(736504), a)
+        self.assertEqual(cnlunardate_module.intern_info(), (3, 1, 2, 1))
+
+        # Least recently used entries are evicted.
+        cnlunardate.fromordinal(736505)
+        cnlunardate.fromordinal(736504)
+        cnlunardate.fromordinal(736506)
+        self.assertIs(cnlunardate.fromordinal(736504), a)
+        self.assertEqual(cnlunardate_module.intern_info().currsize, 2)
+        self.assertIsNot(cnlunardate.fromordinal(736505),
+                         cnlunardate.fromordinal(736506))
+
+        cnlunardate_module.clear_intern_cache()
+        self.assertEqual(cnlunardate_module.intern_info(), (0, 0, 2, 0))
+        self.assertIsNot(cnlunardate.fromordinal(736504), a)
+
+    def test_resize(self):
+        cnlunardate_module.enable_interning(4)
+        for n in range(736504, 736508):
+            cnlunardate.fromordinal(n)
+        cnlunardate_module.enable_interning(2)
+        self.assertEqual(cnlunardate_module.intern_info().currsize, 2)
+        self.assertRaises(ValueError, cnlunardate_module.enable_interning, 0)
+
+
+class TestBulkSerialization(unittest.TestCase):
+
+    def setUp(self):
+        self.dates = [cnlunardate.min, cnlunardate(2017, 6, 1),
+                      cnlunardate(2017, 6, 30, True), cnlunardate.max,
+                      cnlunardate(2017, 6, 1)]
+
+    def test_round_trip(self):
+        data = cnlunardate_module.dumps_many(self.dates)
+        self.assertEqual(len(data), 8 + 4 * len(self.dates))
+        self.assertEqual(cnlunardate_module.loads_many(data), self.dates)
+        self.assertEqual(cnlunardate_module.loads_many(bytearray(data)), self.dates)
+        self.assertEqual(cnlunardate_module.loads_many(
+            cnlunardate_module.dumps_many(iter(self.dates))), self.dates)
+        self.assertEqual(cnlunardate_module.loads_many(
+            cnlunardate_module.dumps_many([])), [])
+
+    def test_legacy_states(self):
+        data = cnlunardate_module.dumps_many(self.dates, legacy=True)
+        self.assertEqual(len(data), 8 + 5 * len(self.dates))
+        self.assertEqual(cnlunardate_module.loads_many(data), self.dates)
+        # A bare concatenation of pickle states is accepted too.
+        states = b"".join(d._getstate()[0] for d in self.dates)
+        self.assertEqual(data[8:], states)
+        self.assertEqual(cnlunardate_module.loads_many(states), self.dates)
+
+    def test_bad_data(self):
+        data = cnlunardate_module.dumps_many(self.dates)
+        self.assertRaises(TypeError, cnlunardate_module.dumps_many, [date(2017, 1, 1)])
+        self.assertRaises(ValueError, cnlunardate_module.loads_many, data[:-1])
+        self.assertRaises(ValueError, cnlunardate_module.loads_many, data[:4])
+        self.assertRaises(ValueError, cnlunardate_module.loads_many,
+                          data[:4] + b"\x02" + data[5:])
+        self.assertRaises(ValueError, cnlunardate_module.loads_many,
+                          data[:8] + b"\xff\xff\xff\x00")
+        self.assertRaises(ValueError, cnlunardate_module.loads_many, b"\x07\xe1\x01")
+        # Invalid states are rejected by the constructor.
+        self.assertRaises(ValueError, cnlunardate_module.loads_many,
+                          b"\x07\xe1\x01\x01\x01")
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def tearDown(self):
+        cnlunardate_module.disable_instrumentation()
+
+    def test_disabled_by_default(self):
+        self.assertFalse(cnlunardate_module.instrumentation_enabled())
+        self.assertEqual(cnlunardate.toordinal.__code__.co_name, "toordinal")
+        self.assertEqual(cnlunardate_module._ord2code.__code__.co_name, "_ord2code")
+
+    def test_counts(self):
+        cnlunardate_module.enable_instrumentation()
+        d = cnlunardate.fromsolardate(date(2017, 6, 24))
+        d.toordinal()
+        cnlunardate(2017, 6, 1, True).toordinal()
+        self.assertRaises(ValueError, cnlunardate, 2017, 1, 1, True)
+        cnlunardate_module.monthcalendar(1999, 1)
+        cnlunardate_module.monthcalendar(1999, 1)
+        snapshot = cnlunardate_module.instrumentation_snapshot()
+        calls = {name: stats["calls"] for name, stats in snapshot["calls"].items()}
+        self.assertEqual(calls["fromsolardate"], 1)
+        self.assertEqual(calls["fromordinal"], 0)
+        self.assertEqual(calls["__new__"], 2)
+        self.assertEqual(calls["_solar2ord"], 1)
+        self.assertEqual(calls["_ord2code"], 1)
+        self.assertEqual(calls["_ymdl2code"], 1)
+        self.assertEqual(calls["_check_date_fields"], 4)
+        self.assertGreater(snapshot["calls"]["fromsolardate"]["seconds"], 0)
+        self.assertEqual(snapshot["caches"]["monthcalendar"], {"hits": 1, "misses": 1})
+
+        cnlunardate_module.disable_instrumentation()
+        cnlunardate.fromordinal(736504)
+        self.assertEqual(cnlunardate_module.instrumentation_snapshot()["calls"]
+                         ["fromordinal"]["calls"], 0)
+        cnlunardate_module.reset_instrumentation()
+        self.assertEqual(cnlunardate_module.instrumentation_snapshot()["calls"]
+                         ["fromsolardate"]["calls"], 0)
+
+    def test_cleared_cache(self):
+        cnlunardate_module.enable_interning(4)
+        try:
+            for _ in range(5):
+                cnlunardate.fromordinal(736504)
+            cnlunardate_module.reset_instrumentation()
+            cnlunardate_module.clear_intern_cache()
+            # More lookups after the clear than before the reset.
+            for _ in range(8):
+                cnlunardate.fromordinal(736504)
+            self.assertEqual(cnlunardate_module.instrumentation_snapshot()
+                             ["caches"]["intern"], {"hits": 7, "misses": 1})
+        finally:
+            cnlunardate_module.disable_interning()
+            cnlunardate_module.clear_intern_cache()
+
+    def test_context_manager(self):
+        with cnlunardate_module.instrumented() as outer:
+            cnlunardate.fromordinal(736504)
+            with cnlunardate_module.instrumented() as inner:
+                cnlunardate.today()
+            self.assertTrue(cnlunardate_module.instrumentation_enabled())
+        self.assertFalse(cnlunardate_module.instrumentation_enabled())
+        self.assertEqual(inner["calls"]["today"]["calls"], 1)
+        self.assertEqual(inner["calls"]["fromordinal"]["calls"], 0)
+        self.assertEqual(outer["calls"]["today"]["calls"], 1)
+        self.assertEqual(outer["calls"]["fromordinal"]["calls"], 1)
+        self.assertEqual(cnlunardate.fromordinal(736504), cnlunardate(2017, 6, 1))
+
+
+class TestLunarDelta(unittest.TestCase):
+
+    def test_add_months(self):
+        LunarDelta = cnlunardate_module.LunarDelta
+        d = cnlunardate(2017, 4, 30)
+        self.assertEqual(d + LunarDelta(months=1), cnlunardate(2017, 5, 29))
+        self.assertEqual(d + LunarDelta(months=3), cnlunardate(2017, 6, 30, True))
+        self.assertEqual(d + LunarDelta(months=2, missing="next"), cnlunardate(2017, 6, 1, True))
+        self.assertRaises(ValueError, d.__add__, LunarDelta(months=1, missing="raise"))
+        self.assertEqual(d + LunarDelta(months=13), cnlunardate(2018, 4, 30))
+        self.assertEqual(LunarDelta(months=-13) + cnlunardate(2018, 4, 30), d)
+        self.assertEqual(cnlunardate(2017, 7, 1) - LunarDelta(months=1), cnlunardate(2017, 6, 1, True))
+        self.assertEqual(d + LunarDelta(months=1, days=1), cnlunardate(2017, 6, 1))
+        for n in range(-100, 100, 7):
+            self.assertEqual(cnlunardate_module.months_between(d, d + LunarDelta(months=n)), n)
+
+    def test_add_years(self):
+        LunarDelta = cnlunardate_module.LunarDelta
+        leap = cnlunardate(2017, 6, 30, True)
+        self.assertEqual(leap + LunarDelta(years=1), cnlunardate(2018, 6, 29))
+        self.assertEqual(leap + LunarDelta(years=1, missing="next"), cnlunardate(2018, 7, 1))
+        self.assertRaises(ValueError, leap.__add__, LunarDelta(years=1, leap="raise"))
+        self.assertEqual(cnlunardate(2006, 7, 1, True) + LunarDelta(years=1, months=1),
+                         cnlunardate(2007, 8, 1))
+        self.assertEqual(cnlunardate(2017, 8, 15) - LunarDelta(years=100),
+                         cnlunardate(1917, 8, 15))
+        self.assertRaises(OverflowError, cnlunardate(2017, 1, 1).__add__, LunarDelta(years=100))
+        self.assertRaises(OverflowError, cnlunardate(2100, 11, 15).__add__, LunarDelta(months=1))
+        self.assertRaises(OverflowError, cnlunardate.min.__sub__, LunarDelta(days=1))
+
+    def test_months_between(self):
+        months_between = cnlunardate_module.months_between
+        self.assertEqual(months_between(cnlunardate(2017, 1, 1), cnlunardate(2018, 1, 1)), 13)
+        self.assertEqual(months_between(cnlunardate(2017, 4, 30), cnlunardate(2017, 5, 29)), 1)
+        self.assertEqual(months_between(cnlunardate(2017, 4, 30), cnlunardate(2017, 5, 28)), 0)
+        self.assertEqual(months_between(cnlunardate(2017, 6, 29), cnlunardate(2017, 4, 30)), -1)
+        self.assertEqual(months_between(cnlunardate(2100, 11, 15), cnlunardate.max), 0)
+        self.assertEqual(months_between(cnlunardate(2100, 11, 1), cnlunardate.max), 1)
+        self.assertRaises(TypeError, months_between, date(2017, 1, 1), cnlunardate(2017, 1, 1))
+
+    def test_delta(self):
+        LunarDelta = cnlunardate_module.LunarDelta
+        delta = LunarDelta(1, 2, 3, missing="raise")
+        self.assertEqual((delta.years, delta.months, delta.days, delta.missing, delta.leap),
+                         (1, 2, 3, "raise", "regular"))
+        self.assertEqual(repr(delta),
+                         "cnlunardate.LunarDelta(years=1, months=2, days=3, missing='raise')")
+        self.assertEqual(-delta, LunarDelta(-1, -2, -3, missing="raise"))
+        self.assertEqual(delta * 2, 2 * delta)
+        self.assertEqual(delta - delta, LunarDelta(missing="raise"))
+        self.assertNotEqual(delta, LunarDelta(1, 2, 3))
+        self.assertEqual(hash(delta), hash(LunarDelta(1, 2, 3, missing="raise")))
+        self.assertFalse(LunarDelta())
+        self.assertEqual(pickle.loads(pickle.dumps(delta)), delta)
+        self.assertRaises(ValueError, LunarDelta, missing="first")
+        self.assertRaises(ValueError, LunarDelta, leap="skip")
+        self.assertRaises(TypeError, LunarDelta, 1.5)
+
+
+class TestRecurrence(unittest.TestCase):
+
+    def brute_force(self, start, stop, match):
+        return [d for d in cnlunardate.range(start, stop) if match(d)]
+
+    def test_against_scan(self):
+        rrule, YEARLY, MONTHLY = (cnlunardate_module.rrule, cnlunardate_module.YEARLY,
+                                  cnlunardate_module.MONTHLY)
+        start, stop = cnlunardate(1990, 3, 15), cnlunardate(2040, 1, 1)
+
+        def last_day(d):
+            return (d + timedelta(1)).day == 1
+
+        for rule, match in (
+                (dict(freq=YEARLY, month=8, day=15),
+                 lambda d: (d.month, d.day, d.isLeapMonth) == (8, 15, False)),
+                (dict(freq=YEARLY, month=4, day=10, leap="both"),
+                 lambda d: (d.month, d.day) == (4, 10)),
+                (dict(freq=MONTHLY), lambda d: d.day == 1),
+                (dict(freq=MONTHLY, day=-1), last_day),
+                (dict(freq=MONTHLY, day=30, leap="skip"),
+                 lambda d: d.day == 30 and not d.isLeapMonth),
+                (dict(freq=MONTHLY, day=30, missing="last"),
+                 lambda d: d.day == 30 or (d.day == 29 and last_day(d)))):
+            with self.subTest(**rule):
+                self.assertEqual(list(rrule(start=start, stop=stop, **rule)),
+                                 self.brute_force(start, stop, match))
+
+    def test_leap_birthday(self):
+        rrule, YEARLY = cnlunardate_module.rrule, cnlunardate_module.YEARLY
+        born = cnlunardate(2017, 6, 30, True)
+        self.assertEqual(
+            list(rrule(YEARLY, born, date(2026, 1, 1), month=6, day=30, isLeapMonth=True)),
+            [born])  # leap month 6 of 2025 has 29 days
+        birthdays = list(rrule(YEARLY, born, date(2026, 1, 1), month=6, day=30,
+                               isLeapMonth=True, leap="regular", missing="last"))
+        self.assertEqual([d.year for d in birthdays], list(range(2017, 2026)))
+        self.assertEqual(birthdays[1], cnlunardate(2018, 6, 29))
+        self.assertEqual(birthdays[-1], cnlunardate(2025, 6, 29, True))
+        self.assertEqual(
+            list(rrule(YEARLY, date(2018, 1, 1), date(2019, 1, 1), month=6, day=30,
+                       missing="next")),
+            [cnlunardate(2018, 7, 1)])
+
+    def test_interval_and_bounds(self):
+        rrule, YEARLY, MONTHLY = (cnlunardate_module.rrule, cnlunardate_module.YEARLY,
+                                  cnlunardate_module.MONTHLY)
+        self.assertEqual([d.year for d in rrule(YEARLY, cnlunardate(2017, 9, 1),
+                                                cnlunardate(2030, 1, 1), month=8,
+                                                day=15, interval=4)],
+                         [2021, 2025, 2029])  # 2017's occurrence is before start
+        self.assertEqual(list(rrule(MONTHLY, cnlunardate(2017, 5, 2),
+                                    cnlunardate(2017, 9, 1), interval=2)),
+                         [cnlunardate(2017, 6, 1, True), cnlunardate(2017, 8, 1)])
+        self.assertEqual(list(rrule(MONTHLY, cnlunardate(2100, 10, 1)))[-1], cnlunardate.max)
+        self.assertEqual(list(rrule(MONTHLY, cnlunardate(2100, 10, 1), day=2)),
+                         [cnlunardate(2100, 10, 2), cnlunardate(2100, 11, 2)])
+        self.assertEqual(list(rrule(YEARLY, cnlunardate(2099, 1, 1), month=12, day=-1)),
+                         [cnlunardate(2099, 12, 30)])
+        for kwargs in (dict(freq="daily"), dict(freq=YEARLY), dict(freq=YEARLY, month=13),
+                       dict(freq=MONTHLY, day=0), dict(freq=MONTHLY, day=-30),
+                       dict(freq=MONTHLY, month=1), dict(freq=MONTHLY, interval=0),
+                       dict(freq=MONTHLY, leap="always"),
+                       dict(freq=MONTHLY, missing="previous")):
+            self.assertRaises((TypeError, ValueError), cnlunardate_module.rrule,
+                              start=cnlunardate(2017, 1, 1), **kwargs)
+        self.assertRaises(ValueError, cnlunardate_module.rrule, MONTHLY, date(1800, 1, 1))
+
+
+class TestSolarTerms(unittest.TestCase):
+
+    def test_known_dates(self):
+        for d, name in ((date(1900, 1, 6), "小寒"), (date(2017, 4, 4), "清明"),
+                        (date(2021, 2, 3), "立春"), (date(2020, 12, 21), "冬至"),
+                        (date(2100, 12, 22), "冬至")):
+            term = cnlunardate_module.solar_term(d)
+            self.assertEqual((term.name, term.date), (name, d))
+            self.assertEqual(cnlunardate_module.SOLAR_TERMS[term.index], name)
+
+    def test_table_matches_engine(self):
+        for year in (1900, 1901, 1999, 2017, 2100):
+            self.assertEqual(
+                tuple(t.date.toordinal() for t in cnlunardate_module.solar_terms_in_year(year)),
+                cnlunardate_astro.compute_solar_terms(year))
+
+    def test_search(self):
+        terms = cnlunardate_module.solar_terms_in_year(2017)
+        self.assertEqual([t.index for t in terms], list(range(24)))
+        self.assertEqual(cnlunardate_module.solar_term(date(2017, 4, 19)), terms[6])
+        self.assertEqual(cnlunardate_module.solar_term(cnlunardate(2017, 3, 8)), terms[6])
+        self.assertEqual(cnlunardate_module.next_solar_term(date(2017, 4, 4)), terms[7])
+        self.assertEqual(cnlunardate_module.next_solar_term(date(2017, 12, 22)),
+                         cnlunardate_module.solar_terms_in_year(2018)[0])
+        self.assertRaises(ValueError, cnlunardate_module.solar_term, date(1900, 1, 5))
+        self.assertRaises(ValueError, cnlunardate_module.next_solar_term, date(2100, 12, 22))
+        self.assertRaises(ValueError, cnlunardate_module.solar_terms_in_year, 2101)
+
+
+class TestGanzhi(unittest.TestCase):
+
+    def test_known_dates(self):
+        for d, ganzhi in ((date(1900, 1, 31), ("庚子", "丁丑", "甲辰")),
+                          (date(1984, 2, 2), ("甲子", "乙丑", "丙寅")),
+                          (date(2000, 1, 1), ("己卯", "丙子", "戊午")),
+                          (date(2017, 2, 2), ("丁酉", "辛丑", "庚申")),
+                          (date(2017, 2, 3), ("丁酉", "壬寅", "辛酉")),  # 立春
+                          (date(2017, 6, 24), ("丁酉", "丙午", "壬午"))):
+            d = cnlunardate.fromsolardate(d)
+            self.assertEqual((d.yearGanzhi, d.monthGanzhi, d.dayGanzhi), ganzhi)
+        self.assertEqual(cnlunardate(1984, 1, 1).zodiac, "鼠")
+        self.assertEqual(cnlunardate(2017, 12, 30).zodiac, "鸡")
+
+    def test_cycle(self):
+        GANZHI = cnlunardate_module.GANZHI
+        self.assertEqual(len(set(GANZHI)), 60)
+        self.assertEqual((GANZHI[0], GANZHI[59]), ("甲子", "癸亥"))
+        d = cnlunardate(2017, 1, 1)
+        codes = [GANZHI.index(d.dayGanzhi)]
+        for _ in range(70):
+            d += timedelta(1)
+            codes.append(GANZHI.index(d.dayGanzhi))
+        self.assertEqual(codes, [(codes[0] + i) % 60 for i in range(71)])
+        months = [GANZHI.index(cnlunardate.fromsolardate(t.date).monthGanzhi)
+                  for t in cnlunardate_module.solar_terms_in_year(2017)[2::2]]
+        self.assertEqual(months, [(months[0] + i) % 60 for i in range(11)])
+
+    @unittest.skipIf(np is None, "requires numpy")
+    def test_batch(self):
+        ords = np.arange(cnlunardate.min.toordinal(), cnlunardate.max.toordinal() + 1, 97)
+        codes, invalid = cnlunardate_module.ganzhi(ords)
+        self.assertFalse(invalid.any())
+        GANZHI = cnlunardate_module.GANZHI
+        for n, c in zip(ords.tolist(), codes.tolist()):
+            d = cnlunardate.fromordinal(n)
+            self.assertEqual(tuple(GANZHI[x] for x in c),
+                             (d.yearGanzhi, d.monthGanzhi, d.dayGanzhi))
+        lunar, _ = cnlunardate_module.solar2lunar(ords)
+        self.assertTrue((cnlunardate_module.ganzhi(lunar)[0] == codes).all())
+
+        codes, invalid = cnlunardate_module.ganzhi(
+            np.array(["2017-06-24", "NaT", "1800-01-01"], dtype="datetime64[D]"))
+        self.assertEqual(invalid.tolist(), [False, True, True])
+        self.assertEqual(codes.tolist(), [(33, 42, 18), (-1, -1, -1), (-1, -1, -1)])
+
+
+class TestFormatting(unittest.TestCase):
+
+    def test_numbers(self):
+        d = cnlunardate(2017, 6, 3, True)
+        self.assertEqual(d.strftime("%Y-%m-%d%L"), "2017-06-03L")
+        self.assertEqual(cnlunardate(2017, 6, 3).strftime("%Y-%m-%d%L"), "2017-06-03")
+        self.assertEqual(cnlunardate(1905, 1, 1).strftime("%y/%m/%d"), "05/01/01")
+        self.assertEqual(d.strftime("100%% {d} %%d"), "100% {d} %d")
+        self.assertEqual(d.strftime("no directives"), "no directives")
+        self.assertEqual(d.strftime(""), "")
+
+    def test_chinese(self):
+        d = cnlunardate(2017, 6, 23, True)
+        self.assertEqual(d.strftime("%C年%N%D"), "二〇一七年闰六月廿三")
+        self.assertEqual(d.strftime("%G%Z年"), "丁酉鸡年")
+        self.assertEqual(cnlunardate(2018, 1, 1).strftime("%N%D"), "正月初一")
+        self.assertEqual(cnlunardate(2018, 11, 10).strftime("%N%D"), "冬月初十")
+        self.assertEqual(cnlunardate(2018, 12, 20).strftime("%N%D"), "腊月二十")
+        self.assertEqual(cnlunardate(2018, 4, 30).strftime("%N%D"), "四月三十")
+        self.assertEqual(cnlunardate(2018, 4, 11).strftime("%N%D"), "四月十一")
+        days = [cnlunardate(2018, 4, day).strftime("%D") for day in range(1, 31)]
+        self.assertEqual(len(set(days)), 30)
+        for year in range(MIN_YEAR, MAX_YEAR + 1, 7):
+            d = cnlunardate(year, 1, 1)
+            self.assertEqual(d.strftime("%G %Z"), f"{d.yearGanzhi} {d.zodiac}")
+
+    def test_solar(self):
+        for n in range(cnlunardate.min.toordinal(), cnlunardate.max.toordinal(), 997):
+            d = cnlunardate.fromordinal(n)
+            s = d.tosolardate()
+            self.assertEqual(d.strftime("%sY-%sm-%sd %sj %a %A %w %u"),
+                             s.strftime("%Y-%m-%d %j %a %A %w %u"))
+
+    def test_format(self):
+        d = cnlunardate(2017, 6, 23, True)
+        self.assertEqual(f"{d:%Y/%m/%d}", "2017/06/23")
+        self.assertEqual(format(d, ""), str(d))
+        self.assertEqual("{:%N%D}".format(d), "闰六月廿三")
+        self.assertEqual(SubclassDate(2017, 6, 23).strftime("%m%d"), "0623")
+
+    def test_invalid(self):
+        d = cnlunardate(2017, 6, 23)
+        for fmt in "%q", "%", "abc%", "%s", "%sq", "%H":
+            self.assertRaises(ValueError, d.strftime, fmt)
+        self.assertRaises(TypeError, d.strftime, 1)
+        self.assertRaises(TypeError, d.__format__, 1)
+
+    def test_compiled_once(self):
+        compile_format = cnlunardate_module._compile_format
+        self.assertIs(compile_format("%Y%N"), compile_format("%Y%N"))
+
+    def test_format_many(self):
+        dates = [cnlunardate.fromordinal(n) for n in range(736504, 736520)]
+        self.assertEqual(cnlunardate_module.format_many(dates, "%Y-%m-%d%L %N%D"),
+                         [d.strftime("%Y-%m-%d%L %N%D") for d in dates])
+        self.assertEqual(cnlunardate_module.format_many(iter([None, dates[0]]), "%d"),
+                         [None, dates[0].strftime("%d")])
+        self.assertEqual(cnlunardate_module.format_many([], "%d"), [])
+        self.assertRaises(TypeError, cnlunardate_module.format_many,
+                          [date(2017, 1, 1)], "%d")
+        self.assertRaises(ValueError, cnlunardate_module.format_many, dates, "%q")
+
+
+class TestParsing(unittest.TestCase):
+
+    def test_fromisoformat(self):
+        fromisoformat = cnlunardate.fromisoformat
+        self.assertEqual(fromisoformat("2017-06-01"), cnlunardate(2017, 6, 1))
+        self.assertEqual(fromisoformat("2017-L06-01"), cnlunardate(2017, 6, 1, True))
+        self.assertEqual(fromisoformat("2017-06-01L"), cnlunardate(2017, 6, 1, True))
+        self.assertIs(type(SubclassDate.fromisoformat("2017-06-01")), SubclassDate)
+        for n in range(cnlunardate.min.toordinal(), cnlunardate.max.toordinal(), 97):
+            d = cnlunardate.fromordinal(n)
+            self.assertEqual(fromisoformat(d.isoformat()), d)
+            self.assertEqual(fromisoformat(d.strftime("%Y-%m-%d%L")), d)
+        for text in ("2017-6-1", "2017-L06-01L", "2017-06-01 ", "17-06-01",
+                     "2017/06/01", "２０１７-06-01", "2017-13-01", "2017-06-31",
+                     "2018-L06-01", "1899-01-01", ""):
+            self.assertRaises(ValueError, fromisoformat, text)
+        self.assertRaises(TypeError, fromisoformat, b"2017-06-01")
+
+    def test_isoformat(self):
+        self.assertEqual(cnlunardate(2017, 6, 1, True).isoformat(), "2017-L06-01")
+        self.assertEqual(cnlunardate(1900, 1, 1).isoformat(), "1900-01-01")
+
+    def test_fromchinese(self):
+        fromchinese = cnlunardate.fromchinese
+        self.assertEqual(fromchinese("二〇一七年闰六月初一"), cnlunardate(2017, 6, 1, True))
+        self.assertEqual(fromchinese("农历六月廿三", 2017), cnlunardate(2017, 6, 23))
+        self.assertEqual(fromchinese("阴历二零一八年正月十五日"), cnlunardate(2018, 1, 15))
+        self.assertEqual(fromchinese(" 2018年 腊月 二十九 "), cnlunardate(2018, 12, 29))
+        self.assertEqual(fromchinese("二〇一八年十一月廿一"), cnlunardate(2018, 11, 21))
+        self.assertEqual(fromchinese("二〇一八年冬月二十一"), cnlunardate(2018, 11, 21))
+        self.assertEqual(fromchinese("二〇一八年四月卅"), cnlunardate(2018, 4, 30))
+        self.assertEqual(fromchinese("二〇一八年十月初十", 2000), cnlunardate(2018, 10, 10))
+        for n in range(cnlunardate.min.toordinal(), cnlunardate.max.toordinal(), 97):
+            d = cnlunardate.fromordinal(n)
+            self.assertEqual(fromchinese(d.strftime("%C年%N%D")), d)
+            self.assertEqual(fromchinese(d.strftime("农历%N%D"), d.year), d)
+        for text in ("农历六月廿三", "六月", "二〇一八年十三月初一", "二〇一八年六月三十一",
+                     "二〇一八年闰六月初一", "一八年六月初一", "丁酉年六月初一"):
+            self.assertRaises(ValueError, fromchinese, text)
+        self.assertRaises(TypeError, fromchinese, None)
+        self.assertRaises(TypeError, fromchinese, "六月初一", "2018")
+
+    def test_parse_many(self):
+        texts = ["2017-L06-01", "农历六月廿三", None, "bad", 5, "2017-L06-01",
+                 "2018-L06-01", "二〇一七年闰六月初一"]
+        dates, errors = cnlunardate_module.parse_many(texts, year=2017)
+        self.assertEqual(dates, [cnlunardate(2017, 6, 1, True), cnlunardate(2017, 6, 23),
+                                 None, None, None, cnlunardate(2017, 6, 1, True), None,
+                                 cnlunardate(2017, 6, 1, True)])
+        self.assertEqual([e is None for e in errors],
+                         [True, True, True, False, False, True, False, True])
+        self.assertIn("not leap", errors[6])
+        dates, errors = cnlunardate_module.parse_many(iter(["农历六月廿三", [1]]))
+        self.assertEqual(dates, [None, None])
+        self.assertIn("no year", errors[0])
+        self.assertIn("list", errors[1])
+        self.assertEqual(cnlunardate_module.parse_many([]), ([], []))
+
+
+class TestCnlunardatetime(unittest.TestCase):
+
+    # 2017-07-23 00:00 in UTC+8, the first day of leap month 6 of 2017.
+    LEAP_MONTH_START = 1500739200
+
+    def test_fields(self):
+        dt = cnlunardatetime(2017, 6, 1, True, 12, 30, 15, 500, CHINA_TZ)
+        self.assertEqual((dt.year, dt.month, dt.day, dt.isLeapMonth), (2017, 6, 1, True))
+        self.assertEqual((dt.hour, dt.minute, dt.second, dt.microsecond), (12, 30, 15, 500))
+        self.assertIs(dt.tzinfo, CHINA_TZ)
+        self.assertEqual(dt.date(), cnlunardate(2017, 6, 1, True))
+        self.assertIs(type(dt.date()), cnlunardate)
+        self.assertEqual(dt.time(), time(12, 30, 15, 500))
+        self.assertIs(dt.timetz().tzinfo, CHINA_TZ)
+        self.assertEqual(dt.tosolardatetime(), datetime(2017, 7, 23, 12, 30, 15, 500, CHINA_TZ))
+        self.assertEqual(dt.utcoffset(), timedelta(hours=8))
+        self.assertEqual(dt.isoformat(), "2017-L06-01T12:30:15.000500+08:00")
+        self.assertEqual(dt.strftime("%N%D"), "闰六月初一")
+        self.assertEqual(dt.timetuple()[:6], (2017, 7, 23, 12, 30, 15))
+        self.assertIsNone(cnlunardatetime(2017, 6, 1).tzinfo)
+        self.assertRaises(ValueError, cnlunardatetime, 2017, 6, 1, True, 24)
+        self.assertRaises(ValueError, cnlunardatetime, 2018, 6, 1, True, 12)
+
+    def test_repr(self):
+        self.assertEqual(repr(cnlunardatetime(2017, 6, 1, True, 12, 30)),
+                         "cnlunardate.cnlunardatetime(2017, 6, 1, True, 12, 30)")
+        self.assertEqual(repr(cnlunardatetime(2017, 6, 1, False, 0, 0, 1, 2, timezone.utc)),
+                         "cnlunardate.cnlunardatetime(2017, 6, 1, False, 0, 0, 1, 2, "
+                         "tzinfo=datetime.timezone.utc)")
+
+    def test_fromtimestamp(self):
+        t = self.LEAP_MONTH_START
+        dt = cnlunardatetime.fromtimestamp(t)
+        self.assertEqual(dt, cnlunardatetime(2017, 6, 1, True, 0, 0, tzinfo=CHINA_TZ))
+        self.assertEqual(dt.tzinfo, CHINA_TZ)
+        self.assertEqual(dt.timestamp(), t)
+        self.assertEqual(cnlunardatetime.fromtimestamp(t - 1),
+                         cnlunardatetime(2017, 6, 29, False, 23, 59, 59, tzinfo=CHINA_TZ))
+        self.assertEqual(cnlunardatetime.fromtimestamp(t, timezone.utc),
+                         cnlunardatetime(2017, 6, 29, False, 16, 0, tzinfo=timezone.utc))
+        self.assertEqual(cnlunardate.fromtimestamp(t, CHINA_TZ), cnlunardate(2017, 6, 1, True))
+        self.assertEqual(cnlunardate.fromtimestamp(t - 1, CHINA_TZ), cnlunardate(2017, 6, 29))
+        self.assertIsNone(cnlunardatetime.fromtimestamp(t, None).tzinfo)
+        self.assertEqual(cnlunardatetime.now().tzinfo, CHINA_TZ)
+        self.assertEqual(cnlunardatetime.today().tzinfo, CHINA_TZ)
+
+    @unittest.skipIf(sys.platform == "win32", "requires the TZ variable")
+    def test_independent_of_local_timezone(self):
+        code = ("import cnlunardate as c\n"
+                f"d = c.cnlunardatetime.fromtimestamp({self.LEAP_MONTH_START})\n"
+                "assert (d.month, d.day, d.isLeapMonth, d.hour) == (6, 1, True, 0), d\n")
+        subprocess.run([sys.executable, "-c", code], check=True,
+                       env=dict(os.environ, TZ="America/New_York"),
+                       cwd=os.path.dirname(os.path.abspath(cnlunardate_module.__file__)))
+
+    def test_conversions(self):
+        solar = datetime(2017, 7, 22, 20, 0, tzinfo=timezone.utc)
+        dt = cnlunardatetime.fromsolardatetime(solar)
+        self.assertEqual((dt.month, dt.day, dt.isLeapMonth, dt.hour), (6, 29, False, 20))
+        dt = cnlunardatetime.fromsolardatetime(solar, CHINA_TZ)
+        self.assertEqual((dt.month, dt.day, dt.isLeapMonth, dt.hour), (6, 1, True, 4))
+        self.assertEqual(dt.astimezone(timezone.utc).tosolardatetime(), solar)
+        self.assertEqual(cnlunardatetime.combine(cnlunardate(2017, 6, 1), time(3, 4)),
+                         cnlunardatetime(2017, 6, 1, False, 3, 4))
+        self.assertRaises(TypeError, cnlunardatetime.combine, date(2017, 6, 1), time())
+        self.assertRaises(TypeError, cnlunardatetime.fromsolardatetime, date(2017, 6, 1))
+        self.assertRaises(ValueError, cnlunardatetime.fromsolardatetime, datetime(1900, 1, 1))
+        dt = cnlunardatetime(2017, 6, 1, True, 12, 30, tzinfo=CHINA_TZ)
+        self.assertEqual(dt.replace(day=2, hour=1), cnlunardatetime(2017, 6, 2, True, 1, 30,
+                                                                    tzinfo=CHINA_TZ))
+        self.assertIsNone(dt.replace(tzinfo=None).tzinfo)
+
+    def test_arithmetic(self):
+        dt = cnlunardatetime(2017, 6, 29, False, 20, 0, tzinfo=CHINA_TZ)
+        self.assertEqual(dt + timedelta(hours=4),
+                         cnlunardatetime(2017, 6, 1, True, 0, 0, tzinfo=CHINA_TZ))
+        self.assertEqual(timedelta(hours=4) + dt, dt + timedelta(hours=4))
+        self.assertEqual(dt - timedelta(days=1, seconds=1),
+                         cnlunardatetime(2017, 6, 28, False, 19, 59, 59, tzinfo=CHINA_TZ))
+        self.assertEqual(dt + cnlunardate_module.LunarDelta(months=1),
+                         cnlunardatetime(2017, 6, 29, True, 20, 0, tzinfo=CHINA_TZ))
+        self.assertEqual(dt - cnlunardatetime(2017, 6, 29, False, 8, 0, tzinfo=timezone.utc),
+                         timedelta(hours=4))
+        self.assertRaises(TypeError, lambda: dt - cnlunardate(2017, 6, 29))
+        self.assertRaises(TypeError, lambda: cnlunardate(2017, 6, 29) - dt)
+        self.assertRaises(OverflowError, lambda: cnlunardatetime.max + cnlunardatetime.resolution)
+        self.assertRaises(OverflowError, lambda: cnlunardatetime.min - timedelta(seconds=1))
+        self.assertIs(type(dt + timedelta(1)), cnlunardatetime)
+
+    def test_comparisons(self):
+        a = cnlunardatetime(2017, 6, 1, True, 8, 0, tzinfo=CHINA_TZ)
+        b = cnlunardatetime(2017, 6, 1, True, 0, 0, tzinfo=timezone.utc)
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertLess(a, b + timedelta(microseconds=1))
+        self.assertGreater(a, b - timedelta(microseconds=1))
+        self.assertLessEqual(a, b)
+        self.assertNotEqual(a, cnlunardatetime(2017, 6, 1, True, 8, 0))
+        self.assertNotEqual(a, a.date())
+        self.assertNotEqual(a.date(), a)
+        for op in (lambda x, y: x < y, lambda x, y: x >= y):
+            self.assertRaises(TypeError, op, a, a.date())
+            self.assertRaises(TypeError, op, a.date(), a)
+        self.assertEqual(sorted([b + timedelta(1), a]), [a, b + timedelta(1)])
+
+    def test_min_max(self):
+        self.assertEqual(cnlunardatetime.min.date(), cnlunardate.min)
+        self.assertEqual(cnlunardatetime.min.time(), time.min)
+        self.assertEqual(cnlunardatetime.max.date(), cnlunardate.max)
+        self.assertEqual(cnlunardatetime.max.time(), time.max)
+
+    def test_pickling(self):
+        for dt in (cnlunardatetime(2017, 6, 1, True, 12, 30, 15, 500, CHINA_TZ),
+                   cnlunardatetime(2017, 6, 1)):
+            for pickler, unpickler, proto in pickle_choices:
+                green = pickler.dumps(dt, proto)
+                derived = unpickler.loads(green)
+                self.assertEqual(derived, dt)
+                self.assertEqual(derived.tzinfo, dt.tzinfo)
+
+
+class TestCommandLine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def convert(self, text, *args, name="in.csv"):
+        path = os.path.join(self.tmpdir.name, name)
+        out = os.path.join(self.tmpdir.name, "out")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        cnlunardate_cli.main([path, "-o", out] + list(args))
+        with open(out, encoding="utf-8") as f:
+            return f.read()
+
+    def test_csv(self):
+        text = "id,date\n1,2017-06-24\n2,2017-07-23\n3,bad\n4,1800-01-01\n"
+        expected = ("id,date,lunar_year,lunar_month,lunar_day,lunar_leap\n"
+                    "1,2017-06-24,2017,6,1,0\n2,2017-07-23,2017,6,1,1\n"
+                    "3,bad,,,,\n4,1800-01-01,,,,\n")
+        self.assertEqual(self.convert(text), expected)
+        self.assertEqual(self.convert(text, "--jobs", "2", "--chunk-size", "1"), expected)
+        self.assertEqual(self.convert("2017-06-01L;x\n", "--to", "solar", "--no-header",
+                                      "--column", "0", "--delimiter", ";"),
+                         "2017-06-01L;x;2017-07-23\n")
+        with self.assertRaises(SystemExit):
+            self.convert(text, "--strict")
+        with self.assertRaises(SystemExit):
+            self.convert(text, "--column", "day")
+
+    def test_csv_no_header(self):
+        self.assertEqual(self.convert("2017-06-24,x\n", "--no-header"),
+                         "2017-06-24,x,2017,6,1,0\n")
+        self.assertEqual(self.convert("x,2017-06-24\n", "--no-header", "--column", "1"),
+                         "x,2017-06-24,2017,6,1,0\n")
+        stderr = io.StringIO()
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(stderr):
+            self.convert("x,2017-06-24\n", "--no-header", "--column", "date")
+        self.assertIn("0-based index with --no-header", stderr.getvalue())
+
+    def test_jsonl(self):
+        text = '{"d": "2017-06-01L", "x": 1}\n\n{"d": "2017-01-30"}\n'
+        self.assertEqual(
+            self.convert(text, "--to", "solar", "--column", "d", name="in.jsonl"),
+            '{"d": "2017-06-01L", "x": 1, "solar": "2017-07-23"}\n'
+            '{"d": "2017-01-30", "solar": null}\n')
+
+    def test_jsonl_not_objects(self):
+        for line in ("[1, 2]", '"x"', "{bad"):
+            stderr = io.StringIO()
+            with self.assertRaises(SystemExit), contextlib.redirect_stderr(stderr):
+                self.convert('{"date": "2017-06-24"}\n' + line + "\n", name="in.jsonl")
+            self.assertIn("record 2:", stderr.getvalue())
+
+    def test_module(self):
+        out = subprocess.run(
+            [sys.executable, "-m", "cnlunardate", "--format", "jsonl", "--jobs", "2"],
+            input='{"date": "2017-06-24"}\n', cwd=os.path.dirname(cnlunardate_module.__file__),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+            check=True).stdout
+        self.assertEqual(json.loads(out), {"date": "2017-06-24", "lunar_year": 2017,
+                                           "lunar_month": 6, "lunar_day": 1,
+                                           "lunar_leap": False})
+
+
+class TestExtendYears(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = os.path.join(self.tmpdir.name, "years.json")
+
+    def tearDown(self):
+        cnlunardate_module._set_year_tables(*cnlunardate_module._BUILTIN_YEAR_TABLES)
+        self.tmpdir.cleanup()
+
+    def test_engine_matches_table(self):
+        # Years with a new moon too close to midnight for the engine.
+        borderline = [1914, 1915, 1916, 1920, 1933, 1996, 2057, 2060]
+        mismatches = [year for year in range(MIN_YEAR, MAX_YEAR + 1)
+                      if cnlunardate_astro.compute_year(year) !=
+                      (cnlunardate_module._LUNAR_YEAR_DATA[year - MIN_YEAR],
+                       cnlunardate_module._LUNAR_YEAR_FIRST_DAY_IN_SOLAR[year - MIN_YEAR])]
+        self.assertEqual(mismatches, borderline)
+        self.assertRaises(ValueError, cnlunardate_astro.compute_year, 0)
+
+    def test_extend(self):
+        cnlunardate_module.extend_years(1899, 2101, cache=self.cache)
+        self.assertEqual(cnlunardate_module.MIN_YEAR, 1899)
+        self.assertEqual(cnlunardate_module.MAX_YEAR, 2101)
+        self.assertEqual(cnlunardate.min, cnlunardate(1899, 1, 1))
+        self.assertEqual(cnlunardate.min.tosolardate(), date(1899, 2, 10))
+        self.assertEqual(cnlunardate.max.tosolardate(), cnlunardate_module.MAX_DATE)
+        self.assertEqual(cnlunardate(1899, 12, 30) + timedelta(1), cnlunardate(1900, 1, 1))
+        self.assertEqual(cnlunardate(2100, 12, 1) + timedelta(29), cnlunardate(2101, 1, 1))
+        self.assertEqual(cnlunardate_module.days_in_month(2100, 12), 29)
+        self.assertEqual(cnlunardate(2101, 1, 1).tosolardate(), date(2101, 1, 29))
+        self.assertEqual(cnlunardate(2017, 6, 1, True).tosolardate(), date(2017, 7, 23))
+        for n in range(cnlunardate.min.toordinal(), cnlunardate.max.toordinal() + 1, 7):
+            d = cnlunardate.fromordinal(n)
+            self.assertEqual(cnlunardate(d.year, d.month, d.day, d.isLeapMonth).toordinal(), n)
+        self.assertRaises(OverflowError, cnlunardate.max.__add__, timedelta(1))
+        data = cnlunardate_module.dumps_many([cnlunardate.min, cnlunardate.max])
+        self.assertEqual(cnlunardate_module.loads_many(data), [cnlunardate.min, cnlunardate.max])
+        self.assertEqual(cnlunardate_module.solar_terms_in_year(1899)[0].date, date(1899, 1, 5))
+        self.assertEqual(cnlunardate_module.next_solar_term(date(2100, 12, 31)).date,
+                         date(2101, 1, 5))
+        self.assertEqual(cnlunardate.max.monthGanzhi, "壬寅")  # after 立春 of 2102
+
+        # The supported years never shrink.
+        cnlunardate_module.extend_years(1950, 2000, cache=self.cache)
+        self.assertEqual(cnlunardate_module.MIN_YEAR, 1899)
+        self.assertEqual(cnlunardate_module.MAX_YEAR, 2101)
+        self.assertRaises(ValueError, cnlunardate_module.extend_years, 0)
+        self.assertRaises(ValueError, cnlunardate_module.extend_years, None, 9999)
+
+    def test_cache(self):
+        cnlunardate_module.extend_years(1898, cache=self.cache)
+        self.assertTrue(os.path.exists(self.cache))
+        cnlunardate_module._set_year_tables(*cnlunardate_module._BUILTIN_YEAR_TABLES)
+        compute_year = cnlunardate_astro.compute_year
+        cnlunardate_astro.compute_year = None
+        try:
+            cnlunardate_module.extend_years(1898, cache=self.cache)
+        finally:
+            cnlunardate_astro.compute_year = compute_year
+        self.assertEqual(cnlunardate.min, cnlunardate(1898, 1, 1))
+        self.assertEqual(cnlunardate_astro.year_data([1898, 1899], cache=False),
+                         cnlunardate_astro.year_data([1898, 1899], cache=self.cache))
+
+    def test_malformed_cache(self):
+        expected = cnlunardate_astro.year_data([1898], cache=False)
+        for years in ([], {"1898": [1, 2]}, {"1898": [1, 2, [3]]}, {"x": [1, 2, [3] * 24]},
+                      {"1898": None}, {"1898": ["1", 2, [3] * 24]}):
+            with open(self.cache, "w") as f:
+                json.dump({"format": cnlunardate_astro._CACHE_FORMAT,
+                           "version": cnlunardate_astro._CACHE_VERSION, "years": years}, f)
+            self.assertEqual(cnlunardate_astro.year_data([1898], cache=self.cache), expected)
+            self.assertEqual(cnlunardate_astro._read_cache(self.cache), expected)